@@ -27,6 +27,7 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'gradesbook.middleware.RoleMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -103,3 +104,26 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'static')
 STATIC_URL = '/static/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 MEDIA_URL = '/media/'
+
+# Keeps the cache of tests in memory
+TEST_RUNNER = 'gradesbook.tests.runner.TestRunner'
+
+# Background jobs are stored in the database and executed by
+# "manage.py runworker". Eager mode runs them inside the request instead.
+JOBS_EAGER = False
+
+# Shared between the web processes and the worker, so that invalidating a
+# cached timetable in one process is seen by all of them. Version stamps,
+# roles and timetables are kept without a timeout, about five keys per
+# user; past the default 300 entries the backend culls a third of them,
+# pages lose their 304s and roles are resolved again. MAX_ENTRIES keeps
+# every key of a school of up to 20000 users
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache'),
+        'OPTIONS': {
+            'MAX_ENTRIES': 100000,
+        },
+    }
+}
@@ -1,8 +1,13 @@
+import re
+from django.conf import settings
 from django.contrib import admin
-from django.urls import path
+from django.urls import path, re_path
 from django.conf.urls import include
+from gradesbook.views import StaticView
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('gradesbook', include('gradesbook.urls')),
+    re_path(rf'^{re.escape(settings.STATIC_URL.lstrip("/"))}(?P<path>.+)$',
+            StaticView.as_view()),
 ]
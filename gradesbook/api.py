@@ -0,0 +1,145 @@
+import datetime
+import hashlib
+import json
+import secrets
+from django.http import HttpResponse
+from django.utils import timezone
+from .models import ApiToken
+from .pagination import KeysetPaginator, decode_token
+from .roles import apply_role, cached_role
+
+# Items of a list page when the client asks for no number, and at most
+PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+# Scheme of the Authorization header carrying a token
+SCHEME = 'Bearer'
+
+
+class ApiError(Exception):
+    """An error answered to the client as {"error": message}."""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def token_digest(key):
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+def issue_token(user):
+    """Creates a token of user and returns its key."""
+    key = secrets.token_urlsafe(32)
+    ApiToken.objects.create(user=user, digest=token_digest(key))
+    return key
+
+
+def request_token(request):
+    """The token key of the Authorization header, None without one."""
+    scheme, _, key = request.META.get('HTTP_AUTHORIZATION', '').partition(
+        ' '
+    )
+    key = key.strip()
+    return key if scheme == SCHEME and key else None
+
+
+def authenticate_request(request):
+    """
+    Signs a request carrying a token in as the user of the token, with
+    one query, and attaches the role of the user. Other requests keep the
+    user of their session. Raises ApiError when neither is there.
+    """
+    key = request_token(request)
+    if key is None:
+        if not request.user.is_authenticated:
+            raise ApiError(401, 'Потрібно увійти.')
+        return
+    token = ApiToken.objects.select_related('user').filter(
+        digest=token_digest(key),
+        user__is_active=True
+    ).first()
+    if token is None:
+        raise ApiError(401, 'Невірний токен.')
+    request.user = token.user
+    apply_role(request, token.user, cached_role(token.user))
+
+
+def json_default(value):
+    # Dates and local times as ISO 8601, to the second
+    if isinstance(value, datetime.datetime):
+        value = timezone.localtime(value).replace(microsecond=0)
+    return value.isoformat()
+
+
+def json_response(data, status=200):
+    """Data as JSON without spaces, letters are sent as UTF-8."""
+    return HttpResponse(
+        json.dumps(data, ensure_ascii=False, separators=(',', ':'),
+                   default=json_default),
+        content_type='application/json', status=status
+    )
+
+
+def error_response(error):
+    response = json_response({'error': str(error)}, error.status)
+    if error.status == 401:
+        response['WWW-Authenticate'] = SCHEME
+    return response
+
+
+def requested_fields(request, fields):
+    """
+    The fields, {name: getter}, named by ?fields=a,b, all of them without
+    it. Raises ApiError for names that are not fields.
+    """
+    names = request.GET.get('fields')
+    if not names:
+        return fields
+    names = set(names.split(','))
+    unknown = names - set(fields)
+    if unknown:
+        raise ApiError(400, f'Невідомі поля: {", ".join(sorted(unknown))}.')
+    return {name: get for name, get in fields.items() if name in names}
+
+
+def serialize(objects, fields, compact=False):
+    """
+    {"data": [{field: value}]} of the objects, or with compact
+    {"fields": [names], "rows": [[values]]}, which names the fields once
+    instead of on every object.
+    """
+    if compact:
+        return {
+            'fields': list(fields),
+            'rows': [[get(obj) for get in fields.values()]
+                     for obj in objects],
+        }
+    return {'data': [{name: get(obj) for name, get in fields.items()}
+                     for obj in objects]}
+
+
+def is_compact(request):
+    return request.GET.get('compact', '') not in ('', '0', 'false')
+
+
+def paginate(request, queryset, ordering):
+    """
+    The ?limit= objects of queryset after the ?cursor= the previous page
+    ended with, by one keyset query. Returns (objects, cursor of the next
+    page or None).
+    """
+    try:
+        limit = int(request.GET.get('limit', PAGE_SIZE))
+    except ValueError:
+        limit = 0
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        raise ApiError(400, f'limit має бути від 1 до {MAX_PAGE_SIZE}.')
+    paginator = KeysetPaginator(queryset, limit, ordering)
+    cursor = request.GET.get('cursor')
+    if cursor:
+        direction, values = decode_token(cursor)
+        # A client is told, where pages fall back to the first one
+        if direction != 'next' or paginator.clean(values) is None:
+            raise ApiError(400, 'Невірний курсор.')
+    page = paginator.get_page(cursor)
+    return page.object_list, page.next_token
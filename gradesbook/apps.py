@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class GradebookConfig(AppConfig):
     name = 'gradesbook'
+
+    def ready(self):
+        from . import signals, tasks  # noqa: F401
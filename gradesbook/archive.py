@@ -0,0 +1,183 @@
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from .models import (ArchivedCanceledGrade, ArchivedGrade, ArchivedSubject,
+                     ArchivedSubjectDate, CanceledGrades, Grades, InboxEntry,
+                     SchoolClass, Subject, SubjectDate, SubjectTeachers)
+from . import stamps
+from .rollups import rebuild_rollups
+from .timetable import invalidate_timetables
+
+# Subjects moved in one transaction
+CHUNK_SIZE = 5
+# (live model, archive model, columns), parents first
+TABLES = (
+    (Subject, ArchivedSubject,
+     ('id', 'name', 'unique_code', 'school_class_id')),
+    (SubjectDate, ArchivedSubjectDate,
+     ('id', 'subject_id', 'day', 'lesson_number')),
+    (Grades, ArchivedGrade,
+     ('id', 'grade', 'student_id', 'subject_id', 'date', 'manager_mode')),
+    (CanceledGrades, ArchivedCanceledGrade,
+     ('id', 'grade', 'student_id', 'subject_id', 'date')),
+)
+
+
+class ArchiveError(Exception):
+    pass
+
+
+def copy_rows(source, target, columns, subject_ids):
+    """
+    Copies the rows of subjects from the table of source to the table of
+    target with one INSERT ... SELECT, without loading them.
+    """
+    quote = connection.ops.quote_name
+    names = ', '.join(quote(column) for column in columns)
+    key = 'id' if source in (Subject, ArchivedSubject) else 'subject_id'
+    placeholders = ', '.join(['%s'] * len(subject_ids))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {quote(target._meta.db_table)} ({names}) '
+            f'SELECT {names} FROM {quote(source._meta.db_table)} '
+            f'WHERE {quote(key)} IN ({placeholders})',
+            list(subject_ids)
+        )
+
+
+def delete_rows(model, ids, column='subject_id'):
+    # Skips the signals, the rollups of the subjects are handled apart
+    quote = connection.ops.quote_name
+    placeholders = ', '.join(['%s'] * len(ids))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {quote(model._meta.db_table)} '
+            f'WHERE {quote(column)} IN ({placeholders})',
+            list(ids)
+        )
+
+
+def archive_subjects(subject_ids):
+    """Moves subjects with their teachers, timetable and grades."""
+    with transaction.atomic():
+        for source, target, columns in TABLES:
+            copy_rows(source, target, columns, subject_ids)
+        ArchivedSubject.teachers.through.objects.bulk_create([
+            ArchivedSubject.teachers.through(archivedsubject_id=subject_id,
+                                             teacher_id=teacher_id)
+            for subject_id, teacher_id in set(
+                SubjectTeachers.teacher.through.objects.filter(
+                    subjectteachers__subject_id__in=subject_ids
+                ).values_list('subjectteachers__subject_id', 'teacher_id')
+            )
+        ])
+        delete_rows(Grades, subject_ids)
+        delete_rows(CanceledGrades, subject_ids)
+        delete_rows(SubjectDate, subject_ids)
+        # Teachers, rollups and term results go with the subjects
+        Subject.objects.filter(id__in=subject_ids).delete()
+    invalidate_timetables()
+    stamps.bump([stamps.SCHOOL])
+
+
+def delete_subjects(subject_ids):
+    """
+    Deletes subjects with their timetable and grades, which go with raw
+    deletes instead of one signal each. Timetables and stamps are
+    updated once.
+    """
+    class_ids = set(Subject.objects.filter(id__in=subject_ids).values_list(
+        'school_class_id', flat=True
+    ))
+    with transaction.atomic():
+        delete_rows(Grades, subject_ids)
+        delete_rows(CanceledGrades, subject_ids)
+        delete_rows(SubjectDate, subject_ids)
+        # Teachers, rollups and term results go with the subjects
+        Subject.objects.filter(id__in=subject_ids).delete()
+    invalidate_timetables()
+    stamps.bump([stamps.TEACHERS] + [stamps.CLASS.format(class_id)
+                                     for class_id in class_ids])
+
+
+def delete_pupils(user_ids):
+    """
+    Deletes users, pupils with their grades among them. Grades and the
+    inboxes of the users go with raw deletes, the rollups of the subjects
+    are rebuilt once and unread counters go with the users.
+    """
+    with transaction.atomic():
+        subject_ids = set()
+        for model in (Grades, CanceledGrades):
+            subject_ids.update(model.objects.filter(
+                student_id__in=user_ids
+            ).values_list('subject_id', flat=True).distinct())
+            delete_rows(model, user_ids, 'student_id')
+        delete_rows(InboxEntry, user_ids, 'user_id')
+        User.objects.filter(id__in=user_ids).delete()
+        rebuild_rollups(sorted(subject_ids))
+
+
+def restore_subjects(subject_ids):
+    """Moves archived subjects back to the live tables."""
+    with transaction.atomic():
+        for source, target, columns in TABLES:
+            copy_rows(target, source, columns, subject_ids)
+        teachers = {}
+        for subject_id, teacher_id in ArchivedSubject.teachers.through.objects\
+                .filter(archivedsubject_id__in=subject_ids)\
+                .values_list('archivedsubject_id', 'teacher_id'):
+            teachers.setdefault(subject_id, []).append(teacher_id)
+        for subject_id, teacher_ids in teachers.items():
+            subject_teachers = SubjectTeachers.objects.create(
+                subject_id=subject_id
+            )
+            subject_teachers.teacher.add(*teacher_ids)
+        delete_rows(ArchivedGrade, subject_ids)
+        delete_rows(ArchivedCanceledGrade, subject_ids)
+        ArchivedSubject.objects.filter(id__in=subject_ids).delete()
+        rebuild_rollups(list(subject_ids))
+    invalidate_timetables()
+    stamps.bump([stamps.SCHOOL])
+
+
+def archive_chunk(school_class, chunk_size=CHUNK_SIZE):
+    """
+    Archives the next chunk_size subjects of an inactive class. Returns
+    False when the class has nothing left to move.
+    """
+    if school_class.active:
+        raise ArchiveError('Архівувати можна лише неактивний клас.')
+    subject_ids = list(Subject.objects.filter(
+        school_class=school_class
+    ).order_by('id').values_list('id', flat=True)[:chunk_size])
+    if subject_ids:
+        archive_subjects(subject_ids)
+    return bool(subject_ids)
+
+
+def restore_chunk(school_class, chunk_size=CHUNK_SIZE):
+    """
+    Restores the next chunk_size archived subjects of a class. Returns
+    False when the class has nothing left to move.
+    """
+    subject_ids = list(ArchivedSubject.objects.filter(
+        school_class=school_class
+    ).order_by('id').values_list('id', flat=True)[:chunk_size])
+    if subject_ids:
+        restore_subjects(subject_ids)
+    return bool(subject_ids)
+
+
+def archive_class(school_class, chunk_size=CHUNK_SIZE):
+    """Archives all subjects of a class, one transaction per chunk."""
+    if school_class.active:
+        raise ArchiveError('Архівувати можна лише неактивний клас.')
+    SchoolClass.objects.filter(pk=school_class.pk).update(archived=True)
+    while archive_chunk(school_class, chunk_size):
+        pass
+
+
+def restore_class(school_class, chunk_size=CHUNK_SIZE):
+    SchoolClass.objects.filter(pk=school_class.pk).update(archived=False)
+    while restore_chunk(school_class, chunk_size):
+        pass
@@ -0,0 +1,174 @@
+import functools
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import re
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponseNotModified
+from django.templatetags.static import static
+from django.utils._os import safe_join
+from django.utils.http import http_date
+from django.views.static import was_modified_since
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Bundles built by build_assets from static files, in order. Libraries are
+# the minified files of their releases, the bundle of Bootstrap includes
+# Popper
+BUNDLES = {
+    'gradesbook/bundle.css': [
+        'gradesbook/style.css',
+        'gradesbook/css/bootstrap.min.css',
+    ],
+    'gradesbook/bundle.js': [
+        'gradesbook/jquery-3.4.1.min.js',
+        'gradesbook/js/bootstrap.bundle.min.js',
+    ],
+}
+# Bundle names to their content hashed names, in STATIC_ROOT
+MANIFEST = 'gradesbook/assets.json'
+# Hashed names never change, other static files are revalidated hourly
+HASHED_MAX_AGE = 365 * 24 * 60 * 60
+MAX_AGE = 60 * 60
+# Precompressed variants, preferred first
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+re_accepts = {
+    encoding: re.compile(rf'\b{encoding}\b') for encoding, _ in ENCODINGS
+}
+# Source map comments point next to the files, not to the bundles
+re_source_map = re.compile(r'^(//|/\*)# sourceMappingURL=.*$', re.MULTILINE)
+
+
+def minify_css(text):
+    """Drops indentation and empty lines, nothing inside the lines."""
+    return '\n'.join(line.strip() for line in text.splitlines()
+                     if line.strip())
+
+
+def bundle(name):
+    """
+    The files of a bundle one after another. Minified files are taken as
+    they are, stylesheets of the app lose their indentation.
+    """
+    separator = '\n' if name.endswith('.css') else ';\n'
+    parts = []
+    for source in BUNDLES[name]:
+        with open(finders.find(source), encoding='utf-8') as file:
+            content = file.read()
+        if source.endswith('.css') and not source.endswith('.min.css'):
+            content = minify_css(content)
+        parts.append(re_source_map.sub('', content).strip())
+    return separator.join(parts) + '\n'
+
+
+def hashed_name(name, content):
+    """bundle.js as bundle.<first 12 digits of the md5>.js"""
+    root, extension = os.path.splitext(name)
+    digest = hashlib.md5(content).hexdigest()[:12]
+    return f'{root}.{digest}{extension}'
+
+
+def write(path, content):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as file:
+        file.write(content)
+
+
+def build():
+    """
+    Writes the bundles to STATIC_ROOT under content hashed names, next to
+    their gzip variants, and brotli ones with the brotli package, then
+    the manifest. Returns the manifest.
+    """
+    manifest = {}
+    for name in BUNDLES:
+        content = bundle(name).encode()
+        manifest[name] = hashed_name(name, content)
+        path = os.path.join(settings.STATIC_ROOT, manifest[name])
+        write(path, content)
+        # No file name and date in the header: builds are reproducible
+        write(path + '.gz', gzip.compress(content, 9, mtime=0))
+        if brotli is not None:
+            write(path + '.br', brotli.compress(content))
+    write(os.path.join(settings.STATIC_ROOT, MANIFEST),
+          json.dumps(manifest, indent=2, sort_keys=True).encode())
+    return manifest
+
+
+@functools.lru_cache(maxsize=1)
+def read_manifest(path, modified):
+    with open(path, encoding='utf-8') as file:
+        return json.load(file)
+
+
+def manifest():
+    """The manifest of the last build, empty before the first one."""
+    if not settings.STATIC_ROOT:
+        return {}
+    path = os.path.join(settings.STATIC_ROOT, MANIFEST)
+    try:
+        modified = os.stat(path).st_mtime
+    except FileNotFoundError:
+        return {}
+    return read_manifest(path, modified)
+
+
+def asset_urls(name):
+    """
+    URL of the built bundle, or of the files it is made of while there
+    is no build, as when developing.
+    """
+    built = manifest().get(name)
+    if built:
+        return [static(built)]
+    return [static(source) for source in BUNDLES[name]]
+
+
+def static_response(request, path):
+    """
+    Serves a file of STATIC_ROOT, or its brotli or gzip variant when the
+    browser accepts one. Built bundles are cached for a year, everything
+    else is revalidated with If-Modified-Since after MAX_AGE.
+    """
+    try:
+        full_path = safe_join(settings.STATIC_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404
+    if not os.path.isfile(full_path):
+        raise Http404
+    stat = os.stat(full_path)
+    if not was_modified_since(request.META.get('HTTP_IF_MODIFIED_SINCE'),
+                              stat.st_mtime, stat.st_size):
+        response = HttpResponseNotModified()
+    else:
+        content_type, _ = mimetypes.guess_type(full_path)
+        accepts = request.META.get('HTTP_ACCEPT_ENCODING', '')
+        served, encoding = full_path, None
+        for name, suffix in ENCODINGS:
+            if re_accepts[name].search(accepts) and \
+                    os.path.isfile(full_path + suffix):
+                served, encoding = full_path + suffix, name
+                break
+        response = FileResponse(open(served, 'rb'),
+                                content_type=content_type or
+                                'application/octet-stream')
+        if encoding:
+            response['Content-Encoding'] = encoding
+    # A 304 carries the caching headers too, or caches drop them
+    if any(os.path.isfile(full_path + suffix) for _, suffix in ENCODINGS):
+        response['Vary'] = 'Accept-Encoding'
+    response['Last-Modified'] = http_date(stat.st_mtime)
+    hashed = path in manifest().values()
+    response['Cache-Control'] = (
+        f'public, max-age={HASHED_MAX_AGE}, immutable' if hashed
+        else f'public, max-age={MAX_AGE}'
+    )
+    return response
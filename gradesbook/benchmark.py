@@ -0,0 +1,60 @@
+import datetime
+from contextlib import contextmanager
+from django.contrib.auth.models import User
+from django.db import transaction
+from .models import Parent, SchoolClass, Student
+from .permissions import role_permission
+
+
+class Rollback(Exception):
+    pass
+
+
+@contextmanager
+def rolled_back():
+    """Runs a benchmark inside a transaction that is always rolled back."""
+    try:
+        with transaction.atomic():
+            yield
+            raise Rollback
+    except Rollback:
+        pass
+
+
+def seed_user(username, permission_codename):
+    user = User.objects.create(username=username, password='!')
+    user.user_permissions.add(role_permission(permission_codename))
+    return user
+
+
+def seed_class(size, code='9я9999'):
+    """
+    Creates a school class with size pupils and one parent per pupil
+    using bulk inserts. User names start with "bench-".
+    """
+    school_class = SchoolClass(name=code[:2], year=int(code[2:]),
+                               unique_code=code)
+    school_class.save()
+    User.objects.bulk_create([
+        User(username=f'bench-{code}-{role}-{number}', password='!')
+        for number in range(size) for role in ('student', 'parent')
+    ], batch_size=500)
+    users = dict(User.objects.filter(
+        username__startswith=f'bench-{code}-'
+    ).values_list('username', 'id'))
+    Student.objects.bulk_create([
+        Student(
+            user_id=users[f'bench-{code}-student-{number}'],
+            name='Учень', surname=f'{number:05}',
+            school_class=school_class,
+            birthday=datetime.date(2010, 1, 1)
+        ) for number in range(size)
+    ], batch_size=500)
+    Parent.objects.bulk_create([
+        Parent(
+            user_id=users[f'bench-{code}-parent-{number}'],
+            name='Батько', surname=f'{number:05}',
+            student_id=users[f'bench-{code}-student-{number}']
+        ) for number in range(size)
+    ], batch_size=500)
+    return school_class
@@ -0,0 +1,56 @@
+import csv
+import io
+from urllib.parse import quote
+from django.http import StreamingHttpResponse
+
+COLUMNS = ('date', 'class', 'subject', 'surname', 'name', 'username',
+           'grade', 'manager_mode')
+# The id comes first for the keyset, the rest are the columns
+FIELDS = ('id', 'date', 'subject__school_class__name', 'subject__name',
+          'student__surname', 'student__name', 'student__user__username',
+          'grade', 'manager_mode')
+# Grades fetched by one query and written as one piece of the response
+CHUNK_SIZE = 2000
+
+
+def grade_chunks(grades, chunk_size=CHUNK_SIZE):
+    """
+    Yields lists of FIELDS values of grades in the order of their ids,
+    one keyset query per chunk, so memory does not grow with the export.
+    """
+    last_id = 0
+    while True:
+        chunk = list(grades.filter(id__gt=last_id).order_by('id').values_list(
+            *FIELDS
+        )[:chunk_size])
+        if chunk:
+            yield chunk
+        if len(chunk) < chunk_size:
+            return
+        last_id = chunk[-1][0]
+
+
+def csv_chunks(grades, chunk_size=CHUNK_SIZE):
+    """Yields the CSV text of grades a chunk at a time, the header first."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    # The byte order mark makes Excel read the file as UTF-8
+    yield '\ufeff' + ','.join(COLUMNS) + '\r\n'
+    for chunk in grade_chunks(grades, chunk_size):
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(
+            (date.isoformat(), *values, int(manager_mode))
+            for _, date, *values, manager_mode in chunk
+        )
+        yield buffer.getvalue()
+
+
+def csv_response(grades, filename):
+    response = StreamingHttpResponse(
+        (text.encode() for text in csv_chunks(grades)),
+        content_type='text/csv; charset=utf-8'
+    )
+    response['Content-Disposition'] = \
+        f"attachment; filename*=UTF-8''{quote(filename)}"
+    return response
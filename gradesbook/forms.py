@@ -183,6 +183,84 @@ class AddGradeForm(forms.ModelForm):
         labels = {'grade': 'Оцінка: '}
 
 
+class BulkGradeForm(forms.Form):
+    student = forms.IntegerField(widget=forms.HiddenInput())
+    grade = forms.IntegerField(
+        required=False,
+        min_value=1,
+        max_value=5,
+        widget=forms.NumberInput(
+            attrs={'placeholder': '1 - 5', 'class': 'form-control input-sm'}
+        )
+    )
+
+
+BulkGradeFormSet = forms.formset_factory(BulkGradeForm, extra=0)
+
+
+class GradeCsvForm(forms.Form):
+    text = forms.CharField(
+        required=False,
+        label='Вставте рядки "учень, оцінка":',
+        widget=forms.Textarea(
+            attrs={'placeholder': 'Шевченко Іван, 5', 'rows': 6,
+                   'class': 'form-control input-sm'}
+        )
+    )
+    file = forms.FileField(
+        required=False,
+        label='або завантажте CSV файл:',
+        widget=forms.FileInput(attrs={'class': 'form-control-file'})
+    )
+
+    def clean(self):
+        cleaned_data = super().clean()
+        upload = cleaned_data.get('file')
+        if upload:
+            try:
+                cleaned_data['text'] = upload.read().decode('utf-8-sig')
+            except UnicodeDecodeError:
+                raise forms.ValidationError('Файл має бути у кодуванні UTF-8.')
+        if not cleaned_data.get('text', '').strip():
+            raise forms.ValidationError('Вставте оцінки або виберіть файл.')
+        return cleaned_data
+
+
+class RosterForm(forms.Form):
+    file = forms.FileField(
+        label='Файл CSV або XLSX:',
+        widget=forms.FileInput(attrs={'class': 'form-control-file'})
+    )
+
+
+class ExportForm(forms.Form):
+    start = forms.DateField(
+        required=False, label='З:',
+        widget=forms.DateInput(attrs={'type': 'date',
+                                      'class': 'form-control input-sm'})
+    )
+    end = forms.DateField(
+        required=False, label='По:',
+        widget=forms.DateInput(attrs={'type': 'date',
+                                      'class': 'form-control input-sm'})
+    )
+
+
+class RolloverForm(forms.Form):
+    year = forms.IntegerField(
+        min_value=1800, max_value=9998, label='Навчальний рік класів:',
+        widget=forms.NumberInput(attrs={'class': 'form-control input-sm'})
+    )
+
+
+class SearchForm(forms.Form):
+    q = forms.CharField(
+        max_length=100, label='',
+        widget=forms.TextInput(attrs={'placeholder': 'Пошук',
+                                      'class': 'form-control input-sm'})
+    )
+
+
 class MessageForm(forms.ModelForm):
     def __init__(self, *args, **kwargs):
         super(MessageForm, self).__init__(*args, **kwargs)
@@ -0,0 +1,179 @@
+import csv
+from collections import namedtuple
+from django.db import transaction
+from . import stamps
+from .jobs import enqueue
+from .models import GradeRollup, Grades, Student, Subject
+
+Journal = namedtuple('Journal', ['dates', 'rows'])
+JournalRow = namedtuple('JournalRow', ['student', 'cells'])
+
+
+def class_journal(subject):
+    """
+    Builds the class journal of a subject: pupils as rows, grade dates as
+    columns, each cell holding the grades given that day. Uses one query
+    for the pupils and one ordered query for all grades of the subject.
+    """
+    students = Student.objects.listed().filter(
+        school_class_id=subject.school_class_id
+    ).order_by('surname')
+    grades = Grades.objects.filter(subject=subject).order_by(
+        'date', 'id'
+    ).values_list('student_id', 'date', 'grade')
+
+    dates = []
+    columns = {}
+    by_student = {}
+    for student_id, date, grade in grades:
+        if date not in columns:
+            columns[date] = len(dates)
+            dates.append(date)
+        by_student.setdefault(student_id, []).append((columns[date], grade))
+
+    rows = []
+    for student in students:
+        cells = [[] for _ in dates]
+        for column, grade in by_student.get(student.pk, ()):
+            cells[column].append(grade)
+        rows.append(JournalRow(student, cells))
+    return Journal(dates, rows)
+
+
+GradeCard = namedtuple(
+    'GradeCard',
+    ['subject', 'grades', 'count', 'average', 'last', 'trend']
+)
+
+# Number of most recent grades compared with the earlier ones for the trend
+TREND_WINDOW = 3
+
+
+def grade_trend(values):
+    if len(values) < 2:
+        return None
+    window = min(TREND_WINDOW, len(values) - 1)
+    recent = sum(values[-window:]) / window
+    earlier = sum(values[:-window]) / (len(values) - window)
+    if recent > earlier:
+        return 'up'
+    elif recent < earlier:
+        return 'down'
+    return 'steady'
+
+
+def grade_cards(student):
+    """
+    Returns a GradeCard for every subject of the pupil's class with the
+    grades, their count, average, last grade and trend. Uses one query
+    for the subjects and one for all the pupil's grades.
+    """
+    subjects = Subject.objects.filter(
+        school_class_id=student.school_class_id
+    ).order_by('name')
+    grades = Grades.objects.filter(
+        student=student,
+        subject__school_class_id=student.school_class_id
+    ).order_by('date', 'id')
+
+    by_subject = {}
+    for grade in grades:
+        by_subject.setdefault(grade.subject_id, []).append(grade)
+
+    cards = []
+    for subject in subjects:
+        subject_grades = by_subject.get(subject.id, [])
+        values = [grade.grade for grade in subject_grades]
+        cards.append(GradeCard(
+            subject=subject,
+            grades=subject_grades,
+            count=len(values),
+            average=round(sum(values) / len(values), 2) if values else None,
+            last=subject_grades[-1] if subject_grades else None,
+            trend=grade_trend(values)
+        ))
+    return cards
+
+
+def student_keys(student):
+    """Ways a pupil may be named in a pasted grade list, lower case."""
+    return {
+        str(student.pk),
+        student.user.username.lower(),
+        f'{student.surname} {student.name}'.lower(),
+        f'{student.name} {student.surname}'.lower(),
+    }
+
+
+def read_grade_csv(text, students):
+    """
+    Reads "pupil, grade" lines pasted from a spreadsheet. A pupil is given
+    by user id, user name or full name. Returns (entries, errors) where
+    entries are (student, grade) pairs and errors describe bad lines.
+    """
+    lookup = {}
+    for student in students:
+        for key in student_keys(student):
+            lookup.setdefault(key, []).append(student)
+    try:
+        dialect = csv.Sniffer().sniff(text[:1024], delimiters=',;\t')
+    except csv.Error:
+        dialect = csv.excel
+
+    entries = []
+    errors = []
+    for number, row in enumerate(csv.reader(text.splitlines(), dialect), 1):
+        row = [value.strip() for value in row]
+        if not any(row):
+            continue
+        if len(row) < 2:
+            errors.append(f'Рядок {number}: очікується "учень, оцінка".')
+            continue
+        key = ' '.join(row[0].split()).lower()
+        try:
+            grade = int(row[1])
+        except ValueError:
+            if number == 1:
+                # Header of the spreadsheet
+                continue
+            errors.append(f'Рядок {number}: оцінка "{row[1]}" не є числом.')
+            continue
+        matches = lookup.get(key, [])
+        if not matches:
+            errors.append(f'Рядок {number}: учня "{row[0]}" немає в класі.')
+        elif len(matches) > 1:
+            errors.append(f'Рядок {number}: "{row[0]}" має кілька учнів, '
+                          f'вкажіть ім\'я користувача.')
+        elif not 1 <= grade <= 5:
+            errors.append(f'Рядок {number}: оцінка {grade} не від 1 до 5.')
+        else:
+            entries.append((matches[0], grade))
+    return entries, errors
+
+
+def add_grades(subject, entries, sender_id):
+    """
+    Saves the (student, grade) entries of a subject in one transaction
+    with batched inserts and queues one job sending a notification per
+    distinct grade value.
+    """
+    with transaction.atomic():
+        grades = Grades.objects.bulk_create([
+            Grades(subject=subject, student=student, grade=grade)
+            for student, grade in entries
+        ], batch_size=500)
+        GradeRollup.objects.add([
+            (subject.school_class_id, subject.id, grade.date, grade.grade)
+            for grade in grades
+        ])
+        stamps.bump({stamps.PUPIL.format(student.pk)
+                     for student, _ in entries})
+        groups = {}
+        for student, grade in entries:
+            groups.setdefault(grade, []).append(student.user_id)
+        enqueue(
+            'notify_grades',
+            sender_id=sender_id,
+            subject_name=subject.name,
+            groups={str(grade): user_ids for grade, user_ids in groups.items()}
+        )
@@ -0,0 +1,40 @@
+# The Material Icons used by the templates, as SVG paths on a 24x24
+# canvas. Material Icons are by Google, under the Apache License 2.0.
+# Pages draw them inline instead of loading the icon font from Google
+# Fonts, which blocked rendering and needed a connection to Google.
+ICONS = {
+    'arrow_forward': 'M12 4l-1.41 1.41L16.17 11H4v2h12.17l-5.58 5.59L12 20'
+                     'l8-8z',
+    'border_color': 'M22 24H2v-4h20v4zM13.06 5.19l3.75 3.75L7.75 18H4v-3.75'
+                    'l9.06-9.06zm4.82 2.68l-3.75-3.75 1.83-1.83c.39-.39 '
+                    '1.02-.39 1.41 0l2.34 2.34c.39.39.39 1.02 0 1.41'
+                    'l-1.83 1.83z',
+    'check': 'M9 16.17L4.83 12l-1.42 1.41L9 19 21 7l-1.41-1.41z',
+    'check_circle': 'M12 2C6.48 2 2 6.48 2 12s4.48 10 10 10 10-4.48 10-10'
+                    'S17.52 2 12 2zm-2 15l-5-5 1.41-1.41L10 14.17l7.59-7.59'
+                    'L19 8l-9 9z',
+    'clear': 'M19 6.41L17.59 5 12 10.59 6.41 5 5 6.41 10.59 12 5 17.59 '
+             '6.41 19 12 13.41 17.59 19 19 17.59 13.41 12z',
+    'close': 'M19 6.41L17.59 5 12 10.59 6.41 5 5 6.41 10.59 12 5 17.59 '
+             '6.41 19 12 13.41 17.59 19 19 17.59 13.41 12z',
+    'face': 'M9 11.75c-.69 0-1.25.56-1.25 1.25s.56 1.25 1.25 1.25 '
+            '1.25-.56 1.25-1.25-.56-1.25-1.25-1.25zm6 0c-.69 0-1.25.56'
+            '-1.25 1.25s.56 1.25 1.25 1.25 1.25-.56 1.25-1.25-.56-1.25'
+            '-1.25-1.25zM12 2C6.48 2 2 6.48 2 12s4.48 10 10 10 10-4.48 '
+            '10-10S17.52 2 12 2zm0 18c-4.41 0-8-3.59-8-8 0-.29.02-.58.05'
+            '-.86 2.36-1.05 4.23-2.98 5.21-5.37C11.07 8.33 14.05 10 17.42 '
+            '10c.78 0 1.53-.09 2.25-.26.21.71.33 1.47.33 2.26 0 4.41-3.59 '
+            '8-8 8z',
+    'mail': 'M20 4H4c-1.1 0-1.99.9-1.99 2L2 18c0 1.1.9 2 2 2h16c1.1 0 '
+            '2-.9 2-2V6c0-1.1-.9-2-2-2zm0 4l-8 5-8-5V6l8 5 8-5v2z',
+    'mail_outline': 'M20 4H4c-1.1 0-1.99.9-1.99 2L2 18c0 1.1.9 2 2 2h16'
+                    'c1.1 0 2-.9 2-2V6c0-1.1-.9-2-2-2zm0 14H4V8l8 5 8-5v10z'
+                    'm-8-7L4 6h16l-8 5z',
+    'panorama_fish_eye': 'M12 2C6.47 2 2 6.47 2 12s4.47 10 10 10 10-4.47 '
+                         '10-10S17.53 2 12 2zm0 18c-4.41 0-8-3.59-8-8s3.59'
+                         '-8 8-8 8 3.59 8 8-3.59 8-8 8z',
+    'person': 'M12 12c2.21 0 4-1.79 4-4s-1.79-4-4-4-4 1.79-4 4 1.79 4 4 4z'
+              'm0 2c-2.67 0-8 1.34-8 4v2h16v-2c0-2.66-5.33-4-8-4z',
+    'remove_circle': 'M12 2C6.48 2 2 6.48 2 12s4.48 10 10 10 10-4.48 10-10'
+                     'S17.52 2 12 2zm5 11H7v-2h10v2z',
+}
@@ -0,0 +1,105 @@
+import json
+import logging
+import traceback
+import uuid
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+# Running jobs whose worker did not report back within the lease, from
+# their claim or from the start of their run, are considered abandoned and
+# may be claimed again
+LEASE = timedelta(minutes=10)
+BACKOFF_BASE = 5
+BACKOFF_LIMIT = 3600
+
+registry = {}
+
+
+def task(name):
+    def register(function):
+        registry[name] = function
+        return function
+    return register
+
+
+def enqueue(name, run_after=None, max_attempts=5, **payload):
+    """
+    Stores a job in the database. With settings.JOBS_EAGER the job runs
+    immediately in the calling process instead, like in tests.
+    """
+    if name not in registry:
+        raise ValueError(f'Unknown job {name}.')
+    if getattr(settings, 'JOBS_EAGER', False):
+        registry[name](**payload)
+        return None
+    return Job.objects.create(
+        name=name,
+        payload=json.dumps(payload),
+        run_after=run_after or timezone.now(),
+        max_attempts=max_attempts
+    )
+
+
+def backoff(attempts):
+    return timedelta(seconds=min(BACKOFF_BASE * 2 ** attempts, BACKOFF_LIMIT))
+
+
+def claim(worker, batch_size=10):
+    now = timezone.now()
+    ready = Q(status=Job.QUEUED, run_after__lte=now) | \
+        Q(status=Job.RUNNING, claimed_at__lt=now - LEASE)
+    token = f'{worker[:48]}:{uuid.uuid4().hex[:12]}'
+    # A single UPDATE takes the write lock straight away, so concurrent
+    # workers never claim the same job and SQLite does not have to upgrade
+    # a read lock inside a transaction
+    batch = Job.objects.filter(ready).order_by('run_after', 'id').values(
+        'id'
+    )[:batch_size]
+    claimed = Job.objects.filter(ready, id__in=batch).update(
+        status=Job.RUNNING,
+        claimed_by=token,
+        claimed_at=now,
+        attempts=F('attempts') + 1
+    )
+    if not claimed:
+        return []
+    return list(Job.objects.filter(claimed_by=token, status=Job.RUNNING))
+
+
+def run(job):
+    """
+    Runs a claimed job, then deletes it, or queues it again after a
+    backoff when it fails. Returns whether it succeeded, None when the
+    lease was lost and the job is left to the worker that claimed it.
+    """
+    # Later jobs of a batch wait for the earlier ones, so the lease is
+    # renewed, unless another worker claimed the job meanwhile
+    renewed = Job.objects.filter(
+        id=job.id, claimed_by=job.claimed_by, status=Job.RUNNING
+    ).update(claimed_at=timezone.now())
+    if not renewed:
+        return None
+    try:
+        with transaction.atomic():
+            registry[job.name](**json.loads(job.payload))
+    except Exception:
+        error = traceback.format_exc()
+        logger.warning('Job %s failed:\n%s', job, error)
+        failed = Job.objects.filter(id=job.id, claimed_by=job.claimed_by)
+        if job.attempts >= job.max_attempts:
+            failed.update(status=Job.DEAD, last_error=error)
+        else:
+            failed.update(
+                status=Job.QUEUED,
+                run_after=timezone.now() + backoff(job.attempts),
+                last_error=error
+            )
+        return False
+    Job.objects.filter(id=job.id, claimed_by=job.claimed_by).delete()
+    return True
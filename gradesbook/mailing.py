@@ -0,0 +1,59 @@
+from django.contrib.auth.models import Permission, User
+from . import stamps
+from .models import InboxEntry, UnreadCounter
+
+SCHOOL_STUDENTS = 8
+SCHOOL_PARENTS = 9
+
+
+def recipient_users(prefix, target=None):
+    """
+    Returns a queryset with ids of every user addressed by a message.
+    The prefixes match the ones described in CreateMessageView, target is
+    the already resolved school class, subject, student or teacher.
+    """
+    # Pupils and parents waiting to be deleted get no mail, see
+    # StudentQuerySet.listed
+    users = User.objects.filter(is_active=True)
+    if prefix == 1:
+        users = users.filter(student__school_class=target)
+    elif prefix == 2:
+        users = users.filter(parent__student__school_class=target)
+    elif prefix == 3:
+        users = users.filter(teacher__subjectteachers__subject=target)
+    elif prefix == 4:
+        users = users.filter(student=target)
+    elif prefix == 5:
+        users = users.filter(parent__student=target)
+    elif prefix == 6:
+        users = users.filter(
+            user_permissions=Permission.objects.get(codename='manager')
+        )
+    elif prefix == 7:
+        users = users.filter(teacher=target)
+    elif prefix == SCHOOL_STUDENTS:
+        users = users.filter(student__school_class__active=True)
+    elif prefix == SCHOOL_PARENTS:
+        users = users.filter(parent__student__school_class__active=True)
+    else:
+        raise ValueError(f'Unknown recipient prefix {prefix}.')
+    return users.values_list('id', flat=True).distinct()
+
+
+def deliver(message, user_ids, batch_size=500):
+    """
+    Writes one InboxEntry per user in batches. Must be called inside a
+    transaction, returns the number of recipients.
+    """
+    user_ids = list(user_ids)
+    if not user_ids:
+        return 0
+    InboxEntry.objects.bulk_create(
+        [InboxEntry(user_id=user_id, message=message,
+                    sender_id=message.sender_id, date=message.date)
+         for user_id in user_ids],
+        batch_size=batch_size
+    )
+    UnreadCounter.objects.increment(user_ids)
+    stamps.bump(stamps.INBOX.format(user_id) for user_id in user_ids)
+    return len(user_ids)
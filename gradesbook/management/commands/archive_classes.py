@@ -0,0 +1,56 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
+from gradesbook.archive import CHUNK_SIZE, archive_class, restore_class
+from gradesbook.models import ArchivedSubject, SchoolClass, Subject
+
+
+class Command(BaseCommand):
+    help = 'Moves the subjects, timetable and grades of inactive classes ' \
+           'to the archive tables, one transaction per chunk of subjects. ' \
+           '--restore moves classes back.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('codes', nargs='*',
+                            help='Unique codes of the classes, every '
+                                 'inactive class by default.')
+        parser.add_argument('--restore', action='store_true')
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE,
+                            help='Subjects moved in one transaction.')
+
+    def handle(self, *args, **options):
+        classes = SchoolClass.objects.order_by('unique_code')
+        if options['codes']:
+            classes = classes.filter(unique_code__in=options['codes'])
+            missing = set(options['codes']) - {
+                school_class.unique_code for school_class in classes
+            }
+            if missing:
+                raise CommandError(f'Unknown classes: {", ".join(missing)}')
+        if options['restore']:
+            # Also classes whose restore was cut short
+            classes = classes.filter(
+                Q(archived=True) | Q(archivedsubject__isnull=False)
+            ).distinct()
+        else:
+            if classes.filter(active=True).exists() and options['codes']:
+                raise CommandError('Only inactive classes can be archived.')
+            classes = classes.filter(active=False)
+        for school_class in classes:
+            started = time.perf_counter()
+            if options['restore']:
+                subjects = ArchivedSubject.objects.filter(
+                    school_class=school_class
+                ).count()
+                restore_class(school_class, options['chunk_size'])
+                action = 'Restored'
+            else:
+                subjects = Subject.objects.filter(
+                    school_class=school_class
+                ).count()
+                archive_class(school_class, options['chunk_size'])
+                action = 'Archived'
+            self.stdout.write(
+                f'{action} {school_class.unique_code}: {subjects} subjects '
+                f'in {time.perf_counter() - started:.1f} s'
+            )
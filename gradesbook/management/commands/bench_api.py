@@ -0,0 +1,94 @@
+import gzip
+import statistics
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from gradesbook.api import issue_token
+from gradesbook.benchmark import rolled_back
+from gradesbook.models import InboxEntry, Student
+
+# Pages of a pupil and the API requests reading the same data: page name,
+# (route, args) of the page, [(route, args, params)] of the API. The
+# mailbox shows 15 received and 15 sent messages
+PAIRS = (
+    ('grades', ('student_parent', []), [('api_subjects', [], {})]),
+    ('timetable', ('timetable', ['student']),
+     [('api_timetable', ['student'], {})]),
+    ('mailbox', ('mailbox', []),
+     [('api_received', [], {'limit': 15}), ('api_sent', [], {'limit': 15})]),
+)
+
+
+class Command(BaseCommand):
+    help = 'Compares bytes, queries and server time of the pages of a ' \
+           'pupil with the JSON API requests reading the same data. Run ' \
+           'it against a database filled by seed_school.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=50)
+
+    def measure(self, client, requests, repeat, headers):
+        """
+        Returns (bytes, gzip bytes, queries, median ms) of a series of
+        requests, the sizes and queries of the last run.
+        """
+        timings = []
+        for _ in range(repeat):
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                responses = [client.get(url, params, **headers)
+                             for url, params in requests]
+                timings.append((time.perf_counter() - started) * 1000)
+        for response, (url, _) in zip(responses, requests):
+            if response.status_code != 200:
+                raise CommandError(f'{url} answered {response.status_code}.')
+        contents = [response.content for response in responses]
+        return (sum(len(content) for content in contents),
+                sum(len(gzip.compress(content)) for content in contents),
+                len(queries), statistics.median(timings))
+
+    def handle(self, *args, **options):
+        pupil = Student.objects.filter(
+            user__in=InboxEntry.objects.values('user'),
+            grades__isnull=False
+        ).select_related('user').first()
+        if pupil is None:
+            raise CommandError('No pupil with grades and mail, run '
+                               'seed_school first.')
+        self.stdout.write(f'{"page":<10} {"format":<8} {"bytes":>8} '
+                          f'{"gzip":>7} {"queries":>8} {"median ms":>10}')
+        with rolled_back():
+            browser = Client()
+            browser.force_login(pupil.user)
+            app = Client()
+            token = {
+                'HTTP_AUTHORIZATION': f'Bearer {issue_token(pupil.user)}'
+            }
+            for name, (route, args), calls in PAIRS:
+                page = [(reverse(f'gradesbook:{route}', args=args), {})]
+                api = [(reverse(f'gradesbook:{route}', args=args), params)
+                       for route, args, params in calls]
+                compact = [(url, dict(params, compact=1))
+                           for url, params in api]
+                html = None
+                for kind, client, requests, headers in (
+                        ('html', browser, page, {}),
+                        ('json', app, api, token),
+                        ('compact', app, compact, token)):
+                    # The first request fills the caches
+                    self.measure(client, requests, 1, headers)
+                    size, compressed, queries, median = self.measure(
+                        client, requests, options['repeat'], headers
+                    )
+                    html = html or (size, median)
+                    self.stdout.write(
+                        f'{name:<10} {kind:<8} {size:>8} {compressed:>7} '
+                        f'{queries:>8} {median:>10.2f}'
+                    )
+                self.stdout.write(
+                    f'{name}: compact JSON is {size / html[0]:.0%} of the '
+                    f'bytes and {median / html[1]:.0%} of the time of the page'
+                )
@@ -0,0 +1,46 @@
+import time
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from gradesbook.benchmark import rolled_back, seed_class, seed_user
+from gradesbook.mailing import deliver, recipient_users
+from gradesbook.models import Message
+
+
+class Command(BaseCommand):
+    help = 'Measures statements and wall time of a class-wide broadcast ' \
+           'against the number of recipients. All data is rolled back.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', nargs='+', type=int, default=[35, 250, 1000, 2000],
+            help='Number of pupils in the benchmarked class.'
+        )
+
+    def broadcast(self, prefix, school_class, sender_user):
+        with transaction.atomic():
+            message = Message(subject='Збори', text='Батьківські збори',
+                              sender=sender_user)
+            message.save()
+            return deliver(message, recipient_users(prefix, school_class))
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            f'{"prefix":>6} {"recipients":>10} {"statements":>10} '
+            f'{"seconds":>9}'
+        )
+        for size in options['sizes']:
+            with rolled_back():
+                school_class = seed_class(size)
+                manager = seed_user('bench-manager', 'manager')
+                for prefix in (1, 2):
+                    with CaptureQueriesContext(connection) as queries:
+                        started = time.perf_counter()
+                        recipients = self.broadcast(
+                            prefix, school_class, manager
+                        )
+                        elapsed = time.perf_counter() - started
+                    self.stdout.write(
+                        f'{prefix:>6} {recipients:>10} '
+                        f'{len(queries):>10} {elapsed:>9.4f}'
+                    )
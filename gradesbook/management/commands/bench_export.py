@@ -0,0 +1,67 @@
+import time
+import tracemalloc
+from io import StringIO
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from gradesbook.benchmark import rolled_back
+from gradesbook.export import CHUNK_SIZE, csv_chunks
+from gradesbook.models import Grades
+
+PUPILS_PER_CLASS = 30
+
+
+class Command(BaseCommand):
+    help = 'Seeds a school with seed_school inside a rolled back ' \
+           'transaction and streams the CSV export of all its grades, ' \
+           'reporting rows per second and the peak memory of the export.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--classes', type=int, default=30)
+        parser.add_argument('--days', type=int, default=270,
+                            help='Days of grades, a school year by default.')
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+        parser.add_argument(
+            '--max-memory', type=float, default=20,
+            help='Megabytes of Python memory the export may peak at.'
+        )
+
+    def handle(self, *args, **options):
+        with rolled_back():
+            seeding = time.perf_counter()
+            call_command('seed_school', classes=options['classes'],
+                         pupils=PUPILS_PER_CLASS, days=options['days'],
+                         stdout=StringIO())
+            self.stdout.write(
+                f'Seeded {options["classes"]} classes in '
+                f'{time.perf_counter() - seeding:.1f} s'
+            )
+            rows = Grades.objects.count()
+            written = 0
+            started = time.perf_counter()
+            first_rows = None
+            for text in csv_chunks(Grades.objects.all(),
+                                   options['chunk_size']):
+                # The header goes out before the first query
+                if written and first_rows is None:
+                    first_rows = time.perf_counter() - started
+                written += len(text.encode())
+            elapsed = time.perf_counter() - started
+            # Traced apart from the timed run, tracing slows it down
+            tracemalloc.start()
+            for _ in csv_chunks(Grades.objects.all(), options['chunk_size']):
+                pass
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+        peak /= 1024 * 1024
+        self.stdout.write(
+            f'{rows} rows, {written / 1024 / 1024:.1f} MB of CSV in '
+            f'{elapsed:.1f} s: {rows / elapsed:.0f} rows/s, first rows '
+            f'after {(first_rows or 0) * 1000:.0f} ms, peak memory '
+            f'{peak:.1f} MB'
+        )
+        if peak > options['max_memory']:
+            raise CommandError(
+                f'The export peaked at {peak:.1f} MB, over the limit of '
+                f'{options["max_memory"]} MB'
+            )
+        self.stdout.write(self.style.SUCCESS('Memory stayed within limit'))
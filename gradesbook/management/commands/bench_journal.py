@@ -0,0 +1,85 @@
+import datetime
+import random
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from gradesbook.benchmark import rolled_back, seed_class, seed_user
+from gradesbook.models import Grades, Student, Subject
+
+
+class Command(BaseCommand):
+    help = 'Renders TeacherSubjectView for growing classes and terms and ' \
+           'checks that the number of queries stays the same.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', nargs='+', type=int, default=[5, 20, 40],
+            help='Number of pupils in the benchmarked class.'
+        )
+        parser.add_argument(
+            '--days', nargs='+', type=int, default=[1, 30, 90],
+            help='Number of lesson days with a grade for every pupil.'
+        )
+
+    def seed_grades(self, subject, days):
+        today = timezone.localdate()
+        student_ids = list(Student.objects.filter(
+            school_class_id=subject.school_class_id
+        ).values_list('pk', flat=True))
+        for day in range(days, 0, -1):
+            Grades.objects.bulk_create([
+                Grades(subject=subject, student_id=student_id,
+                       grade=random.randint(1, 5))
+                for student_id in student_ids
+            ], batch_size=500)
+            # date is filled with today by auto_now_add
+            Grades.objects.filter(subject=subject, date=today).update(
+                date=today - datetime.timedelta(days=day)
+            )
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            f'{"pupils":>6} {"days":>5} {"grades":>7} {"queries":>7} '
+            f'{"seconds":>8}'
+        )
+        query_counts = set()
+        for size in options['sizes']:
+            for days in options['days']:
+                with rolled_back():
+                    school_class = seed_class(size)
+                    subject = Subject.objects.create(
+                        name='Математика',
+                        unique_code=f'М{school_class.unique_code}',
+                        school_class=school_class
+                    )
+                    self.seed_grades(subject, days)
+                    client = Client()
+                    client.force_login(seed_user('bench-teacher', 'teacher'))
+                    url = reverse(
+                        'gradesbook:teacher_subject',
+                        kwargs={'subject_unique_code': subject.unique_code}
+                    )
+                    with CaptureQueriesContext(connection) as queries:
+                        started = time.perf_counter()
+                        response = client.get(url)
+                        elapsed = time.perf_counter() - started
+                    if response.status_code != 200:
+                        raise CommandError(
+                            f'{url} answered {response.status_code}'
+                        )
+                    query_counts.add(len(queries))
+                    self.stdout.write(
+                        f'{size:>6} {days:>5} {size * days:>7} '
+                        f'{len(queries):>7} {elapsed:>8.4f}'
+                    )
+        if len(query_counts) > 1:
+            raise CommandError(
+                f'Query count depends on the class size: {query_counts}'
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'Constant number of queries: {query_counts.pop()}'
+        ))
@@ -0,0 +1,164 @@
+import datetime
+import random
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from gradesbook.benchmark import seed_class, seed_user
+from gradesbook.bulk import bulk_insert
+from gradesbook.mailing import deliver, recipient_users
+from gradesbook.models import (CanceledGrades, GradeRollup, Grades,
+                               InboxEntry, Message, SchoolClass, Student,
+                               Subject, SubjectDate)
+from gradesbook.rollups import rebuild_rollups
+
+SUBJECTS_PER_CLASS = 10
+PUPILS_PER_CLASS = 30
+
+
+class Command(BaseCommand):
+    help = 'Prints EXPLAIN QUERY PLAN and timings of the hot gradebook ' \
+           'queries and reports those that do not use their index. ' \
+           'Run it against a copy of the database, --seed-grades writes ' \
+           'synthetic data.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--seed-grades', type=int, default=0,
+            help='Add synthetic classes and grades to the configured '
+                 'database until it holds this many grades.'
+        )
+        parser.add_argument(
+            '--repeat', type=int, default=20,
+            help='Number of runs every query is timed over.'
+        )
+        parser.add_argument(
+            '--strict', action='store_true',
+            help='Exit with an error if a query misses its index.'
+        )
+
+    def seed(self, target):
+        missing = target - Grades.objects.count()
+        if missing <= 0:
+            return
+        per_class = PUPILS_PER_CLASS * SUBJECTS_PER_CLASS
+        # Roughly a school year of grades for every pupil and subject
+        classes = max(1, missing // (per_class * 60))
+        today = timezone.localdate()
+        first = SchoolClass.objects.filter(year__gte=5000).count()
+        for number in range(first, first + classes):
+            with transaction.atomic():
+                code = f'{number % 9 + 1}я{5000 + number}'
+                school_class = seed_class(PUPILS_PER_CLASS, code)
+                Subject.objects.bulk_create([
+                    Subject(name=f'Предмет {subject}',
+                            unique_code=f'П{subject}{code}',
+                            school_class=school_class)
+                    for subject in range(SUBJECTS_PER_CLASS)
+                ])
+                subject_ids = list(Subject.objects.filter(
+                    school_class=school_class
+                ).values_list('id', flat=True))
+                student_ids = list(Student.objects.filter(
+                    school_class=school_class
+                ).values_list('pk', flat=True))
+                SubjectDate.objects.bulk_create([
+                    SubjectDate(subject_id=subject_id,
+                                day=SubjectDate.DAYS[index % 6][0],
+                                lesson_number=index % 8 + 1)
+                    for index, subject_id in enumerate(subject_ids)
+                ])
+                rows = missing // classes // per_class
+                bulk_insert(
+                    Grades,
+                    ('grade', 'student_id', 'subject_id', 'date',
+                     'manager_mode'),
+                    (
+                        (random.randint(1, 5), student_id, subject_id,
+                         today - datetime.timedelta(days=day % 270),
+                         day % 20 == 0)
+                        for subject_id in subject_ids
+                        for student_id in student_ids
+                        for day in range(rows)
+                    )
+                )
+                rebuild_rollups(subject_ids)
+                manager = seed_user(f'bench-{code}-manager', 'manager')
+                for broadcast in range(20):
+                    message = Message.objects.create(
+                        subject='Оголошення', text='Текст', sender=manager,
+                        recipient=school_class.name
+                    )
+                    deliver(message,
+                            recipient_users(broadcast % 2 + 1, school_class))
+            self.stdout.write(f'Seeded class {code}')
+
+    def hot_queries(self):
+        subject = Subject.objects.order_by('-id').first()
+        student = Student.objects.filter(
+            school_class_id=subject.school_class_id
+        ).first()
+        user_id = InboxEntry.objects.order_by('-id').values_list(
+            'user', flat=True
+        ).first()
+        sender_user_id = Message.objects.order_by('-id').values_list(
+            'sender', flat=True
+        ).first()
+        return [
+            ('grades of pupil in subject', 'grades_subject_student_idx',
+             Grades.objects.filter(subject=subject, student=student)),
+            ('subject grade history', 'grades_subject_mode_date_idx',
+             Grades.objects.filter(subject=subject, manager_mode=False)
+             .order_by('date')[:10]),
+            ('canceled grades of pupil', 'canceled_subject_student_idx',
+             CanceledGrades.objects.filter(subject=subject, student=student)),
+            ('canceled grade history', 'canceled_subject_date_idx',
+             CanceledGrades.objects.filter(subject=subject)
+             .order_by('date')[:10]),
+            ('unread mail', 'inbox_user_read_idx',
+             InboxEntry.objects.filter(user_id=user_id,
+                                       read=False).order_by('-id')[:15]),
+            # Served by the foreign key index of the sender
+            ('sent mail', None,
+             Message.objects.filter(sender_id=sender_user_id)
+             .order_by('-id')[:15]),
+            ('lesson slot', 'subjectdate_slot_idx',
+             SubjectDate.objects.filter(subject=subject, day='Mo',
+                                        lesson_number=1)),
+            ('weekly trend of class', 'rollup_class_week_idx',
+             GradeRollup.objects.filter(
+                 school_class_id=subject.school_class_id,
+                 week__gte=timezone.localdate() - datetime.timedelta(weeks=12)
+             )),
+        ]
+
+    def handle(self, *args, **options):
+        if options['seed_grades']:
+            self.seed(options['seed_grades'])
+        if not Subject.objects.exists():
+            raise CommandError('The database is empty, use --seed-grades.')
+        self.stdout.write(f'Grades: {Grades.objects.count()}')
+        missing = []
+        for name, index, queryset in self.hot_queries():
+            plan = queryset.explain()
+            started = time.perf_counter()
+            for _ in range(options['repeat']):
+                list(queryset.all())
+            elapsed = (time.perf_counter() - started) / options['repeat']
+            if index:
+                uses_index = index in plan
+            else:
+                index = 'an index'
+                uses_index = not any(
+                    'SCAN' in line and 'USING' not in line
+                    for line in plan.splitlines()
+                )
+            if not uses_index:
+                missing.append(name)
+            self.stdout.write(
+                f'\n{name}: {elapsed * 1000:.3f} ms, '
+                f'{index} {"used" if uses_index else "NOT USED"}'
+            )
+            self.stdout.write(plan)
+        if missing and options['strict']:
+            raise CommandError(f'Queries without their index: {missing}')
@@ -0,0 +1,96 @@
+import random
+import statistics
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from gradesbook.benchmark import rolled_back, seed_class, seed_user
+from gradesbook.bulk import bulk_insert
+from gradesbook.models import InboxEntry, Message
+from gradesbook.search import available, search_mail
+
+WORDS = (
+    'оголошення', 'збори', 'батьківські', 'розклад', 'контрольна', 'робота',
+    'математика', 'історія', 'екскурсія', 'канікули', 'оцінка', 'тиждень',
+    'наступний', 'нагадуємо', 'учні', 'батьки', 'домашнє', 'завдання',
+    'сімʼя', 'їдальня', 'олімпіада', 'йога', 'єдиний', 'ґанок', 'урок',
+)
+# Generated words are rare, like names and places in real mail
+RARE_WORDS = 50000
+QUERIES = ('збори', 'контр роб', 'ек', 'олімпіада їдальня', 'слово123',
+           'слово4999')
+
+
+class Command(BaseCommand):
+    help = 'Inserts messages inside a rolled back transaction and times ' \
+           'full-text searches of a manager and of a pupil over them.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--messages', type=int, default=1000000)
+        parser.add_argument(
+            '--inbox-share', type=int, default=250,
+            help='The pupil receives every this many messages.'
+        )
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument(
+            '--target', type=float, default=10.0,
+            help='Milliseconds the median search may take.'
+        )
+
+    def messages(self, count, sender_id, rng):
+        now = timezone.now()
+        for number in range(count):
+            words = rng.choices(WORDS, k=12) + [
+                f'слово{rng.randrange(RARE_WORDS)}' for _ in range(3)
+            ]
+            yield (' '.join(words[:3]), ' '.join(words[3:]), now, sender_id,
+                   'Оголошення')
+
+    def handle(self, *args, **options):
+        if not available():
+            raise CommandError('Search needs an SQLite database with FTS5.')
+        rng = random.Random(2021)
+        with rolled_back():
+            seeding = time.perf_counter()
+            manager = seed_user('bench-search-manager', 'manager')
+            pupil = seed_class(1).student_set.get().user
+            first = (Message.objects.order_by('-id').values_list(
+                'id', flat=True
+            ).first() or 0) + 1
+            bulk_insert(Message,
+                        ('subject', 'text', 'date', 'sender_id', 'recipient'),
+                        self.messages(options['messages'], manager.id, rng))
+            bulk_insert(InboxEntry,
+                        ('user_id', 'message_id', 'sender_id', 'read', 'date'),
+                        ((pupil.id, message_id, manager.id, False,
+                          timezone.now())
+                         for message_id in range(
+                             first, first + options['messages'],
+                             options['inbox_share'])))
+            self.stdout.write(
+                f'Inserted {options["messages"]} messages in '
+                f'{time.perf_counter() - seeding:.1f} s'
+            )
+            self.stdout.write(f'{"query":<20} {"role":<8} {"hits":>5} '
+                              f'{"median ms":>10} {"max ms":>8}')
+            slowest = 0
+            for query in QUERIES:
+                for user, role in ((manager, 'manager'), (pupil, 'student')):
+                    timings = []
+                    for _ in range(options['repeat']):
+                        started = time.perf_counter()
+                        hits = search_mail(user, role, query)
+                        timings.append((time.perf_counter() - started) * 1000)
+                    median = statistics.median(timings)
+                    slowest = max(slowest, median)
+                    self.stdout.write(
+                        f'{query:<20} {role:<8} {len(hits):>5} '
+                        f'{median:>10.2f} {max(timings):>8.2f}'
+                    )
+        if slowest > options['target']:
+            raise CommandError(
+                f'The slowest median search took {slowest:.2f} ms, over the '
+                f'target of {options["target"]} ms'
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'The slowest median search took {slowest:.2f} ms'
+        ))
@@ -0,0 +1,67 @@
+import datetime
+import time
+from io import StringIO
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from gradesbook.benchmark import rolled_back
+from gradesbook.terms import compute, load_term, np, save_results
+
+PUPILS_PER_CLASS = 30
+
+
+class Command(BaseCommand):
+    help = 'Seeds a school with seed_school inside a rolled back ' \
+           'transaction and times the term results of all its pupils.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pupils', type=int, default=2000)
+        parser.add_argument('--days', type=int, default=90,
+                            help='Length of the term in days.')
+        parser.add_argument('--repeat', type=int, default=3)
+        parser.add_argument(
+            '--target', type=float, default=3.0,
+            help='Seconds the slowest run may take, including the load '
+                 'and the bulk write.'
+        )
+
+    def handle(self, *args, **options):
+        if np is None:
+            raise CommandError('Term results need the numpy package.')
+        end = timezone.localdate()
+        start = end - datetime.timedelta(days=options['days'])
+        classes = -(-options['pupils'] // PUPILS_PER_CLASS)
+        with rolled_back():
+            seeding = time.perf_counter()
+            call_command('seed_school', classes=classes,
+                         pupils=PUPILS_PER_CLASS, days=options['days'],
+                         stdout=StringIO())
+            self.stdout.write(
+                f'Seeded {classes * PUPILS_PER_CLASS} pupils in '
+                f'{time.perf_counter() - seeding:.1f} s'
+            )
+            self.stdout.write(f'{"load":>8} {"compute":>8} {"save":>8} '
+                              f'{"total":>8} {"grades":>8} {"results":>8}')
+            slowest = 0
+            for _ in range(options['repeat']):
+                started = time.perf_counter()
+                grades = load_term(start, end)
+                loaded = time.perf_counter()
+                results = compute(grades)
+                computed = time.perf_counter()
+                written = save_results(results, start, end)
+                saved = time.perf_counter()
+                slowest = max(slowest, saved - started)
+                self.stdout.write(
+                    f'{loaded - started:>8.3f} {computed - loaded:>8.3f} '
+                    f'{saved - computed:>8.3f} {saved - started:>8.3f} '
+                    f'{len(grades.grade):>8} {written:>8}'
+                )
+        if slowest > options['target']:
+            raise CommandError(
+                f'The slowest run took {slowest:.2f} s, over the target of '
+                f'{options["target"]} s'
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'The slowest run took {slowest:.2f} s'
+        ))
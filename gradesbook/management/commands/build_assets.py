@@ -0,0 +1,22 @@
+import os
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from gradesbook.assets import ENCODINGS, build
+
+
+class Command(BaseCommand):
+    help = 'Collects the static files and builds the minified, content ' \
+           'hashed and precompressed bundles the pages load.'
+
+    def handle(self, *args, **options):
+        call_command('collectstatic', interactive=False, verbosity=0)
+        for name, built in build().items():
+            path = os.path.join(settings.STATIC_ROOT, built)
+            sizes = [f'{os.path.getsize(path) // 1024} KB']
+            for encoding, suffix in ENCODINGS:
+                if os.path.isfile(path + suffix):
+                    size = os.path.getsize(path + suffix) // 1024
+                    sizes.append(f'{size} KB {encoding}')
+            self.stdout.write(f'{name} -> {built} ({", ".join(sizes)})')
+        self.stdout.write(self.style.SUCCESS('Assets built.'))
@@ -0,0 +1,35 @@
+import datetime
+import time
+from django.core.management.base import BaseCommand, CommandError
+from gradesbook.terms import compute_term, current_term, np
+
+
+def date(value):
+    return datetime.date.fromisoformat(value)
+
+
+class Command(BaseCommand):
+    help = 'Computes final grades, ranks and at risk flags of every pupil ' \
+           'in every subject of a term and replaces its saved results.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', type=date,
+                            help='First day of the term, YYYY-MM-DD. The '
+                                 'current term by default.')
+        parser.add_argument('--end', type=date,
+                            help='Last day of the term, YYYY-MM-DD.')
+
+    def handle(self, *args, **options):
+        if np is None:
+            raise CommandError('Term results need the numpy package.')
+        start, end = current_term()
+        start = options['start'] or start
+        end = options['end'] or end
+        if start > end:
+            raise CommandError('The term ends before it starts.')
+        started = time.perf_counter()
+        written = compute_term(start, end)
+        self.stdout.write(self.style.SUCCESS(
+            f'Wrote {written} results of the term {start} – {end} in '
+            f'{time.perf_counter() - started:.1f} s.'
+        ))
@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand, CommandError
+from gradesbook.models import SchoolClass
+from gradesbook.roster import (CHUNK_SIZE, RosterFormatError,
+                               import_roster)
+
+
+class Command(BaseCommand):
+    help = 'Imports pupils and parents from a CSV or XLSX roster. Nothing ' \
+           'is created unless every row is valid.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument(
+            '--class', dest='class_code',
+            help='Unique code of the class all pupils go to, otherwise '
+                 'the class column of the roster is used.'
+        )
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE,
+                            help='Rows created in one transaction.')
+
+    def handle(self, *args, **options):
+        school_class = None
+        if options['class_code']:
+            try:
+                school_class = SchoolClass.objects.get(
+                    unique_code=options['class_code']
+                )
+            except SchoolClass.DoesNotExist:
+                raise CommandError(f'No class {options["class_code"]}.')
+        try:
+            with open(options['path'], 'rb') as file:
+                result = import_roster(file, options['path'], school_class,
+                                       options['chunk_size'])
+        except (OSError, RosterFormatError) as error:
+            raise CommandError(error)
+
+        for error in result.errors:
+            self.stderr.write(f'line {error.line}: {error.message}')
+        if result.errors:
+            raise CommandError(
+                f'{len(result.errors)} of {result.rows} rows are invalid, '
+                f'nothing was imported.'
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {result.students} pupils and {result.parents} '
+            f'parents from {result.rows} rows in {result.seconds:.1f} s '
+            f'({result.rows / max(result.seconds, 0.001):.0f} rows/s).'
+        ))
@@ -0,0 +1,209 @@
+import json
+import random
+import threading
+import time
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, connection
+from django.test import Client
+from django.urls import reverse
+from gradesbook.models import (InboxEntry, Parent, SchoolClass, Student,
+                               Subject, SubjectTeachers, Teacher)
+
+# Share of sessions started by every role, like a school day where pupils
+# and parents check grades far more often than staff works with the site
+MIX = {'student': 45, 'parent': 30, 'teacher': 20, 'manager': 5}
+PERCENTILES = (50, 95, 99)
+
+
+def percentile(values, percent):
+    # Nearest-rank percentile of sorted values
+    index = max(0, -(-len(values) * percent // 100) - 1)
+    return values[index]
+
+
+class Command(BaseCommand):
+    help = 'Replays sessions of a role mix against the views with ' \
+           'concurrent in-process clients and prints throughput and ' \
+           'latency percentiles per URL name as JSON. Run it against a ' \
+           'database filled by seed_school.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', type=int, default=8,
+                            help='Number of concurrent clients.')
+        parser.add_argument('--duration', type=float, default=30,
+                            help='Seconds the load is applied for.')
+        parser.add_argument(
+            '--mix', nargs='+', default=[f'{role}={weight}'
+                                         for role, weight in MIX.items()],
+            help='Role weights, e.g. student=45 parent=30 teacher=20 '
+                 'manager=5.'
+        )
+        parser.add_argument('--seed', type=int, default=2021)
+
+    def parse_mix(self, mix):
+        weights = {}
+        for item in mix:
+            role, _, weight = item.partition('=')
+            if role not in MIX or not weight.isdigit():
+                raise CommandError(f'Wrong role weight {item}.')
+            weights[role] = int(weight)
+        return weights
+
+    def people(self):
+        """Ids of users of every role the sessions are started as."""
+        return {
+            'student': list(Student.objects.values_list('pk', flat=True)),
+            'parent': list(Parent.objects.values_list('pk', flat=True)),
+            'teacher': list(Teacher.objects.filter(
+                active=True, subjectteachers__isnull=False
+            ).values_list('pk', flat=True).distinct()),
+            'manager': list(User.objects.filter(
+                user_permissions__codename='manager'
+            ).values_list('id', flat=True)),
+        }
+
+    def session(self, role, user_id, rng):
+        """Returns the (url name, url) requests of one session of a role."""
+        urls = [('mailbox', reverse('gradesbook:mailbox'))]
+        received = InboxEntry.objects.filter(
+            user_id=user_id
+        ).order_by('-id').values_list('id', flat=True).first()
+        if received:
+            urls.append(('mail_text', reverse(
+                'gradesbook:mail_text', args=[received, 1]
+            )))
+
+        if role in ('student', 'parent'):
+            urls += [
+                ('student_parent', reverse('gradesbook:student_parent')),
+                ('timetable', reverse('gradesbook:timetable',
+                                      args=['student'])),
+                ('student_parent', reverse('gradesbook:student_parent')),
+            ]
+        elif role == 'teacher':
+            subject_codes = list(SubjectTeachers.objects.filter(
+                teacher__pk=user_id
+            ).values_list('subject__unique_code', flat=True))
+            urls += [
+                ('teacher', reverse('gradesbook:teacher')),
+                ('timetable', reverse('gradesbook:timetable',
+                                      args=['teacher'])),
+            ] + [
+                ('teacher_subject', reverse('gradesbook:teacher_subject',
+                                            args=[code]))
+                for code in rng.sample(subject_codes,
+                                       min(2, len(subject_codes)))
+            ]
+        else:
+            class_ids = list(SchoolClass.objects.filter(
+                active=True
+            ).values_list('id', flat=True))
+            school_class = SchoolClass.objects.filter(
+                id=rng.choice(class_ids) if class_ids else None
+            ).first()
+            subject = Subject.objects.filter(
+                school_class=school_class
+            ).first()
+            student = Student.objects.filter(
+                school_class=school_class
+            ).first()
+            urls += [
+                ('manager', reverse('gradesbook:manager')),
+                ('manager_timetable',
+                 reverse('gradesbook:manager_timetable')),
+            ]
+            if school_class:
+                urls += [
+                    ('edit_school_class', reverse(
+                        'gradesbook:edit_school_class',
+                        args=[school_class.unique_code]
+                    )),
+                    ('class_roster', reverse(
+                        'gradesbook:class_roster',
+                        args=[school_class.unique_code]
+                    )),
+                ]
+            if subject:
+                urls.append(('subject_view', reverse(
+                    'gradesbook:subject_view',
+                    args=[school_class.unique_code, subject.unique_code]
+                )))
+            if student:
+                urls.append(('manager_student', reverse(
+                    'gradesbook:manager_student', args=[student.pk]
+                )))
+        return urls
+
+    def client_loop(self, number, deadline, weights, people, results, lock):
+        rng = random.Random(self.seed + number)
+        roles = [role for role in weights if people[role]]
+        client = Client()
+        try:
+            while time.monotonic() < deadline:
+                role = rng.choices(
+                    roles, weights=[weights[role] for role in roles]
+                )[0]
+                user_id = rng.choice(people[role])
+                try:
+                    client.force_login(User.objects.get(id=user_id))
+                except DatabaseError:
+                    # SQLite refuses concurrent writes of the session
+                    continue
+                for name, url in self.session(role, user_id, rng):
+                    if time.monotonic() >= deadline:
+                        break
+                    started = time.perf_counter()
+                    try:
+                        failed = client.get(url).status_code >= 400
+                    except DatabaseError:
+                        failed = True
+                    elapsed = time.perf_counter() - started
+                    with lock:
+                        timings, errors = results.setdefault(name, ([], [0]))
+                        timings.append(elapsed)
+                        errors[0] += failed
+        finally:
+            connection.close()
+
+    def handle(self, *args, **options):
+        weights = self.parse_mix(options['mix'])
+        people = self.people()
+        if not any(people[role] for role in weights):
+            raise CommandError('No users to log in, run seed_school first.')
+        self.seed = options['seed']
+        results = {}
+        lock = threading.Lock()
+        started = time.monotonic()
+        deadline = started + options['duration']
+        threads = [
+            threading.Thread(
+                target=self.client_loop,
+                args=(number, deadline, weights, people, results, lock)
+            ) for number in range(options['clients'])
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.monotonic() - started
+
+        report = {
+            'clients': options['clients'],
+            'seconds': round(elapsed, 2),
+            'requests': sum(len(timings) for timings, _ in results.values()),
+            'errors': sum(errors[0] for _, errors in results.values()),
+            'urls': {},
+        }
+        report['throughput'] = round(report['requests'] / elapsed, 2)
+        for name, (timings, errors) in sorted(results.items()):
+            timings.sort()
+            report['urls'][name] = dict(
+                requests=len(timings),
+                errors=errors[0],
+                throughput=round(len(timings) / elapsed, 2),
+                **{f'p{percent}_ms': round(
+                    percentile(timings, percent) * 1000, 2
+                ) for percent in PERCENTILES}
+            )
+        self.stdout.write(json.dumps(report, indent=2))
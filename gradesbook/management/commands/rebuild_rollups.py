@@ -0,0 +1,20 @@
+import time
+from django.core.management.base import BaseCommand
+from gradesbook.rollups import CHUNK_SIZE, rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = 'Recomputes the weekly grade rollups of every subject from the ' \
+           'grades, one transaction per chunk of subjects.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE,
+                            help='Subjects recomputed in one transaction.')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        written = rebuild_rollups(chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt {written} rollups in '
+            f'{time.perf_counter() - started:.1f} s.'
+        ))
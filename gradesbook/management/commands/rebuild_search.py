@@ -0,0 +1,20 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from gradesbook.search import available, rebuild
+
+
+class Command(BaseCommand):
+    help = 'Recreates the full-text search tables and triggers and fills ' \
+           'them with every message, pupil, parent and teacher.'
+
+    def handle(self, *args, **options):
+        if not available():
+            raise CommandError('Search needs an SQLite database with FTS5.')
+        started = time.perf_counter()
+        with transaction.atomic():
+            messages, people = rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            f'Indexed {messages} messages and {people} people in '
+            f'{time.perf_counter() - started:.1f} s.'
+        ))
@@ -0,0 +1,27 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+from gradesbook.models import InboxEntry, UnreadCounter
+
+
+class Command(BaseCommand):
+    help = 'Recomputes the per-user unread message counters from the mailbox.'
+
+    def handle(self, *args, **options):
+        unread = dict(
+            InboxEntry.objects.filter(read=False).values_list(
+                'user'
+            ).annotate(total=Count('id')).order_by()
+        )
+        counters = [
+            UnreadCounter(user_id=user_id, unread=unread.get(user_id, 0))
+            for user_id in User.objects.values_list('id', flat=True)
+        ]
+        with transaction.atomic():
+            UnreadCounter.objects.all().delete()
+            UnreadCounter.objects.bulk_create(counters, batch_size=500)
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt {len(counters)} counters, '
+            f'{sum(unread.values())} unread messages.'
+        ))
@@ -0,0 +1,37 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from gradesbook.rollover import RolloverError, plan_rollover, roll_over
+
+
+class Command(BaseCommand):
+    help = 'Promotes the active classes of a year to the next one with ' \
+           'copies of their subjects, timetable and teachers, and moves ' \
+           'the pupils. --dry-run only prints what would be done.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('year', type=int)
+        parser.add_argument('--dry-run', action='store_true')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        if options['dry_run']:
+            plan = plan_rollover(options['year'])
+        else:
+            try:
+                plan = roll_over(options['year'])
+            except RolloverError as error:
+                raise CommandError(str(error))
+        for promotion in plan.promotions:
+            self.stdout.write(f'{promotion.school_class.unique_code} -> '
+                              f'{promotion.unique_code}')
+        for school_class in plan.graduating:
+            self.stdout.write(f'{school_class.unique_code} graduates')
+        if plan.conflicts:
+            self.stdout.write(f'Already taken: {", ".join(plan.conflicts)}')
+        self.stdout.write(self.style.SUCCESS(
+            f'{"Would create" if options["dry_run"] else "Created"} '
+            f'{len(plan.promotions)} classes, {plan.subjects} subjects, '
+            f'{plan.dates} lessons and {plan.teachers} teacher assignments, '
+            f'{plan.pupils} pupils moved, in '
+            f'{time.perf_counter() - started:.1f} s.'
+        ))
@@ -0,0 +1,71 @@
+import signal
+import socket
+import threading
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError, close_old_connections, connection
+from gradesbook.jobs import claim, run
+
+
+class Command(BaseCommand):
+    help = 'Runs background jobs stored in the database.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--concurrency', type=int, default=1,
+            help='Number of worker threads.'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=10,
+            help='Number of jobs claimed at once by a thread.'
+        )
+        parser.add_argument(
+            '--poll-interval', type=float, default=1.0,
+            help='Seconds to wait when the queue is empty.'
+        )
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Exit as soon as the queue is empty.'
+        )
+
+    def work(self, name, options):
+        done = failed = 0
+        try:
+            while not self.stopping.is_set():
+                close_old_connections()
+                try:
+                    jobs = claim(name, options['batch_size'])
+                except DatabaseError as error:
+                    self.stderr.write(f'{name}: {error}')
+                    self.stopping.wait(options['poll_interval'])
+                    continue
+                if not jobs:
+                    if options['once']:
+                        break
+                    self.stopping.wait(options['poll_interval'])
+                    continue
+                for job in jobs:
+                    result = run(job)
+                    if result:
+                        done += 1
+                    elif result is False:
+                        failed += 1
+        finally:
+            connection.close()
+        self.stdout.write(f'{name}: {done} done, {failed} failed')
+
+    def handle(self, *args, **options):
+        self.stopping = threading.Event()
+        if threading.current_thread() is threading.main_thread():
+            for signum in (signal.SIGINT, signal.SIGTERM):
+                signal.signal(signum, lambda *args: self.stopping.set())
+        prefix = f'{socket.gethostname()}-{threading.get_ident()}'
+        workers = [
+            threading.Thread(
+                target=self.work,
+                args=(f'{prefix}-{number}', options)
+            ) for number in range(options['concurrency'])
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
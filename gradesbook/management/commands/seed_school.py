@@ -0,0 +1,265 @@
+import datetime
+import random
+import time
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from gradesbook.bulk import bulk_insert
+from gradesbook.mailing import deliver, recipient_users
+from gradesbook.models import (Grades, Message, Parent, SchoolClass, Student,
+                               Subject, SubjectDate, SubjectTeachers, Teacher)
+from gradesbook.permissions import grant
+from gradesbook.rollups import rebuild_rollups
+from gradesbook.timetable import invalidate_timetables
+
+PREFIX = 'seed-'
+LETTERS = 'абвгдежзиклмнопрстуфхцчшщюя'
+SUBJECTS = ('Математика', 'Українська мова', 'Українська література',
+            'Англійська мова', 'Історія України', 'Всесвітня історія',
+            'Біологія', 'Географія', 'Фізика', 'Хімія', 'Інформатика',
+            'Мистецтво', 'Фізична культура', 'Трудове навчання',
+            'Основи здоров\'я', 'Правознавство')
+NAMES = ('Іван', 'Олена', 'Андрій', 'Марія', 'Дмитро', 'Софія', 'Максим',
+         'Анна', 'Богдан', 'Вікторія', 'Тарас', 'Дарина', 'Назар', 'Ірина')
+SURNAMES = ('Шевченко', 'Коваленко', 'Бондаренко', 'Ткаченко', 'Кравченко',
+            'Олійник', 'Шевчук', 'Поліщук', 'Лисенко', 'Мельник', 'Савченко',
+            'Руденко', 'Марченко', 'Мороз', 'Павленко', 'Гончаренко')
+# Share of pupils graded in a lesson
+GRADED_SHARE = 0.3
+LESSONS_PER_DAY = 6
+
+
+class Command(BaseCommand):
+    help = 'Generates a synthetic school with bulk inserts: classes, ' \
+           'pupils, parents, teachers, subjects, a timetable, a term of ' \
+           'grades and mail. All users share one password.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--classes', type=int, default=10)
+        parser.add_argument('--pupils', type=int, default=30,
+                            help='Pupils per class, each with one parent.')
+        parser.add_argument('--subjects', type=int, default=12,
+                            help='Subjects per class.')
+        parser.add_argument('--teachers', type=int, default=20)
+        parser.add_argument('--days', type=int, default=90,
+                            help='Length of the term of grades in days.')
+        parser.add_argument('--messages', type=int, default=10,
+                            help='Messages sent to every class.')
+        parser.add_argument('--seed', type=int, default=2021)
+        parser.add_argument('--password', default='school')
+
+    def handle(self, *args, **options):
+        if options['classes'] > 9 * len(LETTERS):
+            raise CommandError(
+                f'At most {9 * len(LETTERS)} classes can be generated.'
+            )
+        if not 0 < options['subjects'] <= len(SUBJECTS):
+            raise CommandError(
+                f'Between 1 and {len(SUBJECTS)} subjects are available.'
+            )
+        if User.objects.filter(username__startswith=PREFIX).exists():
+            raise CommandError('The database already holds a seeded school.')
+        self.random = random.Random(options['seed'])
+        # Hashing is the slowest part of creating a user, so every user
+        # gets the same precomputed hash
+        self.password = make_password(options['password'])
+        started = time.perf_counter()
+
+        with transaction.atomic():
+            self.seed_users([f'{PREFIX}manager'], 'manager')
+            teacher_ids = self.seed_teachers(options['teachers'])
+            classes = self.seed_classes(options['classes'])
+            self.seed_people(classes, options['pupils'])
+            subjects = self.seed_subjects(classes, options['subjects'],
+                                          teacher_ids)
+            slots = self.seed_timetable(subjects)
+            grades = self.seed_grades(slots, options['days'])
+            rebuild_rollups([subject.id for subject in subjects])
+            messages = self.seed_mail(classes, teacher_ids,
+                                      options['messages'])
+        invalidate_timetables()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Seeded {len(classes)} classes, '
+            f'{len(classes) * options["pupils"]} pupils, '
+            f'{len(teacher_ids)} teachers, {len(subjects)} subjects, '
+            f'{grades} grades and {messages} messages in '
+            f'{time.perf_counter() - started:.1f} s. '
+            f'Password of every user: {options["password"]}, '
+            f'manager: {PREFIX}manager'
+        ))
+
+    def name(self):
+        return self.random.choice(NAMES), self.random.choice(SURNAMES)
+
+    def seed_users(self, usernames, permission_codename):
+        User.objects.bulk_create([
+            User(username=username, password=self.password)
+            for username in usernames
+        ], batch_size=500)
+        users = dict(User.objects.filter(
+            username__in=usernames
+        ).values_list('username', 'id'))
+        grant(permission_codename, users.values())
+        return users
+
+    def seed_teachers(self, count):
+        usernames = [f'{PREFIX}teacher-{number}' for number in range(count)]
+        users = self.seed_users(usernames, 'teacher')
+        teachers = []
+        for number, username in enumerate(usernames):
+            name, surname = self.name()
+            teachers.append(Teacher(
+                user_id=users[username], name=name, surname=surname,
+                email=f'teacher{number}@school.ua', first_login=False
+            ))
+        Teacher.objects.bulk_create(teachers, batch_size=500)
+        return [users[username] for username in usernames]
+
+    def seed_classes(self, count):
+        year = timezone.localdate().year
+        names = [f'{number % 9 + 1}{LETTERS[number // 9]}'
+                 for number in range(count)]
+        SchoolClass.objects.bulk_create([
+            SchoolClass(name=name, year=year, unique_code=f'{name}{year}')
+            for name in names
+        ])
+        return list(SchoolClass.objects.filter(
+            unique_code__in=[f'{name}{year}' for name in names]
+        ).order_by('id'))
+
+    def seed_people(self, classes, pupils):
+        usernames = {
+            role: [f'{PREFIX}{school_class.unique_code}-{role}-{number}'
+                   for school_class in classes for number in range(pupils)]
+            for role in ('student', 'parent')
+        }
+        students = self.seed_users(usernames['student'], 'student')
+        parents = self.seed_users(usernames['parent'], 'parent')
+        birth_year = timezone.localdate().year
+        student_rows = []
+        parent_rows = []
+        for school_class in classes:
+            grade = int(school_class.name[0])
+            for number in range(pupils):
+                student_id = students[
+                    f'{PREFIX}{school_class.unique_code}-student-{number}'
+                ]
+                parent_id = parents[
+                    f'{PREFIX}{school_class.unique_code}-parent-{number}'
+                ]
+                name, surname = self.name()
+                student_rows.append(Student(
+                    user_id=student_id, name=name,
+                    surname=surname, school_class=school_class,
+                    birthday=datetime.date(birth_year - grade - 6,
+                                           self.random.randint(1, 12),
+                                           self.random.randint(1, 28)),
+                    first_login=False
+                ))
+                parent_rows.append(Parent(
+                    user_id=parent_id, name=self.name()[0],
+                    surname=surname, student_id=student_id,
+                    first_login=False
+                ))
+        Student.objects.bulk_create(student_rows, batch_size=500)
+        Parent.objects.bulk_create(parent_rows, batch_size=500)
+
+    def seed_subjects(self, classes, count, teacher_ids):
+        Subject.objects.bulk_create([
+            Subject(name=name,
+                    unique_code=f'{index:02}{school_class.unique_code}',
+                    school_class=school_class)
+            for school_class in classes
+            for index, name in enumerate(SUBJECTS[:count])
+        ], batch_size=500)
+        subjects = list(Subject.objects.filter(
+            school_class__in=classes
+        ).order_by('id'))
+        SubjectTeachers.objects.bulk_create([
+            SubjectTeachers(subject=subject) for subject in subjects
+        ], batch_size=500)
+        through = SubjectTeachers.teacher.through
+        through.objects.bulk_create([
+            through(subjectteachers_id=subject_teachers_id,
+                    teacher_id=self.random.choice(teacher_ids))
+            for subject_teachers_id in SubjectTeachers.objects.filter(
+                subject__in=subjects
+            ).values_list('id', flat=True)
+        ], batch_size=500)
+        return subjects
+
+    def seed_timetable(self, subjects):
+        """
+        Fills LESSONS_PER_DAY lessons of every school day of every class
+        with its subjects. Returns {(class id, day): [subject ids]}.
+        """
+        by_class = {}
+        for subject in subjects:
+            by_class.setdefault(subject.school_class_id, []).append(subject)
+        slots = {}
+        rows = []
+        for school_class_id, class_subjects in by_class.items():
+            cells = [(day, lesson) for day, _ in SubjectDate.DAYS
+                     for lesson in range(1, LESSONS_PER_DAY + 1)]
+            self.random.shuffle(cells)
+            for index, (day, lesson) in enumerate(cells):
+                subject = class_subjects[index % len(class_subjects)]
+                rows.append(SubjectDate(subject=subject, day=day,
+                                        lesson_number=lesson))
+                slots.setdefault((school_class_id, day), []).append(
+                    subject.id
+                )
+        SubjectDate.objects.bulk_create(rows, batch_size=500)
+        return slots
+
+    def seed_grades(self, slots, days):
+        pupils = {}
+        for school_class_id, student_id in Student.objects.filter(
+            school_class_id__in={key[0] for key in slots}
+        ).values_list('school_class_id', 'pk'):
+            pupils.setdefault(school_class_id, []).append(student_id)
+        codes = [day for day, _ in SubjectDate.DAYS]
+        today = timezone.localdate()
+
+        def rows():
+            for offset in range(days, 0, -1):
+                date = today - datetime.timedelta(days=offset)
+                if date.weekday() >= len(codes):
+                    continue
+                for school_class_id, class_pupils in pupils.items():
+                    lessons = slots.get((school_class_id,
+                                         codes[date.weekday()]), ())
+                    for subject_id in lessons:
+                        graded = self.random.sample(
+                            class_pupils,
+                            int(len(class_pupils) * GRADED_SHARE)
+                        )
+                        for student_id in graded:
+                            yield (self.random.randint(1, 5), student_id,
+                                   subject_id, date, False)
+
+        return bulk_insert(
+            Grades,
+            ('grade', 'student_id', 'subject_id', 'date', 'manager_mode'),
+            rows()
+        )
+
+    def seed_mail(self, classes, teacher_ids, count):
+        sent = 0
+        for school_class in classes:
+            for number in range(count):
+                prefix = self.random.choice((1, 2))
+                message = Message.objects.create(
+                    subject=f'Оголошення {number + 1}',
+                    text='Шановні учні та батьки, нагадуємо про '
+                         'розклад на наступний тиждень.',
+                    sender_id=self.random.choice(teacher_ids),
+                    recipient=school_class.name if prefix == 1
+                    else f'Батьки {school_class.name}'
+                )
+                deliver(message, recipient_users(prefix, school_class))
+                sent += 1
+        return sent
@@ -0,0 +1,15 @@
+from .roles import attach_role
+
+
+class RoleMiddleware:
+    """
+    Resolves the role of the signed in user once per session and attaches
+    it with the person and the active student to every request.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        attach_role(request)
+        return self.get_response(request)
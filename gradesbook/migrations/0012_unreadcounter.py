@@ -0,0 +1,48 @@
+# Generated by Django 2.2.28 on 2026-10-18 01:54
+
+from django.conf import settings
+import django.core.validators
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def count_unread(apps, schema_editor):
+    MailboxReceived = apps.get_model('gradesbook', 'MailboxReceived')
+    UnreadCounter = apps.get_model('gradesbook', 'UnreadCounter')
+    unread = MailboxReceived.objects.filter(read=False).values_list(
+        'recipient__user'
+    ).annotate(total=models.Count('id')).order_by()
+    UnreadCounter.objects.bulk_create(
+        [UnreadCounter(user_id=user_id, unread=total)
+         for user_id, total in unread],
+        batch_size=500
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0011_update_proxy_permissions'),
+        ('gradesbook', '0011_auto_20211114_2319'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UnreadCounter',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('unread', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='schoolclass',
+            name='unique_code',
+            field=models.CharField(help_text='Формат: назва класу + рік навчання, наприклад: 1а2019', max_length=10, unique=True, validators=[django.core.validators.RegexValidator('^[1-9]{1}[а-я]{1}[0-9]{4}$')]),
+        ),
+        migrations.AlterField(
+            model_name='subject',
+            name='unique_code',
+            field=models.CharField(help_text='Формат: скорочена назва предмему + назва класу і їхній рік, наприклад : ЧМ2а2019', max_length=13, unique=True),
+        ),
+        migrations.RunPython(count_unread, migrations.RunPython.noop),
+    ]
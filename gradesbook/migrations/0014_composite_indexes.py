@@ -0,0 +1,37 @@
+# Generated by Django 2.2.28 on 2026-10-18 02:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gradesbook', '0013_job'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='canceledgrades',
+            index=models.Index(fields=['subject', 'student'], name='canceled_subject_student_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='canceledgrades',
+            index=models.Index(fields=['subject', 'date'], name='canceled_subject_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='grades',
+            index=models.Index(fields=['subject', 'student'], name='grades_subject_student_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='grades',
+            index=models.Index(fields=['subject', 'manager_mode', 'date'], name='grades_subject_mode_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='mailboxreceived',
+            index=models.Index(fields=['recipient', 'read'], name='received_recipient_read_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='subjectdate',
+            index=models.Index(fields=['subject', 'day', 'lesson_number'], name='subjectdate_slot_idx'),
+        ),
+    ]
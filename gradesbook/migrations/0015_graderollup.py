@@ -0,0 +1,38 @@
+# Generated by Django 2.2.28 on 2026-10-18 02:27
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gradesbook', '0014_composite_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GradeRollup',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('week', models.DateField()),
+                ('count_1', models.IntegerField(default=0)),
+                ('count_2', models.IntegerField(default=0)),
+                ('count_3', models.IntegerField(default=0)),
+                ('count_4', models.IntegerField(default=0)),
+                ('count_5', models.IntegerField(default=0)),
+                ('grade_sum', models.IntegerField(default=0)),
+                ('canceled', models.IntegerField(default=0)),
+                ('school_class', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='gradesbook.SchoolClass')),
+                ('subject', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='gradesbook.Subject')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='graderollup',
+            index=models.Index(fields=['school_class', 'week'], name='rollup_class_week_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='graderollup',
+            unique_together={('subject', 'week')},
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 2.2.28 on 2026-10-18 02:31
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gradesbook', '0015_graderollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TermResult',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term_start', models.DateField()),
+                ('term_end', models.DateField()),
+                ('count', models.IntegerField()),
+                ('average', models.FloatField()),
+                ('median', models.FloatField()),
+                ('final_grade', models.IntegerField()),
+                ('slope', models.FloatField()),
+                ('rank', models.IntegerField()),
+                ('percentile', models.FloatField()),
+                ('class_rank', models.IntegerField()),
+                ('at_risk', models.BooleanField(default=False)),
+                ('computed', models.DateTimeField(auto_now=True)),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='gradesbook.Student')),
+                ('subject', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='gradesbook.Subject')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='termresult',
+            index=models.Index(fields=['student', 'term_start'], name='termresult_student_term_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='termresult',
+            unique_together={('term_start', 'subject', 'student')},
+        ),
+    ]
@@ -0,0 +1,73 @@
+# Generated by Django 2.2.28 on 2026-10-18 02:37
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gradesbook', '0016_termresult'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedSubject',
+            fields=[
+                ('id', models.IntegerField(primary_key=True, serialize=False)),
+                ('name', models.CharField(max_length=128)),
+                ('unique_code', models.CharField(max_length=13, unique=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='schoolclass',
+            name='archived',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.CreateModel(
+            name='ArchivedSubjectDate',
+            fields=[
+                ('id', models.IntegerField(primary_key=True, serialize=False)),
+                ('day', models.CharField(choices=[('Mo', 'Понеділок'), ('Tu', 'Вівторок'), ('We', 'Середа'), ('Th', 'Четвер'), ('Fr', "П'ятниця"), ('St', 'Субота')], max_length=2)),
+                ('lesson_number', models.IntegerField(choices=[(1, '1'), (2, '2'), (3, '3'), (4, '4'), (5, '5'), (6, '6'), (7, '7'), (8, '8')])),
+                ('subject', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='gradesbook.ArchivedSubject')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='archivedsubject',
+            name='school_class',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='gradesbook.SchoolClass'),
+        ),
+        migrations.AddField(
+            model_name='archivedsubject',
+            name='teachers',
+            field=models.ManyToManyField(blank=True, to='gradesbook.Teacher'),
+        ),
+        migrations.CreateModel(
+            name='ArchivedGrade',
+            fields=[
+                ('id', models.IntegerField(primary_key=True, serialize=False)),
+                ('grade', models.IntegerField()),
+                ('date', models.DateField()),
+                ('manager_mode', models.BooleanField(default=False)),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='gradesbook.Student')),
+                ('subject', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='gradesbook.ArchivedSubject')),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedCanceledGrade',
+            fields=[
+                ('id', models.IntegerField(primary_key=True, serialize=False)),
+                ('grade', models.IntegerField()),
+                ('date', models.DateField()),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='gradesbook.Student')),
+                ('subject', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='gradesbook.ArchivedSubject')),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+    ]
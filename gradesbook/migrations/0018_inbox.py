@@ -0,0 +1,155 @@
+# Generated by Django 2.2.28 on 2026-10-18 03:12
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+# Rows of the source table copied by one statement
+CHUNK_SIZE = 10000
+
+
+def copy_in_chunks(connection, sql, table):
+    """
+    Runs sql, an INSERT ... SELECT or UPDATE ending with an id range
+    condition on table, once per CHUNK_SIZE ids so no statement touches
+    the whole mailbox.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT MAX({connection.ops.quote_name("id")}) FROM {table}'
+        )
+        last = cursor.fetchone()[0] or 0
+        for start in range(0, last, CHUNK_SIZE):
+            cursor.execute(sql, [start, start + CHUNK_SIZE])
+
+
+def tables(apps, connection, *names):
+    return [connection.ops.quote_name(
+        apps.get_model('gradesbook', name)._meta.db_table
+    ) for name in names]
+
+
+def to_inbox(apps, schema_editor):
+    connection = schema_editor.connection
+    q = connection.ops.quote_name
+    message, sender, recipient, received, sent, inbox = tables(
+        apps, connection, 'Message', 'Sender', 'Recipient',
+        'MailboxReceived', 'MailboxSent', 'InboxEntry'
+    )
+    copy_in_chunks(connection, (
+        f'UPDATE {message} SET '
+        f'{q("sender_id")} = (SELECT {q("user_id")} FROM {sender} '
+        f'WHERE {sender}.{q("message_id")} = {message}.{q("id")}), '
+        f'{q("recipient")} = COALESCE((SELECT {q("recipient")} FROM {sent} '
+        f'WHERE {sent}.{q("message_id")} = {message}.{q("id")} '
+        f'ORDER BY {q("id")} LIMIT 1), \'\') '
+        f'WHERE {q("id")} > %s AND {q("id")} <= %s'
+    ), message)
+    # A message nobody sent was never shown in any mailbox
+    apps.get_model('gradesbook', 'Message').objects.filter(
+        sender__isnull=True
+    ).delete()
+    copy_in_chunks(connection, (
+        f'INSERT INTO {inbox} ({q("user_id")}, {q("message_id")}, '
+        f'{q("sender_id")}, {q("read")}, {q("date")}) '
+        f'SELECT r.{q("user_id")}, m.{q("id")}, s.{q("user_id")}, '
+        f'mr.{q("read")}, m.{q("date")} FROM {received} mr '
+        f'JOIN {recipient} r ON r.{q("id")} = mr.{q("recipient_id")} '
+        f'JOIN {sender} s ON s.{q("id")} = mr.{q("sender_id")} '
+        f'JOIN {message} m ON m.{q("id")} = mr.{q("message_id")} '
+        f'WHERE mr.{q("id")} > %s AND mr.{q("id")} <= %s '
+        f'ORDER BY mr.{q("id")}'
+    ), received)
+
+
+def from_inbox(apps, schema_editor):
+    connection = schema_editor.connection
+    q = connection.ops.quote_name
+    message, sender, recipient, received, sent, inbox = tables(
+        apps, connection, 'Message', 'Sender', 'Recipient',
+        'MailboxReceived', 'MailboxSent', 'InboxEntry'
+    )
+    copy_in_chunks(connection, (
+        f'INSERT INTO {sender} ({q("message_id")}, {q("user_id")}) '
+        f'SELECT {q("id")}, {q("sender_id")} FROM {message} '
+        f'WHERE {q("id")} > %s AND {q("id")} <= %s'
+    ), message)
+    copy_in_chunks(connection, (
+        f'INSERT INTO {sent} ({q("sender_id")}, {q("message_id")}, '
+        f'{q("recipient")}) '
+        f'SELECT s.{q("id")}, m.{q("id")}, m.{q("recipient")} '
+        f'FROM {message} m '
+        f'JOIN {sender} s ON s.{q("message_id")} = m.{q("id")} '
+        f'WHERE m.{q("recipient")} <> \'\' '
+        f'AND m.{q("id")} > %s AND m.{q("id")} <= %s'
+    ), message)
+    # The ids of the inbox entries are reused for both old tables
+    copy_in_chunks(connection, (
+        f'INSERT INTO {recipient} ({q("id")}, {q("user_id")}, '
+        f'{q("message_id")}) '
+        f'SELECT {q("id")}, {q("user_id")}, {q("message_id")} FROM {inbox} '
+        f'WHERE {q("id")} > %s AND {q("id")} <= %s'
+    ), inbox)
+    copy_in_chunks(connection, (
+        f'INSERT INTO {received} ({q("id")}, {q("sender_id")}, '
+        f'{q("message_id")}, {q("recipient_id")}, {q("read")}) '
+        f'SELECT e.{q("id")}, s.{q("id")}, e.{q("message_id")}, '
+        f'e.{q("id")}, e.{q("read")} FROM {inbox} e '
+        f'JOIN {sender} s ON s.{q("message_id")} = e.{q("message_id")} '
+        f'WHERE e.{q("id")} > %s AND e.{q("id")} <= %s'
+    ), inbox)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('gradesbook', '0017_archive'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='message',
+            name='sender',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='message',
+            name='recipient',
+            field=models.CharField(blank=True, default='', max_length=64),
+            preserve_default=False,
+        ),
+        migrations.CreateModel(
+            name='InboxEntry',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('read', models.BooleanField(default=False)),
+                ('date', models.DateTimeField()),
+                ('message', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='gradesbook.Message')),
+                ('sender', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='inbox', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.RunPython(to_inbox, from_inbox),
+        migrations.AlterField(
+            model_name='message',
+            name='sender',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='inboxentry',
+            index=models.Index(fields=['user', 'read'], name='inbox_user_read_idx'),
+        ),
+        migrations.DeleteModel(
+            name='MailboxReceived',
+        ),
+        migrations.DeleteModel(
+            name='MailboxSent',
+        ),
+        migrations.DeleteModel(
+            name='Recipient',
+        ),
+        migrations.DeleteModel(
+            name='Sender',
+        ),
+    ]
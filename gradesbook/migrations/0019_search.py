@@ -0,0 +1,103 @@
+# Generated by Django 2.2.28 on 2026-10-18 03:40
+
+from django.db import migrations, models
+
+# The schema as of this migration, gradesbook.search keeps the live one
+TOKENIZE = "tokenize=\"unicode61 remove_diacritics 0 separators 'ʼ'\", " \
+           "prefix='2 3 4'"
+
+PEOPLE = (
+    ('gradesbook_student', 'student'),
+    ('gradesbook_parent', 'parent'),
+    ('gradesbook_teacher', 'teacher'),
+)
+
+CREATE = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS gradesbook_message_fts USING "
+    "fts5(subject, text, content='gradesbook_message', content_rowid='id', "
+    f"{TOKENIZE})",
+    "CREATE VIRTUAL TABLE IF NOT EXISTS gradesbook_person_fts USING "
+    f"fts5(name, surname, role UNINDEXED, {TOKENIZE})",
+    "CREATE TRIGGER IF NOT EXISTS gradesbook_message_fts_insert "
+    "AFTER INSERT ON gradesbook_message BEGIN "
+    "INSERT INTO gradesbook_message_fts(rowid, subject, text) "
+    "VALUES (new.id, new.subject, new.text); END",
+    "CREATE TRIGGER IF NOT EXISTS gradesbook_message_fts_delete "
+    "AFTER DELETE ON gradesbook_message BEGIN "
+    "INSERT INTO gradesbook_message_fts(gradesbook_message_fts, rowid, "
+    "subject, text) VALUES ('delete', old.id, old.subject, old.text); END",
+    "CREATE TRIGGER IF NOT EXISTS gradesbook_message_fts_update "
+    "AFTER UPDATE OF subject, text ON gradesbook_message BEGIN "
+    "INSERT INTO gradesbook_message_fts(gradesbook_message_fts, rowid, "
+    "subject, text) VALUES ('delete', old.id, old.subject, old.text); "
+    "INSERT INTO gradesbook_message_fts(rowid, subject, text) "
+    "VALUES (new.id, new.subject, new.text); END",
+]
+for table, role in PEOPLE:
+    CREATE += [
+        f"CREATE TRIGGER IF NOT EXISTS {table}_fts_insert "
+        f"AFTER INSERT ON {table} BEGIN "
+        "INSERT INTO gradesbook_person_fts(rowid, name, surname, role) "
+        f"VALUES (new.user_id, new.name, new.surname, '{role}'); END",
+        f"CREATE TRIGGER IF NOT EXISTS {table}_fts_delete "
+        f"AFTER DELETE ON {table} BEGIN "
+        "DELETE FROM gradesbook_person_fts WHERE rowid = old.user_id; END",
+        f"CREATE TRIGGER IF NOT EXISTS {table}_fts_update "
+        f"AFTER UPDATE OF name, surname ON {table} BEGIN "
+        "UPDATE gradesbook_person_fts SET name = new.name, "
+        "surname = new.surname WHERE rowid = old.user_id; END",
+    ]
+
+BACKFILL = [
+    "INSERT INTO gradesbook_message_fts(gradesbook_message_fts) "
+    "VALUES ('rebuild')",
+] + [
+    "INSERT INTO gradesbook_person_fts(rowid, name, surname, role) "
+    f"SELECT user_id, name, surname, '{role}' FROM {table}"
+    for table, role in PEOPLE
+]
+
+DROP = [
+    'DROP TRIGGER IF EXISTS gradesbook_message_fts_insert',
+    'DROP TRIGGER IF EXISTS gradesbook_message_fts_delete',
+    'DROP TRIGGER IF EXISTS gradesbook_message_fts_update',
+] + [
+    f'DROP TRIGGER IF EXISTS {table}_fts_{event}'
+    for table, _ in PEOPLE for event in ('insert', 'delete', 'update')
+] + [
+    'DROP TABLE IF EXISTS gradesbook_message_fts',
+    'DROP TABLE IF EXISTS gradesbook_person_fts',
+]
+
+
+def execute(schema_editor, statements):
+    # Search is SQLite-only
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        for statement in statements:
+            cursor.execute(statement)
+
+
+def create_search(apps, schema_editor):
+    execute(schema_editor, CREATE + BACKFILL)
+
+
+def drop_search(apps, schema_editor):
+    execute(schema_editor, DROP)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gradesbook', '0018_inbox'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='inboxentry',
+            index=models.Index(fields=['user', 'message'],
+                               name='inbox_user_message_idx'),
+        ),
+        migrations.RunPython(create_search, drop_search),
+    ]
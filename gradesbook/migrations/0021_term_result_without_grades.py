@@ -0,0 +1,43 @@
+# Generated by Django 2.2.28 on 2026-10-18 04:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gradesbook', '0020_api_token'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='termresult',
+            name='average',
+            field=models.FloatField(null=True),
+        ),
+        migrations.AlterField(
+            model_name='termresult',
+            name='class_rank',
+            field=models.IntegerField(null=True),
+        ),
+        migrations.AlterField(
+            model_name='termresult',
+            name='final_grade',
+            field=models.IntegerField(null=True),
+        ),
+        migrations.AlterField(
+            model_name='termresult',
+            name='median',
+            field=models.FloatField(null=True),
+        ),
+        migrations.AlterField(
+            model_name='termresult',
+            name='percentile',
+            field=models.FloatField(null=True),
+        ),
+        migrations.AlterField(
+            model_name='termresult',
+            name='rank',
+            field=models.IntegerField(null=True),
+        ),
+    ]
@@ -1,4 +1,8 @@
+import datetime
 from django.db import models
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.utils import timezone
 from django.core.validators import (RegexValidator, MaxValueValidator,
                                     MinValueValidator
                                     )
@@ -22,6 +26,10 @@ class SchoolClass(models.Model):
         help_text='Чотирьох-значний рік навчання'
     )
     active = models.BooleanField(default=True)
+    # Subjects, timetable and grades are kept in the archive tables. Set
+    # when archiving is asked for and cleared when restoring is, the jobs
+    # moving the subjects stop once it no longer asks for their direction
+    archived = models.BooleanField(default=False)
 
     def __str__(self):
         return self.name
@@ -45,11 +53,19 @@ class PersonalData(models.Model):
         abstract = True
 
 
+class StudentQuerySet(models.QuerySet):
+    def listed(self):
+        # Deleted pupils are deactivated until the worker removes them
+        return self.filter(user__is_active=True)
+
+
 class Student(PersonalData):
     school_class = models.ForeignKey(SchoolClass, on_delete=models.CASCADE)
     birthday = models.DateField()
     email = models.EmailField(blank=True)
 
+    objects = StudentQuerySet.as_manager()
+
     def __str__(self):
         return f'{self.name} {self.surname}'
 
@@ -109,6 +125,12 @@ class SubjectDate(models.Model):
         choices=LESSONS
     )
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['subject', 'day', 'lesson_number'],
+                         name='subjectdate_slot_idx'),
+        ]
+
 
 class SubjectTeachers(models.Model):
     teacher = models.ManyToManyField(Teacher)
@@ -135,52 +157,270 @@ class GradesData(models.Model):
 class Grades(GradesData):
     manager_mode = models.BooleanField(default=False)
 
-
-class CanceledGrades(GradesData):
-    pass
+    class Meta:
+        indexes = [
+            models.Index(fields=['subject', 'student'],
+                         name='grades_subject_student_idx'),
+            models.Index(fields=['subject', 'manager_mode', 'date'],
+                         name='grades_subject_mode_date_idx'),
+        ]
 
 
-class Message(models.Model):
-    text = models.TextField(max_length=1024)
-    subject = models.CharField(max_length=128)
-    date = models.DateTimeField(auto_now_add=True)
+class CanceledGrades(GradesData):
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['subject', 'student'],
+                         name='canceled_subject_student_idx'),
+            models.Index(fields=['subject', 'date'],
+                         name='canceled_subject_date_idx'),
+        ]
+
+
+def week_of(date):
+    """Monday of the ISO week of a date."""
+    return date - datetime.timedelta(days=date.weekday())
+
+
+class GradeRollupManager(models.Manager):
+    def add(self, grades, sign=1, canceled=False):
+        """
+        Adds (school class id, subject id, date, grade) rows to the rollups
+        of their weeks, sign -1 subtracts them. Canceled grades are only
+        counted as cancellations. The class id may be None, it is looked
+        up when a rollup has to be created.
+        """
+        deltas = {}
+        classes = {}
+        for school_class_id, subject_id, date, grade in grades:
+            if school_class_id is not None:
+                classes[subject_id] = school_class_id
+            delta = deltas.setdefault((subject_id, week_of(date)), {})
+            if canceled:
+                delta['canceled'] = delta.get('canceled', 0) + sign
+            else:
+                field = f'count_{grade}'
+                delta[field] = delta.get(field, 0) + sign
+                delta['grade_sum'] = delta.get('grade_sum', 0) + sign * grade
+        if not deltas:
+            return
+        if sign > 0:
+            unknown = {subject_id for subject_id, _ in deltas} - set(classes)
+            if unknown:
+                classes.update(Subject.objects.filter(
+                    id__in=unknown
+                ).values_list('id', 'school_class_id'))
+            self.bulk_create([
+                self.model(school_class_id=classes[subject_id],
+                           subject_id=subject_id, week=week)
+                for subject_id, week in deltas
+            ], ignore_conflicts=True)
+        for (subject_id, week), delta in deltas.items():
+            self.filter(subject_id=subject_id, week=week).update(**{
+                field: F(field) + value for field, value in delta.items()
+            })
+
+
+class GradeRollup(models.Model):
+    """
+    Grades of a subject in one ISO week: a count per grade value, their
+    sum and the number of canceled grades.
+    """
+    school_class = models.ForeignKey(SchoolClass, on_delete=models.CASCADE)
+    subject = models.ForeignKey(Subject, on_delete=models.CASCADE)
+    week = models.DateField()
+    count_1 = models.IntegerField(default=0)
+    count_2 = models.IntegerField(default=0)
+    count_3 = models.IntegerField(default=0)
+    count_4 = models.IntegerField(default=0)
+    count_5 = models.IntegerField(default=0)
+    grade_sum = models.IntegerField(default=0)
+    canceled = models.IntegerField(default=0)
 
-class Correspondent(models.Model):
-    id = models.AutoField(primary_key=True)
-    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    objects = GradeRollupManager()
 
     class Meta:
-        abstract = True
-
+        unique_together = ('subject', 'week')
+        indexes = [
+            models.Index(fields=['school_class', 'week'],
+                         name='rollup_class_week_idx'),
+        ]
+
+
+class TermResult(models.Model):
+    """
+    Result of a pupil in a subject over a term, written by
+    gradesbook.terms.compute_term.
+    """
+    student = models.ForeignKey(Student, on_delete=models.CASCADE)
+    subject = models.ForeignKey(Subject, on_delete=models.CASCADE)
+    term_start = models.DateField()
+    term_end = models.DateField()
+    # Pupils without grades in a subject have a result with count 0 and
+    # without the values below, they are at risk
+    count = models.IntegerField()
+    average = models.FloatField(null=True)
+    median = models.FloatField(null=True)
+    final_grade = models.IntegerField(null=True)
+    # Change of the grades in a week, by least squares
+    slope = models.FloatField()
+    # Place among the class in the subject, 1 is the best
+    rank = models.IntegerField(null=True)
+    percentile = models.FloatField(null=True)
+    # Place among the class by the mean of all subjects
+    class_rank = models.IntegerField(null=True)
+    at_risk = models.BooleanField(default=False)
+    computed = models.DateTimeField(auto_now=True)
 
-class Sender(Correspondent):
-    message = models.OneToOneField(Message, on_delete=models.CASCADE)
+    class Meta:
+        unique_together = ('term_start', 'subject', 'student')
+        indexes = [
+            models.Index(fields=['student', 'term_start'],
+                         name='termresult_student_term_idx'),
+        ]
+
+
+class ArchivedSubject(models.Model):
+    """
+    A subject of an archived class with its teachers. Archived rows keep
+    the ids they had in the live tables, so they are restored unchanged.
+    """
+    id = models.IntegerField(primary_key=True)
+    name = models.CharField(max_length=128)
+    unique_code = models.CharField(unique=True, max_length=13)
+    school_class = models.ForeignKey(SchoolClass, on_delete=models.CASCADE)
+    teachers = models.ManyToManyField(Teacher, blank=True)
 
     def __str__(self):
-        return f'{self.user.first_name} {self.user.last_name}'
-
+        return self.name
 
-class Recipient(Correspondent):
-    message = models.ForeignKey(Message, on_delete=models.CASCADE)
 
-    def __str__(self):
-        return f'{self.user.first_name} {self.user.last_name}'
+class ArchivedSubjectDate(models.Model):
+    id = models.IntegerField(primary_key=True)
+    subject = models.ForeignKey(ArchivedSubject, on_delete=models.CASCADE)
+    day = models.CharField(max_length=2, choices=SubjectDate.DAYS)
+    lesson_number = models.IntegerField(choices=SubjectDate.LESSONS)
 
 
-class Mailbox(models.Model):
-    id = models.AutoField(primary_key=True)
-    sender = models.ForeignKey(Sender, on_delete=models.CASCADE)
-    message = models.ForeignKey(Message, on_delete=models.CASCADE)
+class ArchivedGradesData(models.Model):
+    id = models.IntegerField(primary_key=True)
+    grade = models.IntegerField()
+    student = models.ForeignKey(Student, on_delete=models.CASCADE)
+    subject = models.ForeignKey(ArchivedSubject, on_delete=models.CASCADE)
+    date = models.DateField()
 
     class Meta:
         abstract = True
 
 
-class MailboxReceived(Mailbox):
-    recipient = models.ForeignKey(Recipient, on_delete=models.CASCADE)
+class ArchivedGrade(ArchivedGradesData):
+    manager_mode = models.BooleanField(default=False)
+
+
+class ArchivedCanceledGrade(ArchivedGradesData):
+    pass
+
+
+class Message(models.Model):
+    text = models.TextField(max_length=1024)
+    subject = models.CharField(max_length=128)
+    date = models.DateTimeField(auto_now_add=True)
+    sender = models.ForeignKey(User, on_delete=models.CASCADE)
+    # Shown in the sent mailbox, e.g. a class name or 'Managers'. Grade
+    # notifications have none and stay out of the sent mailbox
+    recipient = models.CharField(max_length=64, blank=True)
+
+
+class InboxEntry(models.Model):
+    """
+    A message in the inbox of one recipient. The sender and date are
+    copied from the message so the inbox is listed from this table alone.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE,
+                             related_name='inbox')
+    message = models.ForeignKey(Message, on_delete=models.CASCADE)
+    sender = models.ForeignKey(User, on_delete=models.CASCADE,
+                               related_name='+', db_index=False)
     read = models.BooleanField(default=False)
+    date = models.DateTimeField()
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'read'],
+                         name='inbox_user_read_idx'),
+            # Covers the message ids of a mailbox for search
+            models.Index(fields=['user', 'message'],
+                         name='inbox_user_message_idx'),
+        ]
+
+
+class UnreadCounterManager(models.Manager):
+    def increment(self, user_ids, by=1):
+        user_ids = set(user_ids)
+        if not user_ids:
+            return
+        self.bulk_create(
+            [self.model(user_id=user_id) for user_id in user_ids],
+            ignore_conflicts=True
+        )
+        self.filter(user_id__in=user_ids).update(unread=F('unread') + by)
+
+    def decrement(self, user_id, by=1):
+        self.filter(user_id=user_id).update(
+            unread=Greatest(F('unread') - by, 0)
+        )
+
+    def unread_for(self, user):
+        unread = self.filter(user_id=user.id).values_list('unread', flat=True)
+        return next(iter(unread), 0)
+
+
+class UnreadCounter(models.Model):
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True
+    )
+    unread = models.PositiveIntegerField(default=0)
+
+    objects = UnreadCounterManager()
+
+
+class ApiToken(models.Model):
+    """
+    A token signing a client of the JSON API in as its user. Only the
+    SHA-256 of the key is kept, the key is shown once.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE,
+                             related_name='api_tokens')
+    digest = models.CharField(max_length=64, unique=True)
+    created = models.DateTimeField(auto_now_add=True)
+
+
+class Job(models.Model):
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DEAD = 'dead'
+    STATUSES = (
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (DEAD, 'Dead'),
+    )
+    name = models.CharField(max_length=64)
+    payload = models.TextField(default='{}')
+    status = models.CharField(max_length=8, choices=STATUSES, default=QUEUED)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=5)
+    run_after = models.DateTimeField(default=timezone.now)
+    claimed_by = models.CharField(max_length=64, blank=True)
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created = models.DateTimeField(auto_now_add=True)
 
-class MailboxSent(Mailbox):
-    recipient = models.CharField(max_length=64)
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'run_after'], name='job_ready_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.name} #{self.id} ({self.status})'
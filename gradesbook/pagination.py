@@ -0,0 +1,193 @@
+import base64
+import binascii
+import json
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+FIRST = 'first'
+LAST = 'last'
+# Seconds a total shown next to a keyset paginated list may be stale
+COUNT_TIMEOUT = 300
+
+
+def encode_token(direction, values):
+    data = json.dumps([direction, values], separators=(',', ':'),
+                      default=str)
+    return base64.urlsafe_b64encode(data.encode()).decode().rstrip('=')
+
+
+def decode_token(token):
+    """
+    Returns (direction, values) of an opaque token, (None, None) for
+    the first page and for tokens that can not be decoded.
+    """
+    if not token or token == FIRST:
+        return None, None
+    if token == LAST:
+        return LAST, None
+    try:
+        data = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        direction, values = json.loads(data.decode())
+    except (binascii.Error, UnicodeDecodeError, ValueError, TypeError):
+        return None, None
+    if direction not in ('next', 'previous') or not isinstance(values, list):
+        return None, None
+    return direction, values
+
+
+class KeysetPage:
+    def __init__(self, object_list, paginator, has_next, has_previous):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.has_next_page = has_next
+        self.has_previous_page = has_previous
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self.has_next_page
+
+    def has_previous(self):
+        return self.has_previous_page
+
+    def has_other_pages(self):
+        return self.has_next_page or self.has_previous_page
+
+    @property
+    def next_token(self):
+        if not self.has_next_page:
+            return None
+        return encode_token('next', self.paginator.key(self.object_list[-1]))
+
+    @property
+    def previous_token(self):
+        if not self.has_previous_page:
+            return None
+        return encode_token('previous',
+                            self.paginator.key(self.object_list[0]))
+
+
+class KeysetPaginator:
+    """
+    Pages a queryset by the values of its ordering fields instead of
+    OFFSET, so every page costs one indexed query of per_page + 1 rows
+    and no COUNT(*). The ordering must end with a unique field, e.g.
+    ('date', 'id') or ('-id',). Pages are addressed by opaque tokens,
+    'first' and 'last'.
+    """
+
+    def __init__(self, queryset, per_page, ordering=('-id',), count_key=None):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.ordering = tuple(ordering)
+        self.fields = [field.lstrip('-') for field in self.ordering]
+        self.count_key = count_key
+
+    def model_fields(self):
+        fields = []
+        for name in self.fields:
+            model = self.queryset.model
+            for part in name.split('__'):
+                field = model._meta.get_field(part)
+                model = field.related_model
+            fields.append(field)
+        return fields
+
+    def clean(self, values):
+        """
+        The values of a token converted by their model fields, None when
+        they do not fit the ordering.
+        """
+        if not isinstance(values, list) or len(values) != len(self.fields):
+            return None
+        cleaned = []
+        for field, value in zip(self.model_fields(), values):
+            if value is None:
+                return None
+            try:
+                cleaned.append(field.to_python(value))
+            except (ValidationError, TypeError, ValueError):
+                return None
+        return cleaned
+
+    def key(self, obj):
+        values = []
+        for field in self.fields:
+            value = obj
+            for part in field.split('__'):
+                value = getattr(value, part)
+            values.append(value)
+        return json.loads(json.dumps(values, default=str))
+
+    def after(self, values, reverse=False):
+        """
+        Q matching the rows after values in the ordering (before them
+        when reverse is set).
+        """
+        condition = None
+        for index in range(len(self.fields) - 1, -1, -1):
+            field = self.fields[index]
+            descending = self.ordering[index].startswith('-') != reverse
+            lookup = f'{field}__lt' if descending else f'{field}__gt'
+            strict = Q(**{lookup: values[index]})
+            if condition is None:
+                condition = strict
+            else:
+                condition = strict | (Q(**{field: values[index]}) & condition)
+        return condition
+
+    def reversed_ordering(self):
+        return [field[1:] if field.startswith('-') else f'-{field}'
+                for field in self.ordering]
+
+    def get_page(self, token=None):
+        direction, values = decode_token(token)
+        if values is not None:
+            values = self.clean(values)
+            if values is None:
+                # Tampered tokens show the first page
+                direction = None
+        limit = self.per_page + 1
+
+        if direction in ('previous', LAST):
+            queryset = self.queryset.order_by(*self.reversed_ordering())
+            if values is not None:
+                queryset = queryset.filter(self.after(values, reverse=True))
+            rows = list(queryset[:limit])
+            has_more = len(rows) > self.per_page
+            rows = rows[:self.per_page][::-1]
+            if not rows and values is not None:
+                return self.get_page()
+            return KeysetPage(rows, self, direction != LAST, has_more)
+
+        queryset = self.queryset.order_by(*self.ordering)
+        if values is not None:
+            queryset = queryset.filter(self.after(values))
+        rows = list(queryset[:limit])
+        has_more = len(rows) > self.per_page
+        if not rows and values is not None:
+            return self.get_page(LAST)
+        return KeysetPage(rows[:self.per_page], self, has_more,
+                          values is not None)
+
+    @property
+    def count(self):
+        """
+        Total number of rows, cached for COUNT_TIMEOUT seconds under
+        count_key. Only for lists that show it.
+        """
+        if self.count_key is None:
+            return self.queryset.count()
+        count = cache.get(self.count_key)
+        if count is None:
+            count = self.queryset.count()
+            cache.set(self.count_key, count, COUNT_TIMEOUT)
+        return count
@@ -1,3 +1,5 @@
+from django.contrib.auth.models import Permission, User
+from django.contrib.contenttypes.models import ContentType
 from django.db import models
 
 
@@ -11,3 +13,20 @@ class RightsSupport(models.Model):
             ('student', 'Global student rights'),
             ('parent', 'Global parent rights'),
         )
+
+
+def role_permission(codename):
+    """The permission of a role, declared by RightsSupport."""
+    return Permission.objects.get(
+        content_type=ContentType.objects.get_for_model(RightsSupport),
+        codename=codename
+    )
+
+
+def grant(codename, user_ids):
+    """Gives the permission of a role to users in bulk, without signals."""
+    permission = role_permission(codename)
+    User.user_permissions.through.objects.bulk_create([
+        User.user_permissions.through(user_id=user_id, permission=permission)
+        for user_id in user_ids
+    ], batch_size=500)
@@ -0,0 +1,133 @@
+import uuid
+from django.contrib.auth.models import Permission
+from django.core.cache import cache
+from django.db.models import Q
+from django.shortcuts import get_object_or_404
+from django.utils.functional import SimpleLazyObject
+from .models import Parent, Student, Teacher
+
+# Roles in the order they win when a user holds several of them
+ROLES = ('manager', 'teacher', 'student', 'parent')
+PEOPLE = {'teacher': Teacher, 'student': Student, 'parent': Parent}
+# The keys change with the fields of a resolved role, so that roles kept
+# before are resolved again
+SESSION_KEY = 'gradesbook:role:2'
+VERSION_KEY = 'gradesbook:role-version:{}'
+# Roles of requests without a session, by user id and role version. Old
+# versions are left to expire
+CACHED_KEY = 'gradesbook:role:2:{}:{}'
+CACHED_TIMEOUT = 24 * 60 * 60
+
+
+def role_version(user_id):
+    """
+    Returns the version of the role of a user, a new one is made up when
+    it was bumped or dropped from the cache.
+    """
+    key = VERSION_KEY.format(user_id)
+    version = cache.get(key)
+    if version is None:
+        version = uuid.uuid4().hex
+        if not cache.add(key, version, None):
+            version = cache.get(key, version)
+    return version
+
+
+def bump_role_version(user_ids):
+    """Makes the sessions of users resolve their role again."""
+    cache.delete_many([VERSION_KEY.format(user_id) for user_id in user_ids])
+
+
+def resolve_role(user):
+    """
+    Returns {'role', 'student_id', 'school_class_id'} of a user, the pupil
+    and its class for pupils and parents, role None when it has none.
+    """
+    if user.is_superuser:
+        return {'role': 'manager', 'student_id': None,
+                'school_class_id': None}
+    codenames = set(Permission.objects.filter(
+        Q(user=user) | Q(group__user=user),
+        content_type__app_label='gradesbook',
+        codename__in=ROLES
+    ).values_list('codename', flat=True))
+    role = next((role for role in ROLES if role in codenames), None)
+    student_id = school_class_id = None
+    if role == 'student':
+        student_id = user.id
+        school_class_id = Student.objects.filter(pk=user.id).values_list(
+            'school_class_id', flat=True
+        ).first()
+    elif role == 'parent':
+        row = Parent.objects.filter(pk=user.id).values_list(
+            'student_id', 'student__school_class_id'
+        ).first()
+        student_id, school_class_id = row or (None, None)
+    return {'role': role, 'student_id': student_id,
+            'school_class_id': school_class_id}
+
+
+def session_role(request, user, refresh=False):
+    """
+    Returns the role of the signed in user kept in the session, resolving
+    it again when its version has changed.
+    """
+    version = role_version(user.id)
+    resolved = request.session.get(SESSION_KEY)
+    if refresh or not resolved or resolved.get('version') != version:
+        resolved = dict(resolve_role(user), version=version)
+        request.session[SESSION_KEY] = resolved
+    return resolved
+
+
+def cached_role(user):
+    """
+    Returns the role of a user for requests without a session, like
+    those of API tokens, resolving it again when its version has changed.
+    """
+    key = CACHED_KEY.format(user.id, role_version(user.id))
+    resolved = cache.get(key)
+    if resolved is None:
+        resolved = resolve_role(user)
+        cache.set(key, resolved, CACHED_TIMEOUT)
+    return resolved
+
+
+def load_person(user_id, role):
+    if role == 'parent':
+        return get_object_or_404(
+            Parent.objects.select_related('student'), pk=user_id
+        )
+    return get_object_or_404(PEOPLE[role], pk=user_id)
+
+
+def attach_role(request, user=None, refresh=False):
+    """
+    Sets request.role, request.person (Teacher, Student or Parent row of
+    the user), request.student (the pupil itself or the child of a
+    parent), request.student_id and request.school_class_id of the
+    pupil. The rows are loaded on first use.
+    """
+    user = user or request.user
+    request.role = request.person = request.student = None
+    request.student_id = request.school_class_id = None
+    if not user.is_authenticated:
+        return
+    apply_role(request, user, session_role(request, user, refresh))
+
+
+def apply_role(request, user, resolved):
+    """Sets the role attributes of attach_role from a resolved role."""
+    request.person = request.student = None
+    role = request.role = resolved['role']
+    request.student_id = resolved['student_id']
+    request.school_class_id = resolved['school_class_id']
+    if role in PEOPLE:
+        user_id = user.id
+        request.person = SimpleLazyObject(
+            lambda: load_person(user_id, role)
+        )
+    if role == 'student':
+        request.student = request.person
+    elif role == 'parent':
+        request.student = SimpleLazyObject(lambda: request.person.student)
@@ -0,0 +1,175 @@
+from collections import namedtuple
+from django.db import transaction
+from django.db.models import Case, IntegerField, Value, When
+from .models import (Parent, SchoolClass, Student, Subject, SubjectDate,
+                     SubjectTeachers)
+from . import stamps
+from .roles import bump_role_version
+from .timetable import invalidate_timetables
+
+# Pupils of the last grade leave school with their class
+LAST_GRADE = 9
+
+Promotion = namedtuple('Promotion', ['school_class', 'name', 'unique_code'])
+Plan = namedtuple('Plan', [
+    'year', 'promotions', 'graduating', 'subjects', 'dates', 'teachers',
+    'pupils', 'conflicts'
+])
+
+
+class RolloverError(Exception):
+    pass
+
+
+def promoted_code(code, old_class_code, new_class_code):
+    """Ма5а2021 of the class 5а2021 becomes Ма6а2022 in 6а2022."""
+    prefix = code[:-len(old_class_code)] \
+        if code.endswith(old_class_code) else code
+    max_length = Subject._meta.get_field('unique_code').max_length
+    return prefix[:max_length - len(new_class_code)] + new_class_code
+
+
+def plan_rollover(year):
+    """
+    Counts what rolling the active classes of a year over to the next one
+    would create, without changing anything. Conflicts are the class and
+    subject codes of the new year that are already taken.
+    """
+    promotions = []
+    graduating = []
+    for school_class in SchoolClass.objects.filter(
+        active=True, year=year
+    ).order_by('name'):
+        grade = int(school_class.name[0])
+        if grade >= LAST_GRADE:
+            graduating.append(school_class)
+            continue
+        name = f'{grade + 1}{school_class.name[1:]}'
+        promotions.append(Promotion(school_class, name, f'{name}{year + 1}'))
+    class_ids = [promotion.school_class.id for promotion in promotions]
+    codes = {promotion.school_class.id: promotion.unique_code
+             for promotion in promotions}
+    subject_codes = [
+        promoted_code(code, old_code, codes[class_id])
+        for code, old_code, class_id in Subject.objects.filter(
+            school_class_id__in=class_ids
+        ).values_list('unique_code', 'school_class__unique_code',
+                      'school_class_id')
+    ]
+    conflicts = list(SchoolClass.objects.filter(
+        unique_code__in=codes.values()
+    ).values_list('unique_code', flat=True)) + list(Subject.objects.filter(
+        unique_code__in=subject_codes
+    ).values_list('unique_code', flat=True))
+    return Plan(
+        year=year,
+        promotions=promotions,
+        graduating=graduating,
+        subjects=len(subject_codes),
+        dates=SubjectDate.objects.filter(
+            subject__school_class_id__in=class_ids
+        ).count(),
+        teachers=SubjectTeachers.teacher.through.objects.filter(
+            subjectteachers__subject__school_class_id__in=class_ids
+        ).count(),
+        pupils=Student.objects.filter(school_class_id__in=class_ids).count(),
+        conflicts=sorted(conflicts)
+    )
+
+
+def roll_over(year):
+    """
+    Promotes the active classes of a year in one transaction: the classes
+    of the next year are created with copies of the subjects, timetable
+    and teachers, the pupils move to them and the old classes are
+    deactivated. Graduating classes are only deactivated. Returns the
+    Plan that was carried out.
+    """
+    with transaction.atomic():
+        plan = plan_rollover(year)
+        if plan.conflicts:
+            raise RolloverError(
+                f'Вже існують: {", ".join(plan.conflicts)}.'
+            )
+        SchoolClass.objects.bulk_create([
+            SchoolClass(name=promotion.name, year=year + 1,
+                        unique_code=promotion.unique_code)
+            for promotion in plan.promotions
+        ])
+        new_classes = dict(SchoolClass.objects.filter(unique_code__in=[
+            promotion.unique_code for promotion in plan.promotions
+        ]).values_list('unique_code', 'id'))
+        class_ids = {
+            promotion.school_class.id: new_classes[promotion.unique_code]
+            for promotion in plan.promotions
+        }
+
+        new_codes = {promotion.school_class.id: promotion.unique_code
+                     for promotion in plan.promotions}
+        old_subjects = list(Subject.objects.filter(
+            school_class_id__in=class_ids
+        ).values_list('id', 'name', 'unique_code', 'school_class_id',
+                      'school_class__unique_code'))
+        Subject.objects.bulk_create([
+            Subject(name=name, school_class_id=class_ids[class_id],
+                    unique_code=promoted_code(code, class_code,
+                                              new_codes[class_id]))
+            for _, name, code, class_id, class_code in old_subjects
+        ], batch_size=500)
+        new_subjects = dict(Subject.objects.filter(
+            school_class_id__in=class_ids.values()
+        ).values_list('unique_code', 'id'))
+        subject_ids = {
+            subject_id: new_subjects[promoted_code(code, class_code,
+                                                   new_codes[class_id])]
+            for subject_id, _, code, class_id, class_code in old_subjects
+        }
+
+        SubjectDate.objects.bulk_create([
+            SubjectDate(subject_id=subject_ids[subject_id], day=day,
+                        lesson_number=lesson_number)
+            for subject_id, day, lesson_number in SubjectDate.objects.filter(
+                subject_id__in=subject_ids
+            ).values_list('subject_id', 'day', 'lesson_number')
+        ], batch_size=500)
+
+        teachers = {}
+        for subject_id, teacher_id in \
+                SubjectTeachers.teacher.through.objects.filter(
+                    subjectteachers__subject_id__in=subject_ids
+                ).values_list('subjectteachers__subject_id', 'teacher_id'):
+            teachers.setdefault(subject_ids[subject_id], set()).add(teacher_id)
+        SubjectTeachers.objects.bulk_create([
+            SubjectTeachers(subject_id=subject_id) for subject_id in teachers
+        ], batch_size=500)
+        SubjectTeachers.teacher.through.objects.bulk_create([
+            SubjectTeachers.teacher.through(subjectteachers_id=row_id,
+                                            teacher_id=teacher_id)
+            for row_id, subject_id in SubjectTeachers.objects.filter(
+                subject_id__in=teachers
+            ).values_list('id', 'subject_id')
+            for teacher_id in teachers[subject_id]
+        ], batch_size=500)
+
+        moved = Student.objects.filter(school_class_id__in=class_ids)
+        # Sessions of pupils and their parents keep the class of the pupil
+        moved_users = list(moved.values_list('pk', flat=True)) + list(
+            Parent.objects.filter(student__in=moved).values_list('pk',
+                                                                 flat=True)
+        )
+        if class_ids:
+            moved.update(
+                school_class_id=Case(
+                    *[When(school_class_id=old, then=Value(new))
+                      for old, new in class_ids.items()],
+                    output_field=IntegerField()
+                )
+            )
+        SchoolClass.objects.filter(id__in=list(class_ids) + [
+            school_class.id for school_class in plan.graduating
+        ]).update(active=False)
+    # Bulk inserts and updates send no signals
+    invalidate_timetables()
+    bump_role_version(moved_users)
+    stamps.bump([stamps.SCHOOL])
+    return plan
@@ -0,0 +1,125 @@
+import datetime
+from collections import namedtuple
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncWeek
+from django.utils import timezone
+from .models import CanceledGrades, GradeRollup, Grades, Subject, week_of
+
+GRADES = range(1, 6)
+COUNTS = [f'count_{grade}' for grade in GRADES]
+# Subjects recomputed in one transaction
+CHUNK_SIZE = 50
+# Weeks shown in the trend of a class
+WEEKS = 12
+
+Summary = namedtuple(
+    'Summary', ['key', 'label', 'bars', 'total', 'average', 'canceled']
+)
+Bar = namedtuple('Bar', ['grade', 'count', 'percent'])
+
+
+def rebuild_rollups(subject_ids=None, chunk_size=CHUNK_SIZE):
+    """
+    Recomputes the rollups of subjects, all of them by default, from
+    Grades and CanceledGrades, one transaction per chunk of subjects.
+    Returns the number of rollups written.
+    """
+    if subject_ids is None:
+        subject_ids = list(Subject.objects.order_by('id').values_list(
+            'id', flat=True
+        ))
+    written = 0
+    for start in range(0, len(subject_ids), chunk_size):
+        chunk = subject_ids[start:start + chunk_size]
+        with transaction.atomic():
+            rollups = {}
+
+            def rollup(row):
+                key = row['subject_id'], row['week']
+                if key not in rollups:
+                    rollups[key] = GradeRollup(
+                        school_class_id=row['subject__school_class_id'],
+                        subject_id=row['subject_id'],
+                        week=row['week']
+                    )
+                return rollups[key]
+
+            for row in weekly(Grades, chunk, grade_sum=Sum('grade'), **{
+                field: Count('id', filter=Q(grade=grade))
+                for grade, field in zip(GRADES, COUNTS)
+            }):
+                grade_rollup = rollup(row)
+                for field in COUNTS + ['grade_sum']:
+                    setattr(grade_rollup, field, row[field])
+            for row in weekly(CanceledGrades, chunk, canceled=Count('id')):
+                rollup(row).canceled = row['canceled']
+            GradeRollup.objects.filter(subject_id__in=chunk).delete()
+            GradeRollup.objects.bulk_create(rollups.values(), batch_size=500)
+        written += len(rollups)
+    return written
+
+
+def weekly(model, subject_ids, **aggregates):
+    return model.objects.filter(subject_id__in=subject_ids).annotate(
+        week=TruncWeek('date')
+    ).order_by().values(
+        'subject_id', 'subject__school_class_id', 'week'
+    ).annotate(**aggregates)
+
+
+def summary(row, key, label):
+    total = sum(row[field] or 0 for field in COUNTS)
+    return Summary(
+        key=key,
+        label=label,
+        bars=[Bar(grade, row[field] or 0,
+                  round(100 * (row[field] or 0) / total) if total else 0)
+              for grade, field in zip(GRADES, COUNTS)],
+        total=total,
+        average=row['grade_sum'] / total if total else None,
+        canceled=row['canceled'] or 0
+    )
+
+
+def totals(rollups, *group_by):
+    return rollups.order_by().values(*group_by).annotate(
+        grade_sum=Sum('grade_sum'),
+        canceled=Sum('canceled'),
+        **{field: Sum(field) for field in COUNTS}
+    )
+
+
+def class_summaries():
+    """Summary of every active class, in the order of class names."""
+    return [
+        summary(row, row['school_class__unique_code'],
+                row['school_class__name'])
+        for row in totals(
+            GradeRollup.objects.filter(school_class__active=True),
+            'school_class__unique_code', 'school_class__name'
+        ).order_by('school_class__name', 'school_class__unique_code')
+    ]
+
+
+def subject_summaries(school_class):
+    return [
+        summary(row, row['subject__unique_code'], row['subject__name'])
+        for row in totals(
+            GradeRollup.objects.filter(school_class=school_class),
+            'subject__unique_code', 'subject__name'
+        ).order_by('subject__name')
+    ]
+
+
+def weekly_trend(school_class, weeks=WEEKS):
+    """Summaries of the last weeks of a class, the oldest first."""
+    since = week_of(timezone.localdate()) - datetime.timedelta(weeks=weeks - 1)
+    return [
+        summary(row, row['week'], row['week'])
+        for row in totals(
+            GradeRollup.objects.filter(school_class=school_class,
+                                       week__gte=since),
+            'week'
+        ).order_by('week')
+    ]
@@ -0,0 +1,241 @@
+import csv
+import datetime
+import io
+import time
+import zipfile
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import transaction
+from .models import Parent, SchoolClass, Student
+from .permissions import grant
+from .usernames import claim_usernames
+
+try:
+    import openpyxl
+except ImportError:
+    openpyxl = None
+
+# Header of a roster file, the class column may be left out when the
+# roster is imported into one class
+COLUMNS = ('class', 'surname', 'name', 'birthday', 'parent1_name',
+           'parent1_surname', 'parent2_name', 'parent2_surname')
+REQUIRED = ('surname', 'name', 'birthday', 'parent1_name', 'parent1_surname')
+DATE_FORMATS = ('%d.%m.%Y', '%Y-%m-%d')
+# Passwords of new users, shown to the manager until the first login
+STUDENT_PASSWORD_SUFFIX = '123'
+PARENT_PASSWORD_SUFFIX = '345'
+CHUNK_SIZE = 200
+# PBKDF2 releases the GIL, so passwords are hashed by several threads
+HASHING_THREADS = 8
+MAX_ERRORS = 200
+
+RosterError = namedtuple('RosterError', ['line', 'message'])
+ImportResult = namedtuple(
+    'ImportResult', ['rows', 'students', 'parents', 'errors', 'seconds']
+)
+
+
+class RosterFormatError(Exception):
+    pass
+
+
+def read_rows(file, filename):
+    """
+    Yields (line number, {column: value}) of a CSV or XLSX roster one row
+    at a time.
+    """
+    if filename.lower().endswith('.xlsx'):
+        yield from read_table(read_xlsx(file))
+        return
+    text = io.TextIOWrapper(file, encoding='utf-8-sig', newline='')
+    try:
+        sample = text.read(2048)
+        text.seek(0)
+        try:
+            dialect = csv.Sniffer().sniff(sample, delimiters=',;\t')
+        except csv.Error:
+            dialect = csv.excel
+        yield from read_table(csv.reader(text, dialect))
+    except UnicodeDecodeError:
+        raise RosterFormatError('Файл має бути у кодуванні UTF-8.')
+    finally:
+        # Leaves the file itself open for the second pass
+        text.detach()
+
+
+def read_xlsx(file):
+    if openpyxl is None:
+        raise RosterFormatError('Для файлів XLSX потрібен пакет openpyxl.')
+    try:
+        workbook = openpyxl.load_workbook(file, read_only=True,
+                                          data_only=True)
+    except (zipfile.BadZipFile, KeyError, ValueError):
+        raise RosterFormatError('Файл XLSX пошкоджено.')
+    try:
+        for row in workbook.active.iter_rows(values_only=True):
+            yield ['' if value is None else value for value in row]
+    finally:
+        workbook.close()
+
+
+def read_table(rows):
+    header = None
+    for number, row in enumerate(rows, 1):
+        if header is None:
+            header = [str(value).strip().lower() for value in row]
+            unknown = set(header) - set(COLUMNS) - {''}
+            missing = set(REQUIRED) - set(header)
+            if unknown or missing:
+                raise RosterFormatError(
+                    f'Заголовок файлу має містити колонки '
+                    f'{", ".join(COLUMNS)}.'
+                )
+            continue
+        values = dict(zip(header, row))
+        if not any(str(value).strip() for value in values.values()):
+            continue
+        yield number, values
+
+
+def parse_birthday(value):
+    if isinstance(value, datetime.datetime):
+        return value.date()
+    if isinstance(value, datetime.date):
+        return value
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.datetime.strptime(str(value).strip(),
+                                              date_format).date()
+        except ValueError:
+            pass
+    return None
+
+
+def clean_row(values, classes, school_class=None):
+    """
+    Returns (row, errors) for one line of a roster, row holding the
+    cleaned values and the id of the class.
+    """
+    row = {column: str(values.get(column) or '').strip()
+           for column in COLUMNS if column != 'birthday'}
+    errors = [f'не заповнено колонку {column}' for column in REQUIRED
+              if column != 'birthday' and not row[column]]
+    errors += [f'{column} довше 64 символів' for column in COLUMNS
+               if len(row.get(column, '')) > 64]
+    row['birthday'] = parse_birthday(values.get('birthday') or '')
+    if row['birthday'] is None:
+        errors.append('дата народження має бути у форматі ДД.ММ.РРРР')
+    if bool(row['parent2_name']) != bool(row['parent2_surname']):
+        errors.append('для другого з батьків потрібні ім\'я і прізвище')
+    if school_class is not None:
+        row['class_id'] = school_class.id
+    elif row['class'] in classes:
+        row['class_id'] = classes[row['class']]
+    else:
+        errors.append(f'класу "{row["class"]}" немає')
+    return row, errors
+
+
+def validate(file, filename, school_class=None):
+    """
+    First pass over the roster. Returns (row count, errors), at most
+    MAX_ERRORS of them are kept.
+    """
+    classes = dict(SchoolClass.objects.values_list('unique_code', 'id'))
+    count = 0
+    errors = []
+    for number, values in read_rows(file, filename):
+        count += 1
+        _, row_errors = clean_row(values, classes, school_class)
+        if row_errors and len(errors) < MAX_ERRORS:
+            errors.append(RosterError(number, '; '.join(row_errors)))
+    return count, errors
+
+
+def create_chunk(rows, executor):
+    """Creates the users, pupils and parents of rows, returns the counts."""
+    people = []
+    for index, row in enumerate(rows):
+        people.append(('student', row['name'], row['surname'], index))
+        for parent in ('parent1', 'parent2'):
+            if row[f'{parent}_name']:
+                people.append(('parent', row[f'{parent}_name'],
+                               row[f'{parent}_surname'], index))
+
+    def save(usernames):
+        passwords = executor.map(make_password, [
+            username + (STUDENT_PASSWORD_SUFFIX if role == 'student'
+                        else PARENT_PASSWORD_SUFFIX)
+            for username, (role, *_) in zip(usernames, people)
+        ])
+        User.objects.bulk_create([
+            User(username=username, password=password, first_name=name,
+                 last_name=surname)
+            for username, password, (_, name, surname, _) in zip(
+                usernames, passwords, people
+            )
+        ])
+        return usernames
+
+    usernames = claim_usernames(
+        [name + surname for _, name, surname, _ in people], save
+    )
+    user_ids = dict(User.objects.filter(
+        username__in=usernames
+    ).values_list('username', 'id'))
+    people = [(user_ids[username], *person)
+              for username, person in zip(usernames, people)]
+    for role in ('student', 'parent'):
+        grant(role, [user_id for user_id, person_role, *_ in people
+                     if person_role == role])
+
+    student_ids = {index: user_id
+                   for user_id, role, _, _, index in people
+                   if role == 'student'}
+    Student.objects.bulk_create([
+        Student(user_id=user_id, name=name, surname=surname,
+                birthday=rows[index]['birthday'],
+                school_class_id=rows[index]['class_id'])
+        for user_id, role, name, surname, index in people
+        if role == 'student'
+    ])
+    Parent.objects.bulk_create([
+        Parent(user_id=user_id, name=name, surname=surname,
+               student_id=student_ids[index])
+        for user_id, role, name, surname, index in people
+        if role == 'parent'
+    ])
+    return len(student_ids), len(people) - len(student_ids)
+
+
+def import_roster(file, filename, school_class=None, chunk_size=CHUNK_SIZE):
+    """
+    Validates the whole roster and, when every row is valid, streams it
+    again creating users, permissions, pupils and parents with batched
+    inserts, one transaction per chunk of rows.
+    """
+    started = time.perf_counter()
+    count, errors = validate(file, filename, school_class)
+    if errors:
+        return ImportResult(count, 0, 0, errors,
+                            time.perf_counter() - started)
+
+    file.seek(0)
+    classes = dict(SchoolClass.objects.values_list('unique_code', 'id'))
+    students = parents = 0
+    with ThreadPoolExecutor(HASHING_THREADS) as executor:
+        rows = read_rows(file, filename)
+        while True:
+            chunk = [clean_row(values, classes, school_class)[0]
+                     for _, values in islice(rows, chunk_size)]
+            if not chunk:
+                break
+            with transaction.atomic():
+                created = create_chunk(chunk, executor)
+            students += created[0]
+            parents += created[1]
+    return ImportResult(count, students, parents, [],
+                        time.perf_counter() - started)
@@ -0,0 +1,317 @@
+import re
+from collections import namedtuple
+from django.db import connection
+from django.db.models import Q
+from .models import InboxEntry, Message, Parent, Student, Teacher
+
+# unicode61 folds the case of Cyrillic letters. Diacritics are kept
+# because й, ї and є are letters of their own, and the modifier letter
+# apostrophe of сімʼя splits words like the other apostrophes do
+TOKENIZE = "unicode61 remove_diacritics 0 separators 'ʼ'"
+# A letter or digit of a token
+WORD = r'[^\Wʼ]'
+# Longest prefix with an index of its own, see matching_mail
+PREFIX_INDEX = 4
+MESSAGE_TABLE = 'gradesbook_message_fts'
+PERSON_TABLE = 'gradesbook_person_fts'
+# (model, role) of the people in PERSON_TABLE, keyed by user id
+PEOPLE = ((Student, 'student'), (Parent, 'parent'), (Teacher, 'teacher'))
+# Words of a query used, the rest is ignored
+MAX_TERMS = 8
+RESULTS = 20
+# Messages matching the shortened words are checked for the whole ones while
+# at least one in this many of them has them, see matching_mail
+CANDIDATE_SHARE = 4
+
+MailHit = namedtuple('MailHit', ['message', 'mailbox_id', 'mailbox_type'])
+PersonHit = namedtuple('PersonHit', ['person', 'role'])
+
+
+def person_triggers(model, role):
+    table = model._meta.db_table
+    return [
+        f"CREATE TRIGGER IF NOT EXISTS {table}_fts_insert "
+        f"AFTER INSERT ON {table} BEGIN "
+        f"INSERT INTO {PERSON_TABLE}(rowid, name, surname, role) "
+        f"VALUES (new.user_id, new.name, new.surname, '{role}'); END",
+        f"CREATE TRIGGER IF NOT EXISTS {table}_fts_delete "
+        f"AFTER DELETE ON {table} BEGIN "
+        f"DELETE FROM {PERSON_TABLE} WHERE rowid = old.user_id; END",
+        f"CREATE TRIGGER IF NOT EXISTS {table}_fts_update "
+        f"AFTER UPDATE OF name, surname ON {table} BEGIN "
+        f"UPDATE {PERSON_TABLE} SET name = new.name, surname = new.surname "
+        f"WHERE rowid = old.user_id; END",
+    ]
+
+
+def schema():
+    """
+    Statements creating the search tables and the triggers keeping them
+    in sync with every insert, update and delete, bulk ones included.
+    Messages are indexed without a copy of their text (an external
+    content table), people are few and stored with their role.
+    """
+    message = Message._meta.db_table
+    prefixes = ' '.join(str(length) for length in range(2, PREFIX_INDEX + 1))
+    old_message = (f"INSERT INTO {MESSAGE_TABLE}"
+                   f"({MESSAGE_TABLE}, rowid, subject, text) "
+                   f"VALUES ('delete', old.id, old.subject, old.text);")
+    new_message = (f"INSERT INTO {MESSAGE_TABLE}(rowid, subject, text) "
+                   f"VALUES (new.id, new.subject, new.text);")
+    statements = [
+        f'CREATE VIRTUAL TABLE IF NOT EXISTS {MESSAGE_TABLE} USING fts5('
+        f"subject, text, content='{message}', content_rowid='id', "
+        f'tokenize="{TOKENIZE}", prefix=\'{prefixes}\')',
+        f'CREATE VIRTUAL TABLE IF NOT EXISTS {PERSON_TABLE} USING fts5('
+        f'name, surname, role UNINDEXED, '
+        f'tokenize="{TOKENIZE}", prefix=\'{prefixes}\')',
+        f'CREATE TRIGGER IF NOT EXISTS {message}_fts_insert '
+        f'AFTER INSERT ON {message} BEGIN {new_message} END',
+        f'CREATE TRIGGER IF NOT EXISTS {message}_fts_delete '
+        f'AFTER DELETE ON {message} BEGIN {old_message} END',
+        f'CREATE TRIGGER IF NOT EXISTS {message}_fts_update '
+        f'AFTER UPDATE OF subject, text ON {message} BEGIN '
+        f'{old_message} {new_message} END',
+    ]
+    for model, role in PEOPLE:
+        statements += person_triggers(model, role)
+    return statements
+
+
+def available(using=connection):
+    """Search needs the FTS5 extension of SQLite."""
+    return using.vendor == 'sqlite'
+
+
+def installed(using=connection):
+    return available(using) and \
+        MESSAGE_TABLE in using.introspection.table_names()
+
+
+def install(using=connection):
+    """
+    Creates whatever part of the search schema is missing. SQLite drops
+    the triggers of a table Django rebuilds to alter it, so an installed
+    search is installed again after every migrate.
+    """
+    if not available(using):
+        return
+    with using.cursor() as cursor:
+        for statement in schema():
+            cursor.execute(statement)
+
+
+def rebuild(using=connection):
+    """Fills the search tables from scratch, returns (messages, people)."""
+    if not available(using):
+        return 0, 0
+    install(using)
+    with using.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {MESSAGE_TABLE}({MESSAGE_TABLE}) VALUES ('rebuild')"
+        )
+        cursor.execute(f'DELETE FROM {PERSON_TABLE}')
+        for model, role in PEOPLE:
+            cursor.execute(
+                f'INSERT INTO {PERSON_TABLE}(rowid, name, surname, role) '
+                f'SELECT user_id, name, surname, %s '
+                f'FROM {model._meta.db_table}',
+                [role]
+            )
+        counts = []
+        for table in (MESSAGE_TABLE, PERSON_TABLE):
+            cursor.execute(f'SELECT COUNT(*) FROM {table}')
+            counts.append(cursor.fetchone()[0])
+    return tuple(counts)
+
+
+def uninstall(using=connection):
+    if not available(using):
+        return
+    with using.cursor() as cursor:
+        cursor.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'trigger' "
+            "AND name LIKE 'gradesbook%fts%'"
+        )
+        for name, in cursor.fetchall():
+            cursor.execute(f'DROP TRIGGER {name}')
+        for table in (MESSAGE_TABLE, PERSON_TABLE):
+            cursor.execute(f'DROP TABLE IF EXISTS {table}')
+
+
+def terms(query):
+    """
+    Lowercase words of a search query, split like the tokenizer splits
+    text: 'Квітка-Основ\'яненко' gives квітка, основ and яненко.
+    """
+    return re.findall(f'{WORD}+', query.lower())[:MAX_TERMS]
+
+
+def match_expression(words):
+    """
+    FTS5 query matching documents with every word as a prefix of one of
+    their words, '"мат"* "5а"*' for мат and 5а. Single letters match
+    only themselves, every word in the index starts with one.
+    """
+    return ' '.join(
+        f'"{word}"' if len(word) == 1 else f'"{word}"*' for word in words
+    )
+
+
+def subquery(queryset):
+    """SQL and parameters of queryset, None for no queryset."""
+    if queryset is None:
+        return None
+    return queryset.query.get_compiler(queryset.db).as_sql()
+
+
+def matching_ids(table, words, scope, order, limit, before=None):
+    """
+    Row ids of table matching words, limited to the ids selected by the
+    scope subquery when there is one and to ids below before. The scope
+    is tested on +rowid so SQLite does not hand it to FTS5, which would
+    evaluate the query once per id of the scope.
+    """
+    sql = f'SELECT rowid FROM {table} WHERE {table} MATCH %s'
+    params = [match_expression(words)]
+    if before is not None:
+        sql += ' AND rowid < %s'
+        params.append(before)
+    if scope is not None:
+        scope_sql, scope_params = scope
+        sql += f' AND +rowid IN ({scope_sql})'
+        params += list(scope_params)
+    sql += f' ORDER BY {order} LIMIT %s'
+    params.append(limit)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [row[0] for row in cursor.fetchall()]
+
+
+def texts(message_ids):
+    """(id, subject and text) of messages, newest first."""
+    if not message_ids:
+        return []
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT id, subject || ' ' || text "
+            f"FROM {Message._meta.db_table} WHERE id IN "
+            f"({', '.join(['%s'] * len(message_ids))}) ORDER BY id DESC",
+            message_ids
+        )
+        return cursor.fetchall()
+
+
+def contains_words(text, words):
+    text = text.lower()
+    return all(re.search(f'(?<!{WORD})' + re.escape(word), text)
+               for word in words)
+
+
+def matching_mail(words, scope, limit):
+    """
+    Ids of the newest messages matching words. Prefixes up to
+    PREFIX_INDEX letters are looked up in prefix indexes and read lazily
+    from the newest message on, but FTS5 reads the whole index of a
+    longer prefix before returning anything, which takes tens of
+    milliseconds for a word in most messages. Longer words are cut to
+    PREFIX_INDEX letters instead and the messages found are checked
+    against the whole words here, in batches growing from limit. When
+    few of a batch have the words, the words are rare and so are their
+    prefixes in the index, which FTS5 then reads quickly.
+    """
+    if all(len(word) <= PREFIX_INDEX for word in words):
+        return matching_ids(MESSAGE_TABLE, words, scope, 'rowid DESC', limit)
+    shortened = [word[:PREFIX_INDEX] for word in words]
+    ids, before, batch = [], None, limit
+    while True:
+        candidates = matching_ids(MESSAGE_TABLE, shortened, scope,
+                                  'rowid DESC', batch, before)
+        found = [message_id for message_id, text in texts(candidates)
+                 if contains_words(text, words)]
+        ids += found
+        if len(ids) >= limit or len(candidates) < batch:
+            return ids[:limit]
+        if len(found) * CANDIDATE_SHARE < batch:
+            return matching_ids(MESSAGE_TABLE, words, scope, 'rowid DESC',
+                                limit)
+        before, batch = candidates[-1], batch * 2
+
+
+def own_mail(user):
+    """Ids of the messages received by user and sent from the mailbox."""
+    return InboxEntry.objects.filter(user=user).values('message_id').union(
+        Message.objects.filter(sender=user).exclude(recipient='')
+        .values('id'),
+        all=True
+    )
+
+
+def search_mail(user, role, query, limit=RESULTS):
+    """
+    Newest messages matching query as MailHits. Managers search the mail
+    of the whole school, everyone else only their own.
+    """
+    words = terms(query)
+    if not words:
+        return []
+    ids = matching_mail(
+        words, None if role == 'manager' else subquery(own_mail(user)), limit
+    )
+    messages = Message.objects.select_related('sender').only(
+        'date', 'subject', 'sender__first_name', 'sender__last_name'
+    ).in_bulk(ids)
+    entries = dict(InboxEntry.objects.filter(
+        user=user, message_id__in=ids
+    ).values_list('message_id', 'id'))
+    hits = []
+    for message_id in ids:
+        message = messages[message_id]
+        if message.sender_id == user.id:
+            hits.append(MailHit(message, message_id, 2))
+        elif message_id in entries:
+            hits.append(MailHit(message, entries[message_id], 1))
+        else:
+            # Mail of others is listed but only its sender and recipients
+            # open it
+            hits.append(MailHit(message, None, None))
+    return hits
+
+
+def visible_people(user, role):
+    """
+    Ids of the people a role may look up, None for all of them: teachers
+    find the pupils and parents of the classes they teach.
+    """
+    if role == 'manager':
+        return None
+    taught = Q(school_class__subject__subjectteachers__teacher__user=user)
+    return Student.objects.filter(taught).values('user_id').union(
+        Parent.objects.filter(
+            student__in=Student.objects.filter(taught)
+        ).values('user_id'),
+        all=True
+    )
+
+
+def search_people(user, role, query, limit=RESULTS):
+    """
+    Pupils, parents and teachers matching query as PersonHits, best
+    matches first. Pupils and parents cannot look people up.
+    """
+    words = terms(query)
+    if not words or role not in ('manager', 'teacher'):
+        return []
+    ids = matching_ids(PERSON_TABLE, words,
+                       subquery(visible_people(user, role)),
+                       'rank', limit)
+    found = {}
+    for model, role_name in PEOPLE:
+        people = model.objects.filter(user_id__in=ids)
+        if model is Student:
+            people = people.select_related('school_class')
+        elif model is Parent:
+            people = people.select_related('student__school_class')
+        for person in people:
+            found[person.user_id] = PersonHit(person, role_name)
+    return [found[user_id] for user_id in ids if user_id in found]
@@ -0,0 +1,123 @@
+from django.contrib.auth.models import User
+from django.contrib.auth.signals import user_logged_in
+from django.db import connections
+from django.db.models.signals import (m2m_changed, post_delete, post_migrate,
+                                      post_save)
+from django.dispatch import receiver
+from . import stamps
+from .models import (CanceledGrades, GradeRollup, Grades, InboxEntry,
+                     Message, Parent, SchoolClass, Student, Subject,
+                     SubjectDate, SubjectTeachers, UnreadCounter)
+from .roles import attach_role, bump_role_version
+from .search import install, installed
+from .timetable import invalidate_timetables
+
+
+@receiver(post_save, sender=InboxEntry)
+def count_received_mail(sender, instance, created, **kwargs):
+    if created and not instance.read:
+        UnreadCounter.objects.increment([instance.user_id])
+    stamps.bump([stamps.INBOX.format(instance.user_id)])
+
+
+@receiver(post_delete, sender=InboxEntry)
+def uncount_deleted_mail(sender, instance, **kwargs):
+    if not instance.read:
+        UnreadCounter.objects.decrement(instance.user_id)
+    stamps.bump([stamps.INBOX.format(instance.user_id)])
+
+
+@receiver(post_save, sender=Message)
+@receiver(post_delete, sender=Message)
+def sent_mail_changed(sender, instance, **kwargs):
+    stamps.bump([stamps.INBOX.format(instance.sender_id)])
+
+
+@receiver(post_save, sender=SchoolClass)
+@receiver(post_delete, sender=SchoolClass)
+@receiver(post_save, sender=Subject)
+@receiver(post_delete, sender=Subject)
+@receiver(post_save, sender=SubjectDate)
+@receiver(post_delete, sender=SubjectDate)
+@receiver(post_save, sender=SubjectTeachers)
+@receiver(post_delete, sender=SubjectTeachers)
+@receiver(m2m_changed, sender=SubjectTeachers.teacher.through)
+def timetable_changed(sender, instance, **kwargs):
+    invalidate_timetables()
+    keys = [stamps.TEACHERS]
+    # Teachers of a subject appear only in their own timetables
+    if sender is SchoolClass:
+        keys.append(stamps.CLASS.format(instance.id))
+    elif sender is Subject:
+        keys.append(stamps.CLASS.format(instance.school_class_id))
+    elif sender in (SubjectDate, SubjectTeachers):
+        keys.append(stamps.CLASS.format(instance.subject.school_class_id))
+    stamps.bump(keys)
+
+
+@receiver(user_logged_in)
+def remember_role(sender, request, user, **kwargs):
+    if request is not None and hasattr(request, 'session'):
+        attach_role(request, user, refresh=True)
+
+
+@receiver(m2m_changed, sender=User.user_permissions.through)
+@receiver(m2m_changed, sender=User.groups.through)
+def user_permissions_changed(sender, instance, action, reverse, pk_set,
+                             **kwargs):
+    if reverse and action == 'pre_clear':
+        # Cleared from the side of the permission or group, the users are
+        # unknown afterwards
+        bump_role_version(instance.user_set.values_list('id', flat=True))
+    elif action in ('post_add', 'post_remove', 'post_clear'):
+        bump_role_version(pk_set if reverse else [instance.pk])
+
+
+@receiver(post_save, sender=Parent)
+@receiver(post_delete, sender=Parent)
+def parent_changed(sender, instance, **kwargs):
+    # The child of a parent is kept in the session with the role
+    bump_role_version([instance.pk])
+    stamps.bump([stamps.PUPIL.format(instance.student_id)])
+
+
+@receiver(post_save, sender=Student)
+@receiver(post_delete, sender=Student)
+def pupil_changed(sender, instance, **kwargs):
+    # The class of a pupil is kept in the sessions of the pupil and parents
+    bump_role_version([instance.pk] + list(
+        Parent.objects.filter(student_id=instance.pk).values_list('pk',
+                                                                  flat=True)
+    ))
+    stamps.bump([stamps.PUPIL.format(instance.pk)])
+
+
+def rollup_row(grade):
+    # The class is known without a query when the subject is loaded
+    school_class_id = grade.subject.school_class_id \
+        if type(grade).subject.is_cached(grade) else None
+    return school_class_id, grade.subject_id, grade.date, grade.grade
+
+
+@receiver(post_save, sender=Grades)
+@receiver(post_save, sender=CanceledGrades)
+def count_grade(sender, instance, created, **kwargs):
+    if created:
+        GradeRollup.objects.add([rollup_row(instance)],
+                                canceled=sender is CanceledGrades)
+    stamps.bump([stamps.PUPIL.format(instance.student_id)])
+
+
+@receiver(post_delete, sender=Grades)
+@receiver(post_delete, sender=CanceledGrades)
+def uncount_grade(sender, instance, **kwargs):
+    GradeRollup.objects.add([rollup_row(instance)], sign=-1,
+                            canceled=sender is CanceledGrades)
+    stamps.bump([stamps.PUPIL.format(instance.student_id)])
+
+
+@receiver(post_migrate)
+def reinstall_search(sender, using, **kwargs):
+    # Altering a table in SQLite recreates it without its triggers
+    if sender.name == 'gradesbook' and installed(connections[using]):
+        install(connections[using])
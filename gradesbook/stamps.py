@@ -0,0 +1,75 @@
+import datetime
+import hashlib
+import time
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+
+# When what a page shows last changed, as Unix times kept in the cache.
+# A missing stamp is taken as changed now, so bumping drops it.
+# Grades and personal data of a pupil, by pupil id
+PUPIL = 'gradesbook:stamp:pupil:{}'
+# Subjects and timetable of a class, by class id
+CLASS = 'gradesbook:stamp:class:{}'
+# Inbox, sent mail and unread count of a user, by user id
+INBOX = 'gradesbook:stamp:inbox:{}'
+# Timetables of the teachers
+TEACHERS = 'gradesbook:stamp:teachers'
+# Changes to many classes at once: archiving and the year rollover
+SCHOOL = 'gradesbook:stamp:school'
+
+
+def read(keys):
+    """Returns the stamps of keys, in order, in one cache lookup."""
+    found = cache.get_many(keys)
+    now = time.time()
+    for key in keys:
+        if key not in found:
+            if not cache.add(key, now, None):
+                found[key] = cache.get(key, now)
+            else:
+                found[key] = now
+    return [found[key] for key in keys]
+
+
+def bump(keys):
+    """
+    Marks the data behind keys as changed. The stamps are dropped again
+    on commit, a page rendered from the old data before then would keep
+    a stamp made in between.
+    """
+    keys = list(keys)
+    if not keys:
+        return
+    cache.delete_many(keys)
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def etag(values):
+    """Weak ETag of the values a page depends on."""
+    digest = hashlib.md5(repr(values).encode()).hexdigest()
+    return f'W/"{digest}"'
+
+
+def conditional(request, keys, view, *args, **kwargs):
+    """
+    Calls view, or answers 304 Not Modified without calling it while the
+    stamps of keys, of the inbox of the user and of the school have not
+    changed since the ETag or date the browser sent. The inbox is always
+    among them for the unread count pages and the API show.
+    """
+    keys = list(keys) + [INBOX.format(request.user.id), SCHOOL]
+    values = read(keys)
+    tag = etag([request.user.id, request.role, request.session.get('user'),
+                values])
+    last_modified = datetime.datetime.fromtimestamp(
+        max(values), datetime.timezone.utc
+    )
+    response = condition(
+        etag_func=lambda *args, **kwargs: tag,
+        last_modified_func=lambda *args, **kwargs: last_modified
+    )(view)(request, *args, **kwargs)
+    # Responses are per user and checked again on every visit
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
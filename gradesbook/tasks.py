@@ -0,0 +1,65 @@
+from .archive import (archive_chunk, delete_pupils, delete_subjects,
+                      restore_chunk)
+from .jobs import enqueue, task
+from .mailing import deliver, recipient_users
+from .models import Message, SchoolClass
+
+
+@task('send_message')
+def send_message(sender_id, subject, text, user_ids):
+    message = Message(subject=subject, text=text, sender_id=sender_id)
+    message.save()
+    deliver(message, user_ids)
+
+
+@task('notify_grades')
+def notify_grades(sender_id, subject_name, groups):
+    # Pupils who got the same grade share one message
+    for grade, user_ids in sorted(groups.items()):
+        send_message(
+            sender_id,
+            'Нова оцінка',
+            f'Ти отримав нову оцінку з предмету {subject_name}. '
+            f'Твоя оцінка: {grade}.',
+            user_ids
+        )
+
+
+@task('fan_out_message')
+def fan_out_message(message_id, prefix, target_id=None):
+    deliver(
+        Message.objects.get(id=message_id),
+        recipient_users(prefix, target_id)
+    )
+
+
+@task('delete_users')
+def delete_users(user_ids):
+    delete_pupils(user_ids)
+
+
+@task('delete_subject')
+def delete_subject(subject_id):
+    # Subjects are deleted in the request now, for jobs queued before
+    delete_subjects([subject_id])
+
+
+@task('archive_class')
+def archive_class(school_class_id):
+    # One chunk of subjects per job, the rest is queued again. A restore
+    # asked for in between clears archived and stops the chain
+    school_class = SchoolClass.objects.filter(pk=school_class_id).first()
+    if school_class is None or school_class.active or \
+            not school_class.archived:
+        return
+    if archive_chunk(school_class):
+        enqueue('archive_class', school_class_id=school_class_id)
+
+
+@task('restore_class')
+def restore_class(school_class_id):
+    school_class = SchoolClass.objects.filter(pk=school_class_id).first()
+    if school_class is None or school_class.archived:
+        return
+    if restore_chunk(school_class):
+        enqueue('restore_class', school_class_id=school_class_id)
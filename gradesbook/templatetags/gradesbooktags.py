@@ -1,4 +1,7 @@
 from django import template
+from django.utils.html import format_html, format_html_join
+from gradesbook.assets import asset_urls
+from gradesbook.icons import ICONS
 
 register = template.Library()
 
@@ -22,3 +25,21 @@ def key_value(my_dict, key):
 @register.simple_tag
 def update_variable(value):
     return value
+
+
+@register.simple_tag
+def asset(name):
+    """The <link> or <script> tags of a bundle of assets."""
+    tag = '<link rel="stylesheet" href="{}">' if name.endswith('.css') \
+        else '<script src="{}"></script>'
+    return format_html_join('\n', tag, ((url,) for url in asset_urls(name)))
+
+
+@register.simple_tag
+def icon(name, size=24, style=''):
+    """A Material Icon drawn inline, size pixels high."""
+    return format_html(
+        '<svg class="icon" width="{}" height="{}" viewBox="0 0 24 24" '
+        'style="{}" aria-hidden="true"><path d="{}"/></svg>',
+        size, size, style, ICONS[name]
+    )
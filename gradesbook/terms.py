@@ -0,0 +1,268 @@
+import datetime
+from collections import namedtuple
+from django.db import connections, transaction
+from django.db.models import Func, IntegerField
+from django.utils import timezone
+from .bulk import bulk_insert
+from .models import Grades, Student, Subject, TermResult
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Grades put in by the administration weigh as much as this many grades
+# of a teacher
+MANAGER_WEIGHT = 2
+# A pupil is at risk below this weighted average...
+AT_RISK_AVERAGE = 3.0
+# ...or with fewer grades than this, none at all included...
+MIN_GRADES = 3
+# ...or when the grades fall faster than this per week and the final
+# grade is no better than AT_RISK_FINAL
+AT_RISK_SLOPE = 0.25
+AT_RISK_FINAL = 3
+
+TermGrades = namedtuple('TermGrades', [
+    'student_ids', 'subject_ids', 'subject_classes',
+    'student', 'subject', 'grade', 'day', 'weight',
+    'enrolled_student', 'enrolled_subject'
+])
+Results = namedtuple('Results', [
+    'student_ids', 'subject_ids', 'count', 'average', 'median',
+    'final_grade', 'slope', 'rank', 'percentile', 'class_rank', 'at_risk'
+])
+
+
+class DayNumber(Func):
+    """Days between 1970-01-01 and a date."""
+    template = 'CAST(julianday(%(expressions)s) - 2440587.5 AS INTEGER)'
+    output_field = IntegerField()
+
+    def as_postgresql(self, compiler, connection, **extra_context):
+        return self.as_sql(compiler, connection,
+                           template="(%(expressions)s - DATE '1970-01-01')",
+                           **extra_context)
+
+
+def current_term(date=None):
+    """
+    (start, end) of the term of a date: September to December or January
+    to May, the summer belongs to the term before it.
+    """
+    date = date or timezone.localdate()
+    if date.month >= 9:
+        return datetime.date(date.year, 9, 1), datetime.date(date.year, 12, 31)
+    return datetime.date(date.year, 1, 1), datetime.date(date.year, 5, 31)
+
+
+def fetch_array(queryset, columns):
+    """
+    Rows of integer columns of a queryset as a two dimensional array,
+    fetched with the cursor to skip building a Python row per grade.
+    Annotated columns have to come last, Django selects them after the
+    fields.
+    """
+    sql, params = queryset.values_list(*columns).query.get_compiler(
+        queryset.db
+    ).as_sql()
+    with connections[queryset.db].cursor() as cursor:
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+    return np.array(rows, dtype=np.int64).reshape(-1, len(columns))
+
+
+def load_term(start, end):
+    """
+    Grades of the active classes between start and end as TermGrades,
+    with the pupils on the roster of every class enrolled in every
+    subject of it.
+    """
+    rows = fetch_array(
+        Grades.objects.filter(
+            date__range=(start, end), subject__school_class__active=True
+        ).annotate(day=DayNumber('date')),
+        ('student_id', 'subject_id', 'grade', 'manager_mode', 'day')
+    )
+    roster = fetch_array(
+        Student.objects.listed().filter(school_class__active=True),
+        ('user_id', 'school_class_id')
+    )
+    subjects = fetch_array(
+        Subject.objects.filter(school_class__active=True).order_by('id'),
+        ('id', 'school_class_id')
+    )
+    student_ids = np.unique(np.concatenate((rows[:, 0], roster[:, 0])))
+    subject_ids, subject_classes = subjects[:, 0], subjects[:, 1]
+
+    # Rows of the subjects of the class of every pupil on the roster
+    by_class = np.argsort(subject_classes, kind='stable')
+    sorted_classes = subject_classes[by_class]
+    first = np.searchsorted(sorted_classes, roster[:, 1], 'left')
+    taken = np.searchsorted(sorted_classes, roster[:, 1], 'right') - first
+    offsets = np.arange(taken.sum()) - np.repeat(np.cumsum(taken) - taken,
+                                                 taken)
+    return TermGrades(
+        student_ids=student_ids,
+        subject_ids=subject_ids,
+        subject_classes=subject_classes,
+        student=np.searchsorted(student_ids, rows[:, 0]),
+        subject=np.searchsorted(subject_ids, rows[:, 1]),
+        grade=rows[:, 2].astype(np.float64),
+        day=rows[:, 4],
+        weight=np.where(rows[:, 3] != 0, MANAGER_WEIGHT, 1).astype(np.float64),
+        enrolled_student=np.repeat(
+            np.searchsorted(student_ids, roster[:, 0]), taken
+        ),
+        enrolled_subject=by_class[np.repeat(first, taken) + offsets]
+    )
+
+
+def group_starts(counts):
+    return np.concatenate(([0], np.cumsum(counts)[:-1])).astype(np.int64)
+
+
+def rank_within(groups, values):
+    """
+    Competition ranks (1, 2, 2, 4) of values in descending order inside
+    each group, with the size of the group of every value.
+    """
+    order = np.lexsort((-values, groups))
+    groups, values = groups[order], values[order]
+    index = np.arange(len(order))
+    new_group = np.ones(len(order), dtype=bool)
+    new_group[1:] = groups[1:] != groups[:-1]
+    new_value = new_group.copy()
+    new_value[1:] |= values[1:] != values[:-1]
+    first = np.maximum.accumulate(np.where(new_value, index, 0))
+    group_first = np.maximum.accumulate(np.where(new_group, index, 0))
+    ranks = np.empty(len(order), dtype=np.int64)
+    ranks[order] = first - group_first + 1
+    sizes = np.empty(len(order), dtype=np.int64)
+    sizes[order] = np.bincount(np.cumsum(new_group) - 1)[
+        np.cumsum(new_group) - 1
+    ]
+    return ranks, sizes
+
+
+def compute(grades):
+    """
+    Results of every pupil in every subject with grades in TermGrades,
+    and of the enrolled pairs without grades, which are at risk and have
+    no grade values or ranks. Averages are weighted, ranks and
+    percentiles are among the pupils of the class graded in the subject.
+    """
+    subjects = len(grades.subject_ids)
+    graded, pair, count = np.unique(
+        grades.student * subjects + grades.subject,
+        return_inverse=True, return_counts=True
+    )
+    pair = pair.reshape(-1)
+    student, subject = graded // subjects, graded % subjects
+    grade, weight = grades.grade, grades.weight
+
+    def total(values):
+        return np.bincount(pair, weights=values, minlength=len(graded))
+
+    average = np.round(total(weight * grade) / total(weight), 2)
+
+    ordered = grade[np.lexsort((grade, pair))]
+    starts = group_starts(count)
+    median = (ordered[starts + (count - 1) // 2] +
+              ordered[starts + count // 2]) / 2
+
+    # Least squares line of the grades against the weeks of the term
+    weeks = (grades.day - grades.day.min()) / 7 if len(grade) else grade
+    sum_x, sum_y = total(weeks), total(grade)
+    spread = count * total(weeks * weeks) - sum_x * sum_x
+    slope = np.where(
+        spread > 1e-9,
+        (count * total(weeks * grade) - sum_x * sum_y) /
+        np.where(spread > 1e-9, spread, 1),
+        0.0
+    )
+
+    final_grade = np.clip(np.floor(average + 0.5), 1, 5)
+    rank, size = rank_within(subject, average)
+    percentile = np.where(size > 1, 100 * (size - rank) /
+                          np.maximum(size - 1, 1), 100.0)
+    at_risk = (average < AT_RISK_AVERAGE) | (count < MIN_GRADES) | (
+        (slope <= -AT_RISK_SLOPE) & (final_grade <= AT_RISK_FINAL)
+    )
+
+    # The graded pairs among all of them, the others have no grades
+    pairs = np.union1d(
+        graded, grades.enrolled_student * subjects + grades.enrolled_subject
+    )
+    at = np.searchsorted(pairs, graded)
+
+    def spread_out(values, empty=np.nan):
+        result = np.full(len(pairs), empty, dtype=np.float64)
+        result[at] = values
+        return result
+
+    # Pupils of a class by the mean of their subject averages
+    students = len(grades.student_ids)
+    classes = np.zeros(students, dtype=np.int64)
+    classes[pairs // subjects] = grades.subject_classes[pairs % subjects]
+    averaged = np.bincount(student, minlength=students)
+    ranked = np.flatnonzero(averaged)
+    means = np.bincount(student, weights=average,
+                        minlength=students)[ranked] / averaged[ranked]
+    class_ranks = np.full(students, np.nan)
+    class_ranks[ranked], _ = rank_within(classes[ranked], np.round(means, 2))
+
+    counts = np.zeros(len(pairs), dtype=np.int64)
+    counts[at] = count
+    risks = np.ones(len(pairs), dtype=bool)
+    risks[at] = at_risk
+    return Results(
+        student_ids=grades.student_ids[pairs // subjects],
+        subject_ids=grades.subject_ids[pairs % subjects],
+        count=counts,
+        average=spread_out(average),
+        median=spread_out(median),
+        final_grade=spread_out(final_grade),
+        slope=spread_out(np.round(slope, 3), 0.0),
+        rank=spread_out(rank),
+        percentile=spread_out(np.round(percentile, 1)),
+        class_rank=class_ranks[pairs // subjects],
+        at_risk=risks
+    )
+
+
+def nullable(column, integer=False):
+    """Values of a result column, None for NaN."""
+    return [None if value != value else int(value) if integer else value
+            for value in column.tolist()]
+
+
+def save_results(results, start, end):
+    """Replaces the results of the term starting at start."""
+    now = timezone.now()
+    columns = (results.student_ids.tolist(), results.subject_ids.tolist(),
+               results.count.tolist(), nullable(results.average),
+               nullable(results.median),
+               nullable(results.final_grade, integer=True),
+               results.slope.tolist(), nullable(results.rank, integer=True),
+               nullable(results.percentile),
+               nullable(results.class_rank, integer=True),
+               results.at_risk.tolist())
+    with transaction.atomic():
+        TermResult.objects.filter(term_start=start).delete()
+        return bulk_insert(
+            TermResult,
+            ('student_id', 'subject_id', 'count', 'average', 'median',
+             'final_grade', 'slope', 'rank', 'percentile', 'class_rank',
+             'at_risk', 'term_start', 'term_end', 'computed'),
+            (row + (start, end, now) for row in zip(*columns))
+        )
+
+
+def compute_term(start, end):
+    """
+    Computes and saves the results of a term, returns the number of
+    results written. Needs numpy.
+    """
+    return save_results(compute(load_term(start, end)), start, end)
+
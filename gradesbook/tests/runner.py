@@ -0,0 +1,20 @@
+from django.test import override_settings
+from django.test.runner import DiscoverRunner
+
+# Tests never touch the cache directory of the project
+CACHES = {'default': {
+    'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'
+}}
+
+
+class TestRunner(DiscoverRunner):
+    """Runs every test with the cache in memory."""
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.cache_settings = override_settings(CACHES=CACHES)
+        self.cache_settings.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.cache_settings.disable()
+        super().teardown_test_environment(**kwargs)
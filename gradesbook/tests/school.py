@@ -0,0 +1,140 @@
+import datetime
+import random
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from gradesbook.benchmark import seed_class, seed_user
+from gradesbook.mailing import deliver, recipient_users
+from gradesbook.models import (CanceledGrades, Grades, Message, Parent,
+                               Student, Subject, SubjectDate, SubjectTeachers,
+                               Teacher)
+from gradesbook.permissions import grant
+from gradesbook.rollups import rebuild_rollups
+
+PUPILS = 25
+SUBJECTS = ('Математика', 'Українська мова', 'Історія', 'Біологія',
+            'Фізика', 'Англійська мова')
+GRADE_DAYS = 12
+CLASSES = (('5а2021', True), ('6б2021', True), ('9в2018', False))
+TEACHERS = 4
+
+
+@override_settings(JOBS_EAGER=True)
+class SchoolTestCase(TestCase):
+    """
+    Seeds a school of three classes with 25 pupils and a parent each,
+    six subjects per class with teachers, a timetable, twelve days of
+    grades and some mail. self.users holds one user of every role.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        random.seed(2021)
+        cls.manager = seed_user('manager', 'manager')
+        cls.teachers = []
+        for number in range(TEACHERS):
+            user = seed_user(f'teacher-{number}', 'teacher')
+            cls.teachers.append(Teacher.objects.create(
+                user=user, name='Вчитель', surname=f'{number:02}',
+                email=f'teacher{number}@school.ua', first_login=False
+            ))
+
+        cls.classes = []
+        for code, active in CLASSES:
+            school_class = seed_class(PUPILS, code)
+            if not active:
+                school_class.active = False
+                school_class.save()
+            cls.classes.append(school_class)
+            cls.seed_subjects(school_class)
+        Student.objects.update(first_login=False)
+        Parent.objects.update(first_login=False)
+        grant('student', Student.objects.values_list('pk', flat=True))
+        grant('parent', Parent.objects.values_list('pk', flat=True))
+        rebuild_rollups()
+
+        cls.school_class = cls.classes[0]
+        cls.subject = Subject.objects.filter(
+            school_class=cls.school_class
+        ).order_by('id').first()
+        cls.teacher = cls.teachers[0]
+        cls.student = Student.objects.filter(
+            school_class=cls.school_class
+        ).order_by('surname').first()
+        cls.parent = Parent.objects.get(student=cls.student)
+        cls.seed_mail()
+        cls.users = {
+            'manager': cls.manager,
+            'teacher': cls.teacher.user,
+            'student': cls.student.user,
+            'parent': cls.parent.user,
+        }
+
+    @classmethod
+    def seed_subjects(cls, school_class):
+        code = school_class.unique_code
+        Subject.objects.bulk_create([
+            Subject(name=name, unique_code=f'{name[:2]}{code}',
+                    school_class=school_class)
+            for name in SUBJECTS
+        ])
+        subjects = list(Subject.objects.filter(
+            school_class=school_class
+        ).order_by('id'))
+        slots = []
+        for index, subject in enumerate(subjects):
+            subject_teachers = SubjectTeachers.objects.create(subject=subject)
+            subject_teachers.teacher.add(cls.teachers[index % TEACHERS])
+            for lesson in range(3):
+                slots.append(SubjectDate(
+                    subject=subject,
+                    day=SubjectDate.DAYS[(index + lesson * 2) % 6][0],
+                    lesson_number=(index + lesson) % 8 + 1
+                ))
+        SubjectDate.objects.bulk_create(slots)
+
+        student_ids = list(Student.objects.filter(
+            school_class=school_class
+        ).values_list('pk', flat=True))
+        today = timezone.localdate()
+        for day in range(GRADE_DAYS, 0, -1):
+            Grades.objects.bulk_create([
+                Grades(subject=subject, student_id=student_id,
+                       grade=random.randint(1, 5),
+                       manager_mode=day % 6 == 0)
+                for subject in subjects for student_id in student_ids
+            ], batch_size=500)
+            CanceledGrades.objects.bulk_create([
+                CanceledGrades(subject=subject, student_id=student_id,
+                               grade=random.randint(1, 5))
+                for subject in subjects for student_id in student_ids[:2]
+            ])
+            # date is filled with today by auto_now_add
+            for model in (Grades, CanceledGrades):
+                model.objects.filter(
+                    subject__school_class=school_class, date=today
+                ).update(date=today - datetime.timedelta(days=day))
+
+    @classmethod
+    def send(cls, sender_user, prefix, target, subject, recipient):
+        message = Message.objects.create(subject=subject, text=subject,
+                                         sender=sender_user,
+                                         recipient=recipient)
+        deliver(message, recipient_users(prefix, target))
+
+    @classmethod
+    def seed_mail(cls):
+        for number in range(20):
+            cls.send(cls.manager, 1, cls.school_class, f'Оголошення {number}',
+                     cls.school_class.name)
+            cls.send(cls.manager, 2, cls.school_class, f'Збори {number}',
+                     f'Батьки {cls.school_class.name}')
+        for number in range(5):
+            cls.send(cls.teacher.user, 4, cls.student, f'Оцінка {number}',
+                     str(cls.student))
+            cls.send(cls.student.user, 7, cls.teacher, f'Питання {number}',
+                     str(cls.teacher))
+
+    def setUp(self):
+        # Cached timetables would outlive the rolled back data of a test
+        cache.clear()
@@ -0,0 +1,169 @@
+import json
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from gradesbook.models import ApiToken, Grades, InboxEntry, Subject
+from gradesbook.pagination import encode_token
+from gradesbook.tests.school import SchoolTestCase
+
+
+@override_settings(
+    PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher']
+)
+class ApiTests(SchoolTestCase):
+
+    def setUp(self):
+        super().setUp()
+        user = self.student.user
+        user.set_password('secret')
+        user.save()
+        response = self.client.post(reverse('gradesbook:api_token'), {
+            'username': user.username, 'password': 'secret'
+        })
+        self.assertEqual(response.status_code, 201)
+        self.token = response.json()['token']
+
+    def get(self, name, args=(), token=None, **params):
+        return self.client.get(
+            reverse(f'gradesbook:{name}', args=args), params,
+            HTTP_AUTHORIZATION=f'Bearer {token or self.token}'
+        )
+
+    def test_tokens(self):
+        digest = ApiToken.objects.get(user=self.student.user).digest
+        self.assertNotIn(self.token, digest)
+        response = self.client.post(reverse('gradesbook:api_token'), {
+            'username': self.student.user.username, 'password': 'wrong'
+        })
+        self.assertEqual(response.status_code, 401)
+
+        response = self.get('api_subjects')
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertEqual(
+            [subject['code'] for subject in response.json()['data']],
+            list(Subject.objects.filter(
+                school_class=self.school_class
+            ).order_by('name').values_list('unique_code', flat=True))
+        )
+        self.assertEqual(self.get('api_subjects', token='wrong').status_code,
+                         401)
+        self.assertEqual(
+            self.client.get(reverse('gradesbook:api_subjects')).status_code,
+            401
+        )
+        # Signed in browsers use their session
+        self.client.force_login(self.parent.user)
+        self.assertEqual(
+            self.client.get(reverse('gradesbook:api_subjects')).status_code,
+            200
+        )
+
+        response = self.client.delete(
+            reverse('gradesbook:api_token'),
+            HTTP_AUTHORIZATION=f'Bearer {self.token}'
+        )
+        self.assertEqual(response.status_code, 204)
+        response = self.get('api_subjects')
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response['WWW-Authenticate'], 'Bearer')
+
+    def test_roles(self):
+        self.assertEqual(self.get('api_timetable', ['teacher']).status_code,
+                         404)
+        self.assertEqual(self.get('api_timetable', ['student']).status_code,
+                         200)
+        self.client.force_login(self.teacher.user)
+        for name in ('api_subjects', 'api_grades'):
+            with self.subTest(name=name):
+                self.assertEqual(
+                    self.client.get(reverse(f'gradesbook:{name}'))
+                    .status_code, 403
+                )
+
+    def test_cursor_pagination(self):
+        ids, cursor = [], None
+        while True:
+            params = {'limit': 7, 'fields': 'id'}
+            if cursor:
+                params['cursor'] = cursor
+            page = self.get('api_received', **params).json()
+            self.assertLessEqual(len(page['data']), 7)
+            ids += [entry['id'] for entry in page['data']]
+            cursor = page['next']
+            if cursor is None:
+                break
+        self.assertEqual(ids, list(InboxEntry.objects.filter(
+            user=self.student.user
+        ).order_by('-id').values_list('id', flat=True)))
+        for params in ({'cursor': 'abc'}, {'limit': 0}, {'limit': 'x'},
+                       {'fields': 'id,text'},
+                       {'cursor': encode_token('next', ['x'])}):
+            with self.subTest(params=params):
+                self.assertEqual(
+                    self.get('api_received', **params).status_code, 400
+                )
+        response = self.get('api_grades',
+                            cursor=encode_token('next', ['x', 'y']))
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'error': 'Невірний курсор.'})
+
+    def test_fields_and_compact(self):
+        grade = Grades.objects.filter(student=self.student).order_by(
+            '-date', '-id'
+        ).select_related('subject').first()
+        page = self.get('api_grades', limit=1).json()
+        self.assertEqual(page['data'], [{
+            'id': grade.id, 'date': grade.date.isoformat(),
+            'grade': grade.grade, 'subject': grade.subject.unique_code,
+        }])
+        page = self.get('api_grades', limit=1, fields='grade,id',
+                        compact=1).json()
+        self.assertEqual(page['fields'], ['id', 'grade'])
+        self.assertEqual(page['rows'], [[grade.id, grade.grade]])
+        response = self.get('api_received', limit=1)
+        # Letters are sent as they are, without spaces between tokens
+        self.assertNotIn(b'\\u', response.content)
+        self.assertNotIn(b'": ', response.content)
+        self.assertEqual(
+            self.get('api_grades', subject=self.subject.unique_code,
+                     fields='subject').json()['data'][0],
+            {'subject': self.subject.unique_code}
+        )
+
+    def test_fixed_queries(self):
+        endpoints = (('api_subjects', [], 4), ('api_grades', [], 2),
+                     ('api_timetable', ['student'], 1),
+                     ('api_received', [], 3), ('api_sent', [], 2))
+        for name, args, expected in endpoints:
+            # The first request resolves the role and builds timetables
+            self.get(name, args)
+            for limit in (1, 100):
+                with self.subTest(name=name, limit=limit):
+                    with CaptureQueriesContext(connection) as queries:
+                        response = self.get(name, args, limit=limit)
+                    self.assertEqual(response.status_code, 200)
+                    # The token with its user, then the data
+                    self.assertEqual(len(queries), expected)
+
+    def test_not_modified(self):
+        response = self.get('api_received')
+        with CaptureQueriesContext(connection) as queries:
+            repeated = self.client.get(
+                reverse('gradesbook:api_received'),
+                HTTP_AUTHORIZATION=f'Bearer {self.token}',
+                HTTP_IF_NONE_MATCH=response['ETag']
+            )
+        self.assertEqual(repeated.status_code, 304)
+        self.assertEqual(len(queries), 1)
+        self.send(self.teacher.user, 4, self.student, 'Контрольна',
+                  str(self.student))
+        response = self.client.get(
+            reverse('gradesbook:api_received'),
+            HTTP_AUTHORIZATION=f'Bearer {self.token}',
+            HTTP_IF_NONE_MATCH=response['ETag']
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            json.loads(response.content)['data'][0]['subject'], 'Контрольна'
+        )
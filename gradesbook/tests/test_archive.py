@@ -0,0 +1,142 @@
+from io import StringIO
+from django.core.management import call_command
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from gradesbook.archive import ArchiveError, archive_chunk, archive_subjects
+from gradesbook.jobs import claim, run
+from gradesbook.models import (ArchivedGrade, ArchivedSubject, CanceledGrades,
+                               GradeRollup, Grades, SchoolClass, Subject,
+                               SubjectDate, SubjectTeachers)
+from gradesbook.rollups import rebuild_rollups
+from gradesbook.tests.school import SchoolTestCase
+
+
+class ArchiveTests(SchoolTestCase):
+
+    def setUp(self):
+        self.inactive = self.classes[-1]
+        self.client.force_login(self.manager)
+
+    def snapshot(self):
+        school_class = {'subject__school_class': self.inactive}
+        return {
+            'subjects': sorted(Subject.objects.filter(
+                school_class=self.inactive
+            ).values_list('id', 'name', 'unique_code')),
+            'grades': sorted(Grades.objects.filter(
+                **school_class
+            ).values_list('id', 'student_id', 'subject_id', 'grade', 'date',
+                          'manager_mode')),
+            'canceled': sorted(CanceledGrades.objects.filter(
+                **school_class
+            ).values_list('id', 'student_id', 'subject_id', 'grade',
+                          'date')),
+            'dates': sorted(SubjectDate.objects.filter(
+                **school_class
+            ).values_list('id', 'subject_id', 'day', 'lesson_number')),
+            'teachers': sorted(SubjectTeachers.teacher.through.objects.filter(
+                subjectteachers__subject__school_class=self.inactive
+            ).values_list('subjectteachers__subject_id', 'teacher_id')),
+            'rollups': sorted(GradeRollup.objects.filter(
+                school_class=self.inactive
+            ).values_list('subject_id', 'week', 'grade_sum', 'canceled')),
+        }
+
+    def post(self, name):
+        return self.client.post(reverse(
+            f'gradesbook:{name}',
+            kwargs={'class_unique_code': self.inactive.unique_code}
+        ))
+
+    def test_archive_and_restore(self):
+        before = self.snapshot()
+        self.assertTrue(before['grades'])
+        self.post('archive_school_class')
+        self.assertTrue(SchoolClass.objects.get(pk=self.inactive.pk).archived)
+        self.assertFalse(any(self.snapshot().values()))
+        self.assertEqual(ArchivedGrade.objects.count(), len(before['grades']))
+
+        subject = ArchivedSubject.objects.filter(
+            school_class=self.inactive
+        ).first()
+        response = self.client.get(reverse(
+            'gradesbook:archived_subject',
+            args=[self.inactive.unique_code, subject.unique_code]
+        ))
+        self.assertContains(response, 'АРХІВ')
+        self.assertEqual(len(response.context['rows']), 25)
+
+        self.post('restore_school_class')
+        self.assertFalse(SchoolClass.objects.get(pk=self.inactive.pk).archived)
+        self.assertEqual(self.snapshot(), before)
+        self.assertFalse(ArchivedSubject.objects.exists())
+        self.assertFalse(ArchivedGrade.objects.exists())
+
+    def test_archiving_skips_signals_of_rows(self):
+        # Grades and timetable dates cost no queries of their own
+        first, second = Subject.objects.filter(
+            school_class=self.inactive
+        ).order_by('id')[:2]
+        student = self.inactive.student_set.first()
+        Grades.objects.bulk_create([
+            Grades(grade=5, student=student, subject=second)
+            for _ in range(100)
+        ])
+        SubjectDate.objects.bulk_create([
+            SubjectDate(subject=second, day='St', lesson_number=lesson)
+            for lesson in range(1, 9)
+        ])
+        counts = []
+        for subject in (first, second):
+            with CaptureQueriesContext(connection) as queries:
+                archive_subjects([subject.id])
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1])
+
+    @override_settings(JOBS_EAGER=False)
+    def test_restore_stops_a_running_archive(self):
+        before = self.snapshot()
+        self.post('archive_school_class')
+        # The first chunk is moved and the rest of the archive queued
+        for job in claim('test', batch_size=1):
+            self.assertTrue(run(job))
+        self.assertTrue(ArchivedSubject.objects.exists())
+        self.post('restore_school_class')
+        self.assertFalse(SchoolClass.objects.get(pk=self.inactive.pk).archived)
+        jobs = claim('test')
+        while jobs:
+            for job in jobs:
+                self.assertTrue(run(job))
+            jobs = claim('test')
+        self.assertEqual(self.snapshot(), before)
+        self.assertFalse(ArchivedSubject.objects.exists())
+
+    def test_active_and_archived_classes_are_refused(self):
+        self.assertRaises(ArchiveError, archive_chunk, self.school_class)
+        response = self.client.post(reverse(
+            'gradesbook:archive_school_class',
+            args=[self.school_class.unique_code]
+        ))
+        self.assertEqual(response.status_code, 404)
+        self.post('archive_school_class')
+        self.assertEqual(self.post('activation_school_class').status_code,
+                         404)
+
+    def test_command_archives_in_chunks(self):
+        call_command('archive_classes', '--chunk-size=2', stdout=StringIO())
+        self.assertFalse(Subject.objects.filter(
+            school_class__active=False
+        ).exists())
+        live = Grades.objects.count()
+        call_command('archive_classes', '--restore', stdout=StringIO())
+        self.assertFalse(ArchivedGrade.objects.exists())
+        self.assertGreater(Grades.objects.count(), live)
+        incremental = sorted(GradeRollup.objects.values_list(
+            'subject_id', 'week', 'grade_sum', 'canceled'
+        ))
+        rebuild_rollups()
+        self.assertEqual(incremental, sorted(GradeRollup.objects.values_list(
+            'subject_id', 'week', 'grade_sum', 'canceled'
+        )))
@@ -0,0 +1,105 @@
+import glob
+import gzip
+import os
+import re
+import shutil
+import tempfile
+from django.contrib.staticfiles import finders
+from django.test import SimpleTestCase, override_settings
+from django.template import Context, Template
+from gradesbook.assets import (BUNDLES, HASHED_MAX_AGE, build, bundle,
+                               minify_css)
+from gradesbook.icons import ICONS
+
+
+class AssetTests(SimpleTestCase):
+
+    def setUp(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+        settings = override_settings(STATIC_ROOT=root)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.root = root
+
+    def render(self, source):
+        return Template('{% load gradesbooktags %}' + source).render(Context())
+
+    def test_bundles(self):
+        self.assertEqual(minify_css('a > b {\n\n  content: "a  b";\n}\n'),
+                         'a > b {\ncontent: "a  b";\n}')
+        script = bundle('gradesbook/bundle.js')
+        # The release files of the libraries, without their source maps
+        for source in BUNDLES['gradesbook/bundle.js']:
+            with open(finders.find(source), encoding='utf-8') as file:
+                content = file.read()
+            self.assertIn(content.splitlines()[1], script)
+        self.assertTrue(script.startswith('/*! jQuery v3.4.1 '))
+        self.assertNotIn('sourceMappingURL', script)
+        self.assertNotIn('sourceMappingURL', bundle('gradesbook/bundle.css'))
+
+    def test_build(self):
+        # Without a build, pages load the files bundles are made of
+        self.assertEqual(
+            self.render("{% asset 'gradesbook/bundle.js' %}").count('<script'),
+            len(BUNDLES['gradesbook/bundle.js'])
+        )
+        manifest = build()
+        self.assertEqual(set(manifest), set(BUNDLES))
+        for name, built in manifest.items():
+            self.assertRegex(built, r'\.[0-9a-f]{12}\.(css|js)$')
+            with open(os.path.join(self.root, built), 'rb') as file:
+                content = file.read()
+            with gzip.open(os.path.join(self.root, built + '.gz')) as file:
+                self.assertEqual(file.read(), content)
+        # The same sources give the same names
+        self.assertEqual(build(), manifest)
+        self.assertEqual(
+            self.render("{% asset 'gradesbook/bundle.css' %}"),
+            f'<link rel="stylesheet" href="/static/'
+            f'{manifest["gradesbook/bundle.css"]}">'
+        )
+
+    def test_static_files_are_served_precompressed_and_cached(self):
+        built = build()['gradesbook/bundle.js']
+        response = self.client.get(f'/static/{built}',
+                                   HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(response['Cache-Control'],
+                         f'public, max-age={HASHED_MAX_AGE}, immutable')
+        self.assertTrue(response['Content-Type'].endswith('javascript'))
+        self.assertEqual(
+            gzip.decompress(b''.join(response.streaming_content)),
+            open(os.path.join(self.root, built), 'rb').read()
+        )
+        response = self.client.get(
+            f'/static/{built}',
+            HTTP_IF_MODIFIED_SINCE=response['Last-Modified']
+        )
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['Cache-Control'],
+                         f'public, max-age={HASHED_MAX_AGE}, immutable')
+        self.assertIn('Accept-Encoding', response['Vary'])
+
+        response = self.client.get('/static/gradesbook/assets.json')
+        self.assertNotIn('Content-Encoding', response)
+        self.assertNotIn('immutable', response['Cache-Control'])
+        for path in ('gradesbook/missing.js', '../gradebook/settings.py'):
+            with self.subTest(path=path):
+                self.assertEqual(self.client.get(f'/static/{path}')
+                                 .status_code, 404)
+
+    def test_icons(self):
+        svg = self.render("{% icon 'mail' 25 'color: grey;' %}")
+        self.assertIn('width="25"', svg)
+        self.assertIn('style="color: grey;"', svg)
+        self.assertIn(ICONS['mail'], svg)
+        used = set()
+        for path in glob.glob(os.path.join(os.path.dirname(__file__), '..',
+                                           'templates', '**', '*.html'),
+                              recursive=True):
+            with open(path, encoding='utf-8') as file:
+                used.update(re.findall(r"{% icon '(\w+)'", file.read()))
+        self.assertTrue(used)
+        self.assertLessEqual(used, set(ICONS))
@@ -0,0 +1,68 @@
+import csv
+import datetime
+import io
+from django.urls import reverse
+from django.utils import timezone
+from gradesbook.export import COLUMNS, csv_chunks
+from gradesbook.models import Grades
+from gradesbook.tests.school import SchoolTestCase
+
+
+class GradesExportTests(SchoolTestCase):
+
+    def export(self, name, query='', **kwargs):
+        self.client.force_login(self.manager)
+        response = self.client.get(
+            reverse(f'gradesbook:{name}', kwargs=kwargs) + query
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        text = b''.join(response.streaming_content).decode()
+        self.assertTrue(text.startswith('\ufeff'))
+        return list(csv.DictReader(io.StringIO(text[1:])))
+
+    def test_class_export_has_every_grade(self):
+        rows = self.export('export_class',
+                           class_unique_code=self.school_class.unique_code)
+        grades = Grades.objects.filter(
+            subject__school_class=self.school_class
+        ).select_related('student__user', 'subject')
+        self.assertEqual(len(rows), grades.count())
+        self.assertEqual(set(rows[0]), set(COLUMNS))
+        self.assertEqual(
+            sorted((row['username'], row['subject'], row['date'],
+                    int(row['grade'])) for row in rows),
+            sorted((grade.student.user.username, grade.subject.name,
+                    grade.date.isoformat(), grade.grade) for grade in grades)
+        )
+        self.assertEqual({row['class'] for row in rows},
+                         {self.school_class.name})
+
+    def test_student_export_between_dates(self):
+        end = timezone.localdate() - datetime.timedelta(days=2)
+        start = end - datetime.timedelta(days=3)
+        rows = self.export('export_student',
+                           f'?start={start}&end={end}',
+                           user_id=self.student.pk)
+        self.assertEqual(len(rows), Grades.objects.filter(
+            student=self.student, date__range=(start, end)
+        ).count())
+        self.assertTrue(rows)
+        self.assertTrue(all(start.isoformat() <= row['date'] <=
+                            end.isoformat() for row in rows))
+
+    def test_chunks_follow_each_other(self):
+        grades = Grades.objects.filter(subject=self.subject)
+        text = ''.join(csv_chunks(grades, chunk_size=7))
+        rows = list(csv.reader(io.StringIO(text[1:])))
+        self.assertEqual(len(rows) - 1, grades.count())
+
+    def test_bad_date_and_other_roles(self):
+        self.client.force_login(self.manager)
+        response = self.client.get(
+            reverse('gradesbook:export_school') + '?start=вчора'
+        )
+        self.assertEqual(response.status_code, 400)
+        self.client.force_login(self.teacher.user)
+        response = self.client.get(reverse('gradesbook:export_school'))
+        self.assertEqual(response.status_code, 403)
@@ -0,0 +1,82 @@
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from gradesbook.models import Grades, Job, Message, Student
+from gradesbook.tests.school import PUPILS, SchoolTestCase
+
+# Statements of one bulk entry of a whole class, whatever its size
+BULK_ENTRY_QUERIES = 10
+
+
+class BulkGradesTests(SchoolTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.teacher.user)
+        self.url = reverse('gradesbook:teacher_bulk_grades',
+                           args=[self.subject.unique_code])
+        self.students = list(Student.objects.filter(
+            school_class=self.school_class
+        ).order_by('surname', 'name'))
+        self.grades_before = Grades.objects.filter(
+            subject=self.subject
+        ).count()
+
+    def formset_data(self, grades):
+        data = {'form-TOTAL_FORMS': len(grades),
+                'form-INITIAL_FORMS': len(grades),
+                'mode': 'form'}
+        for index, (student, grade) in enumerate(zip(self.students, grades)):
+            data[f'form-{index}-student'] = student.pk
+            data[f'form-{index}-grade'] = grade
+        return data
+
+    def new_grades(self):
+        return Grades.objects.filter(subject=self.subject).count() - \
+            self.grades_before
+
+    @override_settings(JOBS_EAGER=False)
+    def test_whole_class_in_one_request(self):
+        grades = [index % 5 + 1 for index in range(PUPILS)]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(self.url, self.formset_data(grades))
+        self.assertEqual(response.status_code, 302)
+        self.assertLessEqual(len(queries), BULK_ENTRY_QUERIES)
+        self.assertEqual(self.new_grades(), PUPILS)
+        self.assertEqual(Job.objects.filter(name='notify_grades').count(), 1)
+
+    def test_one_message_per_grade_value(self):
+        messages_before = Message.objects.count()
+        grades = [index % 5 + 1 for index in range(PUPILS)]
+        self.client.post(self.url, self.formset_data(grades))
+        self.assertEqual(Message.objects.count() - messages_before, 5)
+
+    def test_empty_cells_are_skipped(self):
+        grades = ['5', ''] * (PUPILS // 2)
+        self.client.post(self.url, self.formset_data(grades))
+        self.assertEqual(self.new_grades(), PUPILS // 2)
+
+    def test_invalid_grade_saves_nothing(self):
+        grades = ['4'] * (PUPILS - 1) + ['6']
+        response = self.client.post(self.url, self.formset_data(grades))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.new_grades(), 0)
+
+    def test_csv_paste(self):
+        first, second = self.students[:2]
+        text = f'Учень; Оцінка\n{first.user.username}; 5\n{second.pk}; 3\n'
+        response = self.client.post(self.url, {'mode': 'csv', 'text': text})
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(
+            list(Grades.objects.filter(subject=self.subject).order_by(
+                '-id'
+            ).values_list('student_id', 'grade')[:2]),
+            [(second.pk, 3), (first.pk, 5)]
+        )
+
+    def test_csv_with_unknown_pupil_saves_nothing(self):
+        text = f'{self.students[0].pk},5\nНевідомий Учень,4\n'
+        response = self.client.post(self.url, {'mode': 'csv', 'text': text})
+        self.assertContains(response, 'Рядок 2')
+        self.assertEqual(self.new_grades(), 0)
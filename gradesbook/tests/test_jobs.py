@@ -0,0 +1,85 @@
+from datetime import timedelta
+from unittest import mock
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from gradesbook import jobs
+from gradesbook.models import Job
+
+
+@override_settings(JOBS_EAGER=False)
+class JobQueueTests(TestCase):
+
+    def setUp(self):
+        self.calls = []
+        registry = mock.patch.dict(jobs.registry, {
+            'record': lambda **payload: self.calls.append(payload),
+            'fail': self.fail_job,
+        })
+        registry.start()
+        self.addCleanup(registry.stop)
+
+    def fail_job(self):
+        raise RuntimeError('Broken job')
+
+    def test_batches_are_claimed_once(self):
+        for number in range(5):
+            jobs.enqueue('record', number=number)
+        jobs.enqueue('record', run_after=timezone.now() + timedelta(hours=1))
+        first = jobs.claim('a', 3)
+        second = jobs.claim('b', 3)
+        self.assertEqual(len(first), 3)
+        self.assertEqual(len(second), 2)
+        self.assertEqual(jobs.claim('c'), [])
+        self.assertEqual({job.status for job in first + second},
+                         {Job.RUNNING})
+        for job in first + second:
+            self.assertEqual(job.attempts, 1)
+            self.assertTrue(jobs.run(job))
+        self.assertEqual([call['number'] for call in self.calls],
+                         list(range(5)))
+        self.assertEqual(Job.objects.count(), 1)
+
+    def test_failures_are_retried_with_backoff_until_dead(self):
+        jobs.enqueue('fail', max_attempts=3)
+        for attempt in range(1, 4):
+            job, = jobs.claim('a')
+            self.assertEqual(job.attempts, attempt)
+            started = timezone.now()
+            with self.assertLogs('gradesbook.jobs', 'WARNING'):
+                self.assertFalse(jobs.run(job))
+            job.refresh_from_db()
+            self.assertIn('Broken job', job.last_error)
+            if attempt < 3:
+                self.assertEqual(job.status, Job.QUEUED)
+                self.assertGreaterEqual(job.run_after - started,
+                                        jobs.backoff(attempt))
+                self.assertEqual(jobs.claim('a'), [])
+                Job.objects.update(run_after=timezone.now())
+        self.assertEqual(job.status, Job.DEAD)
+        self.assertEqual(jobs.claim('a'), [])
+
+    def test_expired_leases_are_claimed_again(self):
+        jobs.enqueue('record', number=1)
+        job, = jobs.claim('a')
+        self.assertEqual(jobs.claim('b'), [])
+        Job.objects.update(claimed_at=timezone.now() - jobs.LEASE
+                           - timedelta(seconds=1))
+        reclaimed, = jobs.claim('b')
+        self.assertEqual(reclaimed.attempts, 2)
+        # The first worker lost the job and leaves it to the second one
+        self.assertIsNone(jobs.run(job))
+        self.assertTrue(jobs.run(reclaimed))
+        self.assertEqual(self.calls, [{'number': 1}])
+
+    def test_lease_is_renewed_when_a_job_of_a_batch_starts(self):
+        claimed_meanwhile = []
+        jobs.registry['record'] = lambda **payload: claimed_meanwhile.extend(
+            jobs.claim('b')
+        )
+        jobs.enqueue('record')
+        job, = jobs.claim('a')
+        # The job waited behind others of its batch for longer than a lease
+        Job.objects.update(claimed_at=timezone.now() - jobs.LEASE
+                           - timedelta(seconds=1))
+        self.assertTrue(jobs.run(job))
+        self.assertEqual(claimed_meanwhile, [])
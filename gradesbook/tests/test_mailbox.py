@@ -0,0 +1,60 @@
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from gradesbook.mailing import deliver, recipient_users
+from gradesbook.models import InboxEntry, Message, UnreadCounter
+from gradesbook.tests.school import PUPILS, SchoolTestCase
+
+
+class MailboxTests(SchoolTestCase):
+
+    def broadcast(self):
+        with transaction.atomic():
+            message = Message.objects.create(
+                subject='Збори', text='Батьківські збори',
+                sender=self.manager, recipient=self.school_class.name
+            )
+            deliver(message, recipient_users(1, self.school_class))
+        return message
+
+    def test_broadcast_writes_one_entry_per_recipient(self):
+        unread = UnreadCounter.objects.unread_for(self.student.user)
+        with CaptureQueriesContext(connection) as queries:
+            message = self.broadcast()
+        entries = InboxEntry.objects.filter(message=message)
+        self.assertEqual(entries.count(), PUPILS)
+        self.assertFalse(entries.exclude(sender=self.manager).exists())
+        self.assertFalse(entries.exclude(date=message.date).exists())
+        # message, recipients, entries, two for the counters and the
+        # savepoint around them
+        self.assertLessEqual(len(queries), 7)
+        self.assertEqual(UnreadCounter.objects.unread_for(self.student.user),
+                         unread + 1)
+
+    def test_reading_marks_entry_once(self):
+        message = self.broadcast()
+        entry = InboxEntry.objects.get(message=message,
+                                       user=self.student.user)
+        unread = UnreadCounter.objects.unread_for(self.student.user)
+        url = reverse('gradesbook:mail_text', args=[entry.id, 1])
+        self.client.force_login(self.student.user)
+        for _ in range(2):
+            response = self.client.get(url)
+            self.assertContains(response, 'Батьківські збори')
+        entry.refresh_from_db()
+        self.assertTrue(entry.read)
+        self.assertEqual(UnreadCounter.objects.unread_for(self.student.user),
+                         unread - 1)
+
+    def test_mail_of_others_is_hidden(self):
+        message = self.broadcast()
+        entry = InboxEntry.objects.filter(message=message).exclude(
+            user=self.student.user
+        ).first()
+        self.client.force_login(self.student.user)
+        self.assertEqual(self.client.get(reverse(
+            'gradesbook:mail_text', args=[entry.id, 1]
+        )).status_code, 404)
+        self.assertEqual(self.client.get(reverse(
+            'gradesbook:mail_text', args=[message.id, 2]
+        )).status_code, 404)
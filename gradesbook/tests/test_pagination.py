@@ -0,0 +1,78 @@
+from django.urls import reverse
+from gradesbook.models import Grades
+from gradesbook.pagination import LAST, KeysetPaginator, encode_token
+from gradesbook.tests.school import SchoolTestCase
+
+
+class KeysetPaginatorTests(SchoolTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.grades = Grades.objects.filter(subject=self.subject)
+        self.expected = list(self.grades.order_by('date', 'id')
+                             .values_list('id', flat=True))
+
+    def paginator(self):
+        return KeysetPaginator(self.grades, 7, ordering=('date', 'id'))
+
+    def ids(self, page):
+        return [grade.id for grade in page]
+
+    def walk(self, token, attribute):
+        pages = []
+        while token:
+            page = self.paginator().get_page(token)
+            pages.append(self.ids(page))
+            token = getattr(page, attribute)
+        return pages
+
+    def test_pages_forwards_and_backwards(self):
+        # Grades of a day share their date, the id breaks the ties
+        self.assertGreater(len(self.expected),
+                           len(set(self.grades.values_list('date'))))
+        first = self.paginator().get_page()
+        self.assertFalse(first.has_previous())
+        pages = [self.ids(first)] + self.walk(first.next_token, 'next_token')
+        self.assertEqual(sum(pages, []), self.expected)
+        self.assertTrue(all(len(page) == 7 for page in pages[:-1]))
+
+        last = self.paginator().get_page(LAST)
+        self.assertFalse(last.has_next())
+        self.assertEqual(self.ids(last), self.expected[-7:])
+        backwards = [self.ids(last)] + self.walk(last.previous_token,
+                                                 'previous_token')
+        self.assertEqual(sum(backwards[::-1], []), self.expected)
+
+    def test_tampered_tokens_show_the_first_page(self):
+        first = self.ids(self.paginator().get_page())
+        date = str(self.grades.first().date)
+        for token in ('abc', encode_token('next', ['x']),
+                      encode_token('next', ['x', 'y']),
+                      encode_token('previous', [date, 'y']),
+                      encode_token('next', [None, 1]),
+                      encode_token('next', {'date': date})):
+            with self.subTest(token=token):
+                self.assertEqual(self.ids(self.paginator().get_page(token)),
+                                 first)
+
+    def test_tampered_tokens_of_pages(self):
+        self.client.force_login(self.student.user)
+        response = self.client.get(reverse('gradesbook:mailbox'), {
+            'page2': encode_token('next', ['x'])
+        })
+        self.assertEqual(response.status_code, 200)
+        self.client.force_login(self.manager)
+        response = self.client.get(
+            reverse('gradesbook:subject_view',
+                    args=[self.school_class.unique_code,
+                          self.subject.unique_code]),
+            {'page1': encode_token('next', ['x', 'y'])}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.client.force_login(self.teacher.user)
+        response = self.client.get(
+            reverse('gradesbook:teacher_subject',
+                    args=[self.subject.unique_code]),
+            {'page1': encode_token('next', ['x', 'y'])}
+        )
+        self.assertEqual(response.status_code, 200)
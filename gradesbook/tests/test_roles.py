@@ -0,0 +1,49 @@
+from django.contrib.auth.models import Permission
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from gradesbook.tests.school import SchoolTestCase
+
+
+class RoleMiddlewareTests(SchoolTestCase):
+
+    def permission_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        return response, [query['sql'] for query in queries
+                          if 'auth_permission' in query['sql']]
+
+    def test_role_is_resolved_once_per_session(self):
+        self.client.force_login(self.student.user)
+        url = reverse('gradesbook:student_parent')
+        for _ in range(2):
+            response, queries = self.permission_queries(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(queries, [])
+
+    def test_permission_change_resolves_the_role_again(self):
+        user = self.student.user
+        self.client.force_login(user)
+        url = reverse('gradesbook:student_parent')
+        user.user_permissions.remove(
+            Permission.objects.get(codename='student')
+        )
+        response, queries = self.permission_queries(url)
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(len(queries), 1)
+
+    def test_manager_wins_over_other_roles(self):
+        user = self.teacher.user
+        user.user_permissions.add(Permission.objects.get(codename='manager'))
+        self.client.force_login(user)
+        response = self.client.get(reverse('gradesbook:homepage'))
+        self.assertRedirects(response, reverse('gradesbook:manager'))
+
+    def test_parent_gets_the_child(self):
+        self.client.force_login(self.parent.user)
+        response = self.client.get(reverse('gradesbook:student_parent'))
+        request = response.wsgi_request
+        self.assertEqual(request.role, 'parent')
+        self.assertEqual(request.person, self.parent)
+        self.assertEqual(request.student_id, self.parent.student_id)
+        self.assertEqual(request.student, self.parent.student)
@@ -0,0 +1,86 @@
+from io import StringIO
+from django.core.management import call_command
+from django.urls import reverse
+from gradesbook.benchmark import seed_class
+from gradesbook.models import (SchoolClass, Student, Subject, SubjectDate,
+                               SubjectTeachers)
+from gradesbook.rollover import RolloverError, roll_over
+from gradesbook.tests.school import PUPILS, SchoolTestCase
+from gradesbook.timetable import class_timetable
+
+
+class RolloverTests(SchoolTestCase):
+
+    def layout(self, school_class):
+        """Subjects of a class with their timetable and teachers."""
+        return sorted(
+            (subject.name,
+             sorted(SubjectDate.objects.filter(subject=subject)
+                    .values_list('day', 'lesson_number')),
+             sorted(SubjectTeachers.teacher.through.objects.filter(
+                 subjectteachers__subject=subject
+             ).values_list('teacher_id', flat=True)))
+            for subject in Subject.objects.filter(school_class=school_class)
+        )
+
+    def test_preview_changes_nothing(self):
+        self.client.force_login(self.manager)
+        classes = SchoolClass.objects.count()
+        response = self.client.get(reverse('gradesbook:rollover'),
+                                   {'year': 2021})
+        plan = response.context['plan']
+        self.assertEqual([promotion.unique_code
+                          for promotion in plan.promotions],
+                         ['6а2022', '7б2022'])
+        self.assertEqual(plan.subjects, 12)
+        self.assertEqual(plan.pupils, 2 * PUPILS)
+        self.assertEqual(SchoolClass.objects.count(), classes)
+
+    def test_classes_are_promoted(self):
+        layout = self.layout(self.school_class)
+        pupils = set(Student.objects.filter(
+            school_class=self.school_class
+        ).values_list('pk', flat=True))
+        graduates = seed_class(3, '9г2021')
+        self.client.force_login(self.manager)
+        self.client.post(reverse('gradesbook:rollover'), {'year': 2021})
+
+        promoted = SchoolClass.objects.get(unique_code='6а2022')
+        self.assertTrue(promoted.active)
+        self.assertEqual(promoted.name, '6а')
+        self.assertEqual(self.layout(promoted), layout)
+        self.assertTrue(Subject.objects.filter(
+            unique_code=self.subject.unique_code.replace('5а2021', '6а2022')
+        ).exists())
+        self.assertEqual(set(Student.objects.filter(
+            school_class=promoted
+        ).values_list('pk', flat=True)), pupils)
+        self.assertFalse(SchoolClass.objects.filter(
+            year=2021, active=True
+        ).exists())
+        self.assertEqual(Student.objects.filter(
+            school_class=graduates
+        ).count(), 3)
+        self.assertFalse(SchoolClass.objects.filter(
+            unique_code='1г2022'
+        ).exists())
+        self.assertTrue(any(any(row) for row in class_timetable(promoted.id)))
+
+    def test_taken_codes_stop_the_rollover(self):
+        SchoolClass.objects.create(name='6а', year=2022, unique_code='6а2022')
+        with self.assertRaises(RolloverError):
+            roll_over(2021)
+        self.assertTrue(SchoolClass.objects.get(
+            pk=self.school_class.pk
+        ).active)
+        self.assertFalse(Subject.objects.filter(
+            school_class__year=2022
+        ).exists())
+
+    def test_command_dry_run(self):
+        out = StringIO()
+        call_command('rollover', '2021', '--dry-run', stdout=out)
+        self.assertIn('5а2021 -> 6а2022', out.getvalue())
+        self.assertFalse(SchoolClass.objects.filter(year=2022).exists())
+        call_command('rollover', '2021', stdout=StringIO())
+        self.assertEqual(SchoolClass.objects.filter(year=2022).count(), 2)
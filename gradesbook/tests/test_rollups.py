@@ -0,0 +1,136 @@
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from gradesbook.archive import delete_pupils, delete_subjects
+from gradesbook.jobs import claim, run
+from gradesbook.mailing import recipient_users
+from gradesbook.models import GradeRollup, Grades, Student, Subject
+from gradesbook.rollups import rebuild_rollups
+from gradesbook.tests.school import SchoolTestCase
+
+
+class GradeRollupTests(SchoolTestCase):
+
+    def snapshot(self):
+        return sorted(GradeRollup.objects.values_list(
+            'school_class_id', 'subject_id', 'week', 'count_1', 'count_2',
+            'count_3', 'count_4', 'count_5', 'grade_sum', 'canceled'
+        ))
+
+    def assertRollupsMatchGrades(self):
+        incremental = self.snapshot()
+        rebuild_rollups(chunk_size=4)
+        self.assertEqual(incremental, self.snapshot())
+
+    def test_fixture_is_rolled_up(self):
+        rollups = GradeRollup.objects.filter(subject=self.subject)
+        self.assertEqual(
+            sum(rollup.count_1 + rollup.count_2 + rollup.count_3 +
+                rollup.count_4 + rollup.count_5 for rollup in rollups),
+            Grades.objects.filter(subject=self.subject).count()
+        )
+
+    def test_grade_and_its_cancellation(self):
+        self.client.force_login(self.manager)
+        url = reverse('gradesbook:manager_student', args=[self.student.pk])
+        self.client.post(url, {'grade': 5,
+                               'subject': self.subject.unique_code})
+        self.assertRollupsMatchGrades()
+        grade = Grades.objects.filter(student=self.student).latest('id')
+        self.client.post(url, {'del_grade': grade.id})
+        self.assertFalse(Grades.objects.filter(id=grade.id).exists())
+        self.assertRollupsMatchGrades()
+
+    def test_bulk_entry(self):
+        self.client.force_login(self.teacher.user)
+        students = Student.objects.filter(school_class=self.school_class)
+        self.client.post(
+            reverse('gradesbook:teacher_bulk_grades',
+                    args=[self.subject.unique_code]),
+            {'mode': 'csv',
+             'text': '\n'.join(f'{student.user.username}, 3'
+                               for student in students)}
+        )
+        self.assertRollupsMatchGrades()
+
+    def test_deleted_pupil(self):
+        self.student.user.delete()
+        self.assertRollupsMatchGrades()
+
+    def test_deletes_skip_signals_of_grades(self):
+        # Classmates who sent no mail, with the same inbox
+        first, second = Student.objects.filter(
+            school_class=self.school_class
+        ).exclude(pk=self.student.pk).order_by('pk')[:2]
+        Grades.objects.bulk_create([
+            Grades(grade=4, student=second, subject=self.subject)
+            for _ in range(100)
+        ])
+        rebuild_rollups()
+        counts = []
+        for student in (first, second):
+            with CaptureQueriesContext(connection) as queries:
+                delete_pupils([student.pk])
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1])
+        self.assertRollupsMatchGrades()
+
+        first, second = Subject.objects.filter(
+            school_class=self.school_class
+        ).order_by('id')[:2]
+        Grades.objects.bulk_create([
+            Grades(grade=3, student=self.student, subject=second)
+            for _ in range(100)
+        ])
+        counts = []
+        for subject in (first, second):
+            with CaptureQueriesContext(connection) as queries:
+                delete_subjects([subject.id])
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1])
+        self.assertFalse(Grades.objects.filter(subject=second).exists())
+
+    @override_settings(JOBS_EAGER=False)
+    def test_pupils_waiting_for_the_worker_are_hidden(self):
+        self.client.force_login(self.manager)
+        self.client.get(reverse('gradesbook:del_student',
+                                args=[self.student.user_id]))
+        self.assertTrue(Student.objects.filter(pk=self.student.pk).exists())
+        self.assertNotIn(self.student, Student.objects.listed())
+        response = self.client.get(reverse(
+            'gradesbook:class_roster', args=[self.school_class.unique_code]
+        ))
+        self.assertNotContains(response, str(self.student))
+        self.assertNotIn(self.student.user_id,
+                         recipient_users(1, self.school_class))
+        self.assertNotIn(self.parent.user_id,
+                         recipient_users(5, self.student))
+        self.client.force_login(self.teacher.user)
+        response = self.client.get(reverse(
+            'gradesbook:teacher_bulk_grades', args=[self.subject.unique_code]
+        ))
+        self.assertNotIn(self.student,
+                         [student for student, _ in response.context['rows']])
+        self.client.force_login(self.manager)
+        self.assertEqual(
+            self.client.get(reverse('gradesbook:del_student',
+                                    args=[self.student.user_id])).status_code,
+            404
+        )
+        for job in claim('test'):
+            run(job)
+        self.assertFalse(Student.objects.filter(pk=self.student.pk).exists())
+
+    def test_analytics_reads_only_rollups(self):
+        self.client.force_login(self.manager)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(
+                reverse('gradesbook:manager_analytics'),
+                {'class': self.school_class.unique_code}
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse([query for query in queries
+                          if 'grades"' in query['sql'].lower()])
+        self.assertEqual(len(response.context['subjects']), 6)
+        self.assertTrue(response.context['weeks'])
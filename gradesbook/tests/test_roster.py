@@ -0,0 +1,96 @@
+import io
+from unittest import skipUnless
+from django.contrib.auth.models import Permission, User
+from django.contrib.contenttypes.models import ContentType
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import override_settings
+from django.urls import reverse
+from gradesbook.models import Parent, Student
+from gradesbook.roster import openpyxl
+from gradesbook.tests.school import SchoolTestCase
+
+HEADER = 'surname;name;birthday;parent1_name;parent1_surname;' \
+         'parent2_name;parent2_surname'
+ROWS = [
+    'Гнатюк;Остап;01.09.2012;Леся;Гнатюк;Роман;Гнатюк',
+    'Гнатюк;Остап;2012-10-02;Леся;Гнатюк;;',
+    'Зінченко;Уляна;15.03.2012;Галина;Зінченко;;',
+]
+
+
+@override_settings(
+    PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher']
+)
+class RosterImportTests(SchoolTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.users['manager'])
+        self.url = reverse('gradesbook:roster_import',
+                           args=[self.school_class.unique_code])
+        self.students_before = Student.objects.count()
+        self.parents_before = Parent.objects.count()
+
+    def upload(self, content, name='roster.csv'):
+        return self.client.post(self.url, {
+            'file': SimpleUploadedFile(name, content)
+        })
+
+    def test_csv_creates_pupils_and_parents(self):
+        response = self.upload('\n'.join([HEADER] + ROWS).encode())
+        self.assertEqual(response.context['result'].students, 3)
+        self.assertEqual(Student.objects.count() - self.students_before, 3)
+        self.assertEqual(Parent.objects.count() - self.parents_before, 4)
+        namesakes = Student.objects.filter(surname='Гнатюк', name='Остап')
+        self.assertEqual(
+            sorted(namesakes.values_list('user__username', flat=True)),
+            ['ОстапГнатюк', 'ОстапГнатюк2']
+        )
+        self.assertTrue(all(
+            student.school_class_id == self.school_class.id
+            for student in namesakes
+        ))
+        user = User.objects.get(username='ЛесяГнатюк')
+        self.assertTrue(user.check_password('ЛесяГнатюк345'))
+        self.assertTrue(user.has_perm('gradesbook.parent'))
+
+    def test_roles_are_granted_by_their_content_type(self):
+        # A permission of another app with the codename of a role
+        Permission.objects.create(
+            codename='student', name='Other student',
+            content_type=ContentType.objects.get_for_model(User)
+        )
+        self.upload('\n'.join([HEADER] + ROWS[2:]).encode())
+        user = User.objects.get(username='УлянаЗінченко')
+        self.assertEqual(
+            list(user.user_permissions.values_list(
+                'content_type__app_label', 'codename'
+            )),
+            [('gradesbook', 'student')]
+        )
+
+    def test_invalid_row_creates_nothing(self):
+        content = '\n'.join([HEADER] + ROWS + ['Бойко;;31.02.2012;;;;'])
+        response = self.upload(content.encode())
+        errors = response.context['result'].errors
+        self.assertEqual([error.line for error in errors], [5])
+        self.assertEqual(Student.objects.count(), self.students_before)
+        self.assertEqual(User.objects.filter(
+            username__startswith='ОстапГнатюк'
+        ).count(), 0)
+
+    def test_wrong_header_is_reported(self):
+        response = self.upload(b'pupil;grade\n1;5')
+        self.assertEqual(len(response.context['errors']), 1)
+        self.assertEqual(Student.objects.count(), self.students_before)
+
+    @skipUnless(openpyxl, 'openpyxl is not installed')
+    def test_xlsx(self):
+        workbook = openpyxl.Workbook()
+        workbook.active.append(HEADER.split(';'))
+        for row in ROWS:
+            workbook.active.append(row.split(';'))
+        content = io.BytesIO()
+        workbook.save(content)
+        self.upload(content.getvalue(), 'roster.xlsx')
+        self.assertEqual(Student.objects.count() - self.students_before, 3)
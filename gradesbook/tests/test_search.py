@@ -0,0 +1,141 @@
+from io import StringIO
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from gradesbook.benchmark import seed_class
+from gradesbook.mailing import deliver, recipient_users
+from gradesbook.models import Message, Student
+from gradesbook.search import PERSON_TABLE, search_mail, search_people
+from gradesbook.tests.school import SchoolTestCase
+
+
+class SearchTests(SchoolTestCase):
+
+    def announce(self, school_class, subject, text='Текст'):
+        message = Message.objects.create(
+            subject=subject, text=text, sender=self.manager,
+            recipient=school_class.name
+        )
+        deliver(message, recipient_users(1, school_class))
+        return message
+
+    def found(self, user, role, query):
+        return [hit.message.id for hit in search_mail(user, role, query)]
+
+    def test_pupils_find_only_their_own_mail(self):
+        own = self.announce(self.school_class, 'Екскурсія до Львова')
+        other = self.announce(self.classes[1], 'Екскурсія до Києва')
+        self.assertEqual(
+            self.found(self.student.user, 'student', 'екскурс'), [own.id]
+        )
+        self.assertEqual(
+            self.found(self.manager, 'manager', 'ЕКСКУРСІЯ'),
+            [other.id, own.id]
+        )
+        self.assertEqual(
+            self.found(self.parent.user, 'parent', 'екскурсія'), []
+        )
+
+    def test_only_senders_and_recipients_open_found_mail(self):
+        message = self.announce(self.school_class, 'Екскурсія')
+        private = Message.objects.create(subject='Екскурсія', text='Текст',
+                                         sender=self.student.user)
+        deliver(private, [self.teacher.user_id])
+        hits = {hit.message.id: hit
+                for hit in search_mail(self.manager, 'manager', 'екскурсія')}
+        self.assertEqual(hits[message.id][1:], (message.id, 2))
+        self.assertEqual(hits[private.id][1:], (None, None))
+        self.client.force_login(self.manager)
+        self.assertEqual(self.client.get(reverse(
+            'gradesbook:mail_text', args=[private.id, 2]
+        )).status_code, 404)
+        response = self.client.get(reverse('gradesbook:search'),
+                                   {'q': 'екскурсія'})
+        self.assertContains(response, reverse('gradesbook:mail_text',
+                                              args=[message.id, 2]))
+        self.assertNotContains(response, reverse('gradesbook:mail_text',
+                                                 args=[private.id, 2]))
+
+    def test_ukrainian_words(self):
+        message = self.announce(self.school_class, 'Їжак', "Моя сімʼя і Йосип")
+        for query in ('їжак', 'ЇЖА', "сім'я", 'сім’я', 'йосип', 'сім я'):
+            with self.subTest(query=query):
+                self.assertEqual(
+                    self.found(self.manager, 'manager', query), [message.id]
+                )
+        # й and ї are letters of their own
+        for query in ('иосип', 'іжак'):
+            with self.subTest(query=query):
+                self.assertEqual(self.found(self.manager, 'manager', query),
+                                 [])
+
+    def test_long_words(self):
+        # Words longer than the prefix indexes are checked after the
+        # search, newest messages sharing their prefix come first
+        match = self.announce(self.school_class, 'Олімпіада з історії')
+        for number in range(25):
+            self.announce(self.school_class, f'Олівець {number}')
+        self.assertEqual(self.found(self.manager, 'manager', 'олімпіад'),
+                         [match.id])
+        self.assertEqual(
+            self.found(self.student.user, 'student', 'олімп істор'),
+            [match.id]
+        )
+        self.assertEqual(self.found(self.manager, 'manager', 'олівець'),
+                         self.found(self.manager, 'manager', 'олів')[:20])
+
+    def test_operators_are_plain_words(self):
+        self.announce(self.school_class, 'Математика OR фізика')
+        for query in ('"', 'NOT', 'мат* OR', 'a:b', '(', '-'):
+            with self.subTest(query=query):
+                search_mail(self.manager, 'manager', query)
+
+    def test_index_follows_changes(self):
+        message = self.announce(self.school_class, 'Контрольна')
+        message.subject = 'Диктант'
+        message.save()
+        self.assertEqual(self.found(self.manager, 'manager', 'контрольна'),
+                         [])
+        self.assertEqual(self.found(self.manager, 'manager', 'диктант'),
+                         [message.id])
+        message.delete()
+        self.assertEqual(self.found(self.manager, 'manager', 'диктант'), [])
+
+        Student.objects.filter(pk=self.student.pk).update(surname='Шевченко')
+        hits = search_people(self.manager, 'manager', 'шевч')
+        self.assertEqual([hit.person.pk for hit in hits], [self.student.pk])
+        User.objects.filter(pk=self.student.pk).delete()
+        self.assertEqual(search_people(self.manager, 'manager', 'шевч'), [])
+
+    def test_teachers_find_pupils_they_teach(self):
+        # seed_class adds pupils and parents with bulk inserts
+        school_class = seed_class(2, '7ж2021')
+        Student.objects.filter(school_class=school_class).update(
+            surname='Франко'
+        )
+        self.assertEqual(len(search_people(self.manager, 'manager',
+                                           'франко')), 2)
+        self.assertEqual(search_people(self.teacher.user, 'teacher',
+                                       'франко'), [])
+        self.assertTrue(search_people(self.teacher.user, 'teacher',
+                                      self.student.surname))
+        self.assertEqual(search_people(self.student.user, 'student',
+                                       'вчитель'), [])
+
+    def test_rebuild_command(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {PERSON_TABLE}')
+        self.assertEqual(search_people(self.manager, 'manager', 'учень'), [])
+        call_command('rebuild_search', stdout=StringIO())
+        self.assertTrue(search_people(self.manager, 'manager', 'учень'))
+
+    def test_search_page(self):
+        self.announce(self.school_class, 'Екскурсія')
+        self.client.force_login(self.student.user)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('gradesbook:search'),
+                                       {'q': 'екскурсія'})
+        self.assertContains(response, 'Екскурсія')
+        self.assertLessEqual(len(queries), 9)
@@ -0,0 +1,86 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from gradesbook.models import Grades, InboxEntry, Student
+from gradesbook.tests.school import SchoolTestCase
+
+
+class ConditionalGetTests(SchoolTestCase):
+
+    def get(self, url, etag=None):
+        headers = {'HTTP_IF_NONE_MATCH': etag} if etag else {}
+        return self.client.get(url, **headers)
+
+    def assertNotModified(self, url, etag):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.get(url, etag)
+        self.assertEqual(response.status_code, 304)
+        # The session and the user, nothing of the page
+        self.assertEqual(len(queries), 2)
+
+    def test_pupil_page(self):
+        url = reverse('gradesbook:student_parent')
+        self.client.force_login(self.student.user)
+        response = self.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['ETag'].startswith('W/"'))
+        self.assertIn('Last-Modified', response)
+        self.assertIn('private', response['Cache-Control'])
+        self.assertIn('no-cache', response['Cache-Control'])
+        etag = response['ETag']
+        self.assertNotModified(url, etag)
+
+        # Grades of classmates leave the page as it was
+        classmate = Student.objects.filter(
+            school_class=self.school_class
+        ).exclude(pk=self.student.pk).first()
+        Grades.objects.create(grade=5, student=classmate,
+                              subject=self.subject)
+        self.assertNotModified(url, etag)
+
+        Grades.objects.create(grade=4, student=self.student,
+                              subject=self.subject)
+        response = self.get(url, etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+        # The parent of the pupil sees another page
+        self.client.force_login(self.parent.user)
+        self.assertEqual(self.get(url, response['ETag']).status_code, 200)
+
+    def test_timetable(self):
+        url = reverse('gradesbook:timetable', args=['student'])
+        self.client.force_login(self.student.user)
+        etag = self.get(url)['ETag']
+        self.assertNotModified(url, etag)
+        slot = self.subject.subjectdate_set.first()
+        slot.lesson_number = slot.lesson_number % 8 + 1
+        slot.save()
+        self.assertEqual(self.get(url, etag).status_code, 200)
+
+    def test_pupil_moved_to_another_class(self):
+        url = reverse('gradesbook:timetable', args=['student'])
+        self.client.force_login(self.student.user)
+        etag = self.get(url)['ETag']
+        self.student.school_class = self.classes[1]
+        self.student.save()
+        response = self.get(url, etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.wsgi_request.school_class_id,
+                         self.classes[1].id)
+
+    def test_mailbox(self):
+        url = reverse('gradesbook:mailbox')
+        self.client.force_login(self.student.user)
+        etag = self.get(url)['ETag']
+        self.assertNotModified(url, etag)
+
+        self.send(self.teacher.user, 4, self.student, 'Домашнє завдання',
+                  str(self.student))
+        etag = self.get(url, etag)['ETag']
+        self.assertNotModified(url, etag)
+
+        entry = InboxEntry.objects.filter(user=self.student.user,
+                                          read=False).first()
+        self.get(reverse('gradesbook:mail_text', args=[entry.id, 1]))
+        self.assertEqual(self.get(url, etag).status_code, 200)
@@ -0,0 +1,130 @@
+import datetime
+import statistics
+from io import StringIO
+from unittest import skipUnless
+from django.core.management import call_command
+from django.utils import timezone
+from gradesbook.models import Grades, Student, TermResult
+from gradesbook.terms import MANAGER_WEIGHT, compute_term, np
+from gradesbook.tests.school import SchoolTestCase
+
+
+@skipUnless(np, 'numpy is not installed')
+class TermResultTests(SchoolTestCase):
+
+    def setUp(self):
+        self.end = timezone.localdate()
+        self.start = self.end - datetime.timedelta(days=30)
+
+    def test_results_match_grades(self):
+        written = compute_term(self.start, self.end)
+        grades = {}
+        for student_id, subject_id, grade, manager_mode in Grades.objects.filter(
+            subject__school_class__active=True
+        ).values_list('student_id', 'subject_id', 'grade', 'manager_mode'):
+            grades.setdefault((student_id, subject_id), []).append(
+                (grade, MANAGER_WEIGHT if manager_mode else 1)
+            )
+        enrolled = {
+            (student_id, subject_id)
+            for student_id, subject_id in Student.objects.filter(
+                school_class__active=True
+            ).values_list('pk', 'school_class__subject')
+        }
+        self.assertLessEqual(set(grades), enrolled)
+        self.assertEqual(written, len(enrolled))
+        for result in TermResult.objects.filter(count__gt=0):
+            pairs = grades[result.student_id, result.subject_id]
+            values = [grade for grade, _ in pairs]
+            average = sum(grade * weight for grade, weight in pairs) / \
+                sum(weight for _, weight in pairs)
+            self.assertEqual(result.count, len(pairs))
+            self.assertAlmostEqual(result.average, average, places=2)
+            self.assertEqual(result.median, statistics.median(values))
+            self.assertEqual(result.final_grade, int(result.average + 0.5))
+
+    def test_ranks_in_subject(self):
+        compute_term(self.start, self.end)
+        results = list(TermResult.objects.filter(
+            subject=self.subject, count__gt=0
+        ).order_by('rank'))
+        self.assertEqual(results[0].rank, 1)
+        self.assertEqual(results[0].percentile, 100)
+        for better, worse in zip(results, results[1:]):
+            self.assertGreaterEqual(better.average, worse.average)
+            if better.average == worse.average:
+                self.assertEqual(better.rank, worse.rank)
+            else:
+                self.assertEqual(
+                    worse.rank,
+                    1 + sum(result.average > worse.average
+                            for result in results)
+                )
+            self.assertAlmostEqual(
+                worse.percentile,
+                100 * (len(results) - worse.rank) / (len(results) - 1),
+                places=1
+            )
+
+    def test_falling_grades_are_at_risk(self):
+        Grades.objects.filter(student=self.student,
+                              subject=self.subject).delete()
+        Grades.objects.bulk_create([
+            Grades(student=self.student, subject=self.subject, grade=grade)
+            for grade in (5, 4, 3, 2, 1)
+        ])
+        for days, grade in zip((28, 21, 14, 7, 0), (5, 4, 3, 2, 1)):
+            Grades.objects.filter(
+                student=self.student, subject=self.subject, grade=grade
+            ).update(date=self.end - datetime.timedelta(days=days))
+        compute_term(self.start, self.end)
+        result = TermResult.objects.get(student=self.student,
+                                        subject=self.subject)
+        self.assertEqual(result.slope, -1)
+        # Not below the average of AT_RISK_AVERAGE, but falling
+        self.assertEqual(result.average, 3)
+        self.assertTrue(result.at_risk)
+
+    def test_pupils_without_grades_are_at_risk(self):
+        Grades.objects.filter(student=self.student,
+                              subject=self.subject).delete()
+        compute_term(self.start, self.end)
+        result = TermResult.objects.get(student=self.student,
+                                        subject=self.subject)
+        self.assertEqual(result.count, 0)
+        self.assertIsNone(result.average)
+        self.assertIsNone(result.rank)
+        self.assertTrue(result.at_risk)
+        # Other subjects of the pupil still rank the pupil in the class
+        self.assertIsNotNone(result.class_rank)
+        self.assertEqual(
+            TermResult.objects.filter(subject=self.subject, count__gt=0)
+            .order_by('-rank').first().rank,
+            Student.objects.filter(school_class=self.school_class).count() - 1
+        )
+
+    def test_inactive_classes_and_other_terms_are_skipped(self):
+        compute_term(self.start, self.end)
+        self.assertFalse(TermResult.objects.filter(
+            subject__school_class__active=False
+        ).exists())
+        compute_term(self.end + datetime.timedelta(days=1),
+                     self.end + datetime.timedelta(days=30))
+        self.assertTrue(TermResult.objects.filter(
+            term_start=self.start
+        ).exists())
+
+    def test_command_replaces_results(self):
+        arguments = ['compute_term', f'--start={self.start}',
+                     f'--end={self.end}']
+        call_command(*arguments, stdout=StringIO())
+        count = TermResult.objects.count()
+        Grades.objects.filter(student=self.student).delete()
+        call_command(*arguments, stdout=StringIO())
+        results = TermResult.objects.filter(student=self.student)
+        self.assertTrue(results.exists())
+        for result in results:
+            self.assertEqual(result.count, 0)
+            self.assertIsNone(result.class_rank)
+            self.assertTrue(result.at_risk)
+        self.assertEqual(TermResult.objects.count(), count)
@@ -0,0 +1,67 @@
+from unittest import mock
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from gradesbook import usernames
+from gradesbook.permissions import grant
+from gradesbook.usernames import allocate_usernames, claim_username
+
+BASE = 'ОлександрКоваленко'
+
+
+@override_settings(
+    PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher']
+)
+class UsernameAllocatorTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        User.objects.bulk_create(
+            [User(username=BASE)] +
+            [User(username=f'{BASE}{number}') for number in range(2, 40)] +
+            [User(username=f'{BASE}41')]
+        )
+
+    def test_next_free_suffix_in_one_query(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(allocate_usernames([BASE]), [f'{BASE}40'])
+
+    def test_batch(self):
+        self.assertEqual(
+            allocate_usernames([BASE, 'ІванСила', BASE, 'ІванСила', BASE]),
+            [f'{BASE}40', 'ІванСила', f'{BASE}42', 'ІванСила2', f'{BASE}43']
+        )
+
+    def test_user_keeps_its_own_name(self):
+        user_id = User.objects.get(username=f'{BASE}41').id
+        self.assertEqual(
+            allocate_usernames([BASE], exclude_user_id=user_id),
+            [f'{BASE}40']
+        )
+        user_id = User.objects.get(username=BASE).id
+        self.assertEqual(
+            allocate_usernames([BASE], exclude_user_id=user_id), [BASE]
+        )
+
+    def test_retries_when_a_concurrent_insert_takes_the_name(self):
+        # The first lookup misses a name another request has just taken
+        stale = [[f'{BASE}2']]
+        real = usernames.allocate_usernames
+        with mock.patch.object(
+            usernames, 'allocate_usernames',
+            side_effect=lambda *args: stale.pop() if stale else real(*args)
+        ):
+            user = claim_username(
+                BASE, lambda username: User.objects.create(username=username)
+            )
+        self.assertEqual(user.username, f'{BASE}40')
+
+    def test_numbered_teacher_gets_the_teacher_password(self):
+        manager = User.objects.create(username='manager')
+        grant('manager', [manager.id])
+        User.objects.create(username='ІванСила')
+        self.client.force_login(manager)
+        self.client.post(reverse('gradesbook:add_teacher'),
+                         {'name': 'Іван', 'surname': 'Сила'})
+        teacher = User.objects.get(username='ІванСила2')
+        self.assertTrue(teacher.check_password('ІванСила2234'))
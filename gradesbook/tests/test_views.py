@@ -0,0 +1,244 @@
+import time
+from django.core.cache import cache
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from gradesbook import urls
+from gradesbook.archive import archive_subjects
+from gradesbook.benchmark import rolled_back
+from gradesbook.models import ArchivedSubject, InboxEntry, Message, Subject
+from gradesbook.tests.school import SchoolTestCase
+
+# route name: (max queries, max milliseconds) of one request on a cold
+# cache, for every role the route is requested as
+BUDGETS = {
+    'homepage': (0, 200),
+    'manager': (5, 400),
+    'class_roster': (3, 200),
+    'manager_timetable': (6, 400),
+    'manager_analytics': (8, 200),
+    # One query per export.CHUNK_SIZE grades, three for the whole school
+    'export_school': (5, 400),
+    'export_class': (4, 200),
+    'export_subject': (4, 200),
+    'export_student': (4, 200),
+    'rollover': (11, 200),
+    'create_school_class': (3, 200),
+    'edit_school_class': (6, 400),
+    'del_student': (7, 200),
+    'deactivation_school_class': (5, 200),
+    'activation_school_class': (5, 200),
+    'archive_school_class': (5, 200),
+    'restore_school_class': (5, 200),
+    'archived_subject': (8, 200),
+    'deactivation_teacher': (4, 200),
+    'activation_teacher': (4, 200),
+    'add_teacher': (3, 200),
+    'add_subject': (4, 200),
+    'roster_import': (4, 200),
+    'manager_student_edit': (8, 400),
+    'manager_reset_user': (12, 200),
+    'subject_view': (14, 400),
+    'delete_date': (4, 200),
+    # One statement per table a subject is kept in
+    'del_subject': (21, 200),
+    'del_subject_teacher': (7, 200),
+    'add_subject_teacher': (6, 200),
+    'manager_teacher': (6, 200),
+    'manager_teacher_edit': (5, 200),
+    'manager_del_teacher': (45, 400),
+    'teacher': (5, 200),
+    'teacher_subject': (9, 400),
+    'teacher_bulk_grades': (5, 400),
+    'timetable': (6, 200),
+    'mailbox': (6, 200),
+    'mail_text': (8, 200),
+    'search': (6, 200),
+    'student_parent': (6, 400),
+    'first_login': (3, 200),
+    'logout': (8, 200),
+    'create_message': (6, 200),
+    'manager_student': (7, 400),
+    'api_token': (0, 200),
+    'api_subjects': (5, 200),
+    'api_grades': (3, 200),
+    'api_timetable': (5, 200),
+    'api_received': (4, 200),
+    'api_sent': (3, 200),
+}
+
+
+# Jobs are left queued, like the web process does, and passwords use a
+# cheap hasher so that budgets measure the views
+@override_settings(
+    JOBS_EAGER=False,
+    PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher']
+)
+class ViewBudgetTests(SchoolTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        subject = Subject.objects.filter(
+            school_class=cls.classes[-1]
+        ).order_by('id').first()
+        archive_subjects([subject.id])
+        cls.archived = ArchivedSubject.objects.get(pk=subject.id)
+
+    def route_requests(self):
+        """
+        (route name, role, kwargs, method) of every request of the suite,
+        role None is an anonymous visitor.
+        """
+        class_code = self.school_class.unique_code
+        inactive_code = self.classes[-1].unique_code
+        archived_code = self.archived.school_class.unique_code
+        subject_code = self.subject.unique_code
+        teacher_id = self.teacher.pk
+        student_id = self.student.pk
+        slot = self.subject.subjectdate_set.first()
+        received = InboxEntry.objects.filter(
+            user=self.student.user
+        ).first()
+        sent = Message.objects.filter(
+            sender=self.teacher.user
+        ).first()
+        subject = {'class_unique_code': class_code,
+                   'subject_unique_code': subject_code}
+        return [
+            ('homepage', None, {}, 'get'),
+            ('manager', 'manager', {}, 'get'),
+            ('class_roster', 'manager',
+             {'class_unique_code': class_code}, 'get'),
+            ('manager_timetable', 'manager', {}, 'get'),
+            ('manager_analytics', 'manager', {}, 'get'),
+            ('export_school', 'manager', {}, 'get'),
+            ('export_class', 'manager', {'class_unique_code': class_code},
+             'get'),
+            ('export_subject', 'manager',
+             {'subject_unique_code': subject_code}, 'get'),
+            ('export_student', 'manager', {'user_id': student_id}, 'get'),
+            ('rollover', 'manager', {}, 'get'),
+            ('create_school_class', 'manager', {}, 'get'),
+            ('edit_school_class', 'manager',
+             {'class_unique_code': class_code}, 'get'),
+            ('del_student', 'manager', {'user_id': student_id}, 'get'),
+            ('deactivation_school_class', 'manager',
+             {'class_unique_code': class_code}, 'post'),
+            ('activation_school_class', 'manager',
+             {'class_unique_code': inactive_code}, 'post'),
+            ('archive_school_class', 'manager',
+             {'class_unique_code': inactive_code}, 'post'),
+            ('restore_school_class', 'manager',
+             {'class_unique_code': archived_code}, 'post'),
+            ('archived_subject', 'manager',
+             {'class_unique_code': archived_code,
+              'subject_unique_code': self.archived.unique_code}, 'get'),
+            ('deactivation_teacher', 'manager',
+             {'teacher_user_id': teacher_id}, 'get'),
+            ('activation_teacher', 'manager',
+             {'teacher_user_id': teacher_id}, 'get'),
+            ('add_teacher', 'manager', {}, 'get'),
+            ('add_subject', 'manager',
+             {'class_unique_code': class_code}, 'get'),
+            ('roster_import', 'manager',
+             {'class_unique_code': class_code}, 'get'),
+            ('manager_student_edit', 'manager', {'user_id': student_id},
+             'get'),
+            ('manager_reset_user', 'manager',
+             {'prefix': 123, 'user_id': student_id}, 'get'),
+            ('subject_view', 'manager', subject, 'get'),
+            ('delete_date', 'manager',
+             dict(subject, day=[day for day, _ in slot.DAYS].index(
+                 slot.day) + 1, lesson=slot.lesson_number), 'get'),
+            ('del_subject', 'manager', subject, 'get'),
+            ('del_subject_teacher', 'manager',
+             dict(subject, teacher_user_id=teacher_id), 'get'),
+            ('add_subject_teacher', 'manager', subject, 'get'),
+            ('manager_teacher', 'manager', {'teacher_user_id': teacher_id},
+             'get'),
+            ('manager_teacher_edit', 'manager', {'user_id': teacher_id},
+             'get'),
+            ('manager_del_teacher', 'manager',
+             {'teacher_user_id': teacher_id}, 'get'),
+            ('manager_student', 'manager', {'user_id': student_id}, 'get'),
+            ('create_message', 'manager', {'prefix': 1, 'code': class_code},
+             'get'),
+            ('create_message', 'manager', {'prefix': 8, 'code': 'None'},
+             'get'),
+            ('create_message', 'teacher',
+             {'prefix': 4, 'code': student_id}, 'get'),
+            ('create_message', 'student',
+             {'prefix': 7, 'code': teacher_id}, 'get'),
+            ('create_message', 'parent', {'prefix': 6, 'code': 'None'},
+             'get'),
+            ('teacher', 'teacher', {}, 'get'),
+            ('teacher_subject', 'teacher',
+             {'subject_unique_code': subject_code}, 'get'),
+            ('teacher_bulk_grades', 'teacher',
+             {'subject_unique_code': subject_code}, 'get'),
+            ('timetable', 'teacher', {'person': 'teacher'}, 'get'),
+            ('timetable', 'student', {'person': 'student'}, 'get'),
+            ('timetable', 'parent', {'person': 'student'}, 'get'),
+            ('student_parent', 'student', {}, 'get'),
+            ('student_parent', 'parent', {}, 'get'),
+            ('first_login', 'teacher', {}, 'get'),
+            ('first_login', 'student', {}, 'get'),
+            ('first_login', 'parent', {}, 'get'),
+        ] + [
+            ('mailbox', role, {}, 'get') for role in self.users
+        ] + [
+            ('search', role, {}, 'get') for role in self.users
+        ] + [
+            ('mail_text', 'student',
+             {'mailbox_id': received.id, 'mailbox_type': 1}, 'get'),
+            ('mail_text', 'teacher',
+             {'mailbox_id': sent.id, 'mailbox_type': 2}, 'get'),
+            ('logout', 'manager', {}, 'get'),
+            # Issuing tokens needs a password, test_api covers it
+            ('api_token', None, {}, 'options'),
+            ('api_subjects', 'student', {}, 'get'),
+            ('api_subjects', 'parent', {}, 'get'),
+            ('api_grades', 'student', {}, 'get'),
+            ('api_grades', 'parent', {}, 'get'),
+            ('api_timetable', 'student', {'person': 'student'}, 'get'),
+            ('api_timetable', 'teacher', {'person': 'teacher'}, 'get'),
+        ] + [
+            ('api_received', role, {}, 'get') for role in self.users
+        ] + [
+            ('api_sent', role, {}, 'get') for role in self.users
+        ]
+
+    def test_every_route_has_a_budget(self):
+        names = {pattern.name for pattern in urls.urlpatterns}
+        self.assertEqual(set(BUDGETS), names)
+        self.assertEqual(
+            {name for name, *_ in self.route_requests()}, names
+        )
+
+    def test_routes_stay_within_budget(self):
+        for name, role, kwargs, method in self.route_requests():
+            max_queries, max_ms = BUDGETS[name]
+            with self.subTest(route=name, role=role), rolled_back():
+                if role is None:
+                    self.client.logout()
+                else:
+                    self.client.force_login(self.users[role])
+                url = reverse(f'gradesbook:{name}', kwargs=kwargs)
+                with CaptureQueriesContext(connection) as queries:
+                    started = time.perf_counter()
+                    response = getattr(self.client, method)(
+                        url, HTTP_REFERER=url
+                    )
+                    if response.streaming:
+                        b''.join(response.streaming_content)
+                    elapsed = (time.perf_counter() - started) * 1000
+                self.assertLess(response.status_code, 400)
+                self.assertLessEqual(
+                    len(queries), max_queries,
+                    '\n'.join(query['sql'] for query in queries)
+                )
+                self.assertLessEqual(elapsed, max_ms)
+            # Timetables built inside the rolled back request are stale
+            cache.clear()
@@ -0,0 +1,82 @@
+from collections import namedtuple
+from django.core.cache import cache
+from .models import SchoolClass, SubjectDate, SubjectTeachers
+
+DAYS = [day for day, _ in SubjectDate.DAYS]
+DAY_INDEX = {day: index for index, day in enumerate(DAYS)}
+LESSONS = len(SubjectDate.LESSONS)
+CACHE_KEY = 'gradesbook:timetables'
+
+Lesson = namedtuple('Lesson', ['subject_id', 'name', 'code', 'class_name'])
+Timetables = namedtuple('Timetables', ['classes', 'teachers', 'active_classes'])
+
+
+def empty_grid():
+    return [[() for day in DAYS] for lesson in range(LESSONS)]
+
+
+def build_timetables():
+    """
+    Builds the lesson grid (8 lessons x 6 days, every cell a tuple of
+    lessons) of every school class and of every teacher of an active class.
+    """
+    classes = {}
+    teachers = {}
+    subject_teachers = {}
+    for subject_id, teacher_id in \
+            SubjectTeachers.teacher.through.objects.values_list(
+                'subjectteachers__subject_id', 'teacher_id'
+            ):
+        subject_teachers.setdefault(subject_id, []).append(teacher_id)
+
+    subject_dates = SubjectDate.objects.select_related(
+        'subject__school_class'
+    ).order_by('subject__name')
+    for subject_date in subject_dates:
+        subject = subject_date.subject
+        school_class = subject.school_class
+        lesson = Lesson(subject.id, subject.name, subject.unique_code,
+                        school_class.name)
+        row = subject_date.lesson_number - 1
+        column = DAY_INDEX[subject_date.day]
+
+        grid = classes.setdefault(school_class.id, empty_grid())
+        grid[row][column] += (lesson,)
+        if not school_class.active:
+            continue
+        for teacher_id in subject_teachers.get(subject.id, ()):
+            grid = teachers.setdefault(teacher_id, empty_grid())
+            grid[row][column] += (lesson,)
+
+    active_classes = list(SchoolClass.objects.filter(active=True).order_by(
+        'name'
+    ).values_list('id', 'name', 'unique_code'))
+    return Timetables(classes, teachers, active_classes)
+
+
+def get_timetables():
+    timetables = cache.get(CACHE_KEY)
+    if timetables is None:
+        timetables = build_timetables()
+        cache.set(CACHE_KEY, timetables, None)
+    return timetables
+
+
+def invalidate_timetables():
+    cache.delete(CACHE_KEY)
+
+
+def class_timetable(school_class_id):
+    return get_timetables().classes.get(school_class_id) or empty_grid()
+
+
+def teacher_timetable(teacher_id):
+    return get_timetables().teachers.get(teacher_id) or empty_grid()
+
+
+def grid_lessons(grid):
+    """(day, lesson number, Lesson) of every lesson of a grid, by day."""
+    return [(day, row + 1, lesson)
+            for column, day in enumerate(DAYS)
+            for row, cell in enumerate(grid)
+            for lesson in cell[column]]
@@ -6,6 +6,21 @@ app_name = 'gradesbook'
 urlpatterns = [
     path('', views.HomepageView.as_view(), name='homepage'),
     path('/manager', views.ManagerPanelView.as_view(), name='manager'),
+    path('/manager/analytics', views.ManagerAnalyticsView.as_view(),
+         name='manager_analytics'),
+    path('/manager/export', views.GradesExportView.as_view(),
+         name='export_school'),
+    path('/manager/export/class/<str:class_unique_code>',
+         views.GradesExportView.as_view(), name='export_class'),
+    path('/manager/export/subject/<str:subject_unique_code>',
+         views.GradesExportView.as_view(), name='export_subject'),
+    path('/manager/export/student/<int:user_id>',
+         views.GradesExportView.as_view(), name='export_student'),
+    path('/manager/classroster/<str:class_unique_code>',
+         views.ClassRosterView.as_view(), name='class_roster'),
+    path('/manager/timetable', views.ManagerTimetableView.as_view(),
+         name='manager_timetable'),
+    path('/manager/rollover', views.RolloverView.as_view(), name='rollover'),
     path('/manager/creaateschoolclass', views.CreateSchoolClassView.as_view(),
          name='create_school_class'),
     path('/manager/editschoolclass/<str:class_unique_code>',
@@ -18,6 +33,13 @@ urlpatterns = [
     path('/manager/activationschoolclass/<str:class_unique_code>',
          views.ActivationSchoolClassView.as_view(),
          name='activation_school_class'),
+    path('/manager/archiveschoolclass/<str:class_unique_code>',
+         views.ArchiveSchoolClassView.as_view(), name='archive_school_class'),
+    path('/manager/restoreschoolclass/<str:class_unique_code>',
+         views.RestoreSchoolClassView.as_view(), name='restore_school_class'),
+    path('/manager/archive/<str:class_unique_code>/'
+         '<str:subject_unique_code>', views.ArchivedSubjectView.as_view(),
+         name='archived_subject'),
     path('/manager/deactivationteacher/<str:teacher_user_id>',
          views.DeactivationTeacherView.as_view(),
          name='deactivation_teacher'),
@@ -26,6 +48,8 @@ urlpatterns = [
          name='activation_teacher'),
     path('/manager/addteacher', views.AddTeacherView.as_view(),
          name='add_teacher'),
+    path('/manager/editschoolclass/<str:class_unique_code>/import',
+         views.RosterImportView.as_view(), name='roster_import'),
     path('/manager/editschoolclass/<str:class_unique_code>/addsubject',
          views.AddSubjectView.as_view(), name='add_subject'),
     path('/manager/editstudent/<int:user_id>',
@@ -56,9 +80,12 @@ urlpatterns = [
     path('/teacher', views.TeacherPanelView.as_view(), name='teacher'),
     path('/teachersubject/<str:subject_unique_code>',
          views.TeacherSubjectView.as_view(), name='teacher_subject'),
+    path('/teachersubject/<str:subject_unique_code>/bulk',
+         views.TeacherBulkGradesView.as_view(), name='teacher_bulk_grades'),
     path('/timetable/<str:person>', views.TimetableView.as_view(),
          name='timetable'),
     path('/mailbox', views.MailboxView.as_view(), name='mailbox'),
+    path('/search', views.SearchView.as_view(), name='search'),
     path('/mailtext/<int:mailbox_id>/<int:mailbox_type>',
          views.MailTextView.as_view(), name='mail_text'),
     path('/studentparent', views.StudentParentView.as_view(),
@@ -69,4 +96,14 @@ urlpatterns = [
          views.CreateMessageView.as_view(), name='create_message'),
     path('/manager/student/<int:user_id>', views.ManagerStudentView.as_view(),
          name='manager_student'),
+    path('/api/v1/token', views.ApiTokenView.as_view(), name='api_token'),
+    path('/api/v1/subjects', views.ApiSubjectsView.as_view(),
+         name='api_subjects'),
+    path('/api/v1/grades', views.ApiGradesView.as_view(), name='api_grades'),
+    path('/api/v1/timetable/<str:person>', views.ApiTimetableView.as_view(),
+         name='api_timetable'),
+    path('/api/v1/mailbox/received', views.ApiReceivedView.as_view(),
+         name='api_received'),
+    path('/api/v1/mailbox/sent', views.ApiSentView.as_view(),
+         name='api_sent'),
 ]
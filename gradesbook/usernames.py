@@ -0,0 +1,70 @@
+from functools import reduce
+from operator import or_
+from django.contrib.auth.models import User
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+
+# Base names looked up by one query, SQLite limits the depth of the OR
+BASES_PER_QUERY = 100
+# Attempts to save under freshly allocated names when another request
+# took one of them between the lookup and the insert
+ATTEMPTS = 5
+
+
+def taken_usernames(bases, exclude_user_id=None):
+    """Returns the user names starting with any of bases."""
+    bases = list(bases)
+    taken = set()
+    for start in range(0, len(bases), BASES_PER_QUERY):
+        users = User.objects.filter(reduce(or_, [
+            Q(username__startswith=base) if base else Q(username='')
+            for base in bases[start:start + BASES_PER_QUERY]
+        ]))
+        if exclude_user_id is not None:
+            users = users.exclude(id=exclude_user_id)
+        taken.update(users.values_list('username', flat=True))
+    return taken
+
+
+def allocate_usernames(bases, exclude_user_id=None):
+    """
+    Returns a free user name for every base name, numbering repeated and
+    taken names like ІванСила, ІванСила2, ІванСила3... The user
+    exclude_user_id may keep its own name.
+    """
+    taken = taken_usernames(set(bases), exclude_user_id)
+    numbers = {}
+    usernames = []
+    for base in bases:
+        number = numbers.get(base, 1)
+        username = base
+        while username in taken:
+            number += 1
+            username = f'{base}{number}'
+        numbers[base] = number
+        taken.add(username)
+        usernames.append(username)
+    return usernames
+
+
+def claim_usernames(bases, save, exclude_user_id=None):
+    """
+    Allocates user names for bases and returns save(usernames), which
+    inserts or updates the users. A unique constraint conflict with a
+    concurrent request rolls save back and it is retried with new names.
+    """
+    for attempt in range(ATTEMPTS):
+        usernames = allocate_usernames(bases, exclude_user_id)
+        try:
+            with transaction.atomic():
+                return save(usernames)
+        except IntegrityError:
+            if attempt + 1 == ATTEMPTS:
+                raise
+
+
+def claim_username(base, save, exclude_user_id=None):
+    """claim_usernames for one user, save gets a single user name."""
+    return claim_usernames(
+        [base], lambda usernames: save(usernames[0]), exclude_user_id
+    )
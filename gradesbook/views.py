@@ -1,29 +1,62 @@
 from django.shortcuts import render, get_object_or_404, get_list_or_404
-from django.http import HttpResponseRedirect
+from django.http import (HttpResponse, HttpResponseBadRequest,
+                         HttpResponseRedirect)
 from django.urls import reverse
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.http import Http404
+from django.utils.decorators import method_decorator
 from django.views import View
+from django.views.decorators.csrf import csrf_exempt
 from django.views.generic import TemplateView, FormView
 from django.views.generic.edit import FormMixin, ProcessFormView
 from django.core.exceptions import FieldError, ObjectDoesNotExist
 from django.db import IntegrityError, transaction, DataError
-from django.core.paginator import Paginator
+from django.db.models import Count, IntegerField, Max, OuterRef, Subquery
+from django.db.models.functions import Coalesce
 from django.contrib.auth.models import Permission
 from django.contrib.contenttypes.models import ContentType
 from .models import *
 from .permissions import *
 from .forms import *
+from .grades import (add_grades, class_journal, grade_cards,
+                     read_grade_csv)
+from .archive import delete_subjects
+from .assets import static_response
+from . import api, stamps
+from .export import csv_response
+from .jobs import enqueue
+from .timetable import (DAYS, LESSONS, class_timetable, empty_grid,
+                        get_timetables, grid_lessons, teacher_timetable)
+from .mailing import SCHOOL_PARENTS, SCHOOL_STUDENTS, recipient_users
+from .pagination import KeysetPaginator
+from .roles import ROLES
+from .rollover import LAST_GRADE, RolloverError, plan_rollover, roll_over
+from .rollups import class_summaries, subject_summaries, weekly_trend
+from .search import available as search_available, search_mail, search_people
+from .roster import COLUMNS, RosterFormatError, import_roster
+from .usernames import claim_username
+
+
+def count_related(queryset, field):
+    # Correlated COUNT(*) subquery of queryset rows pointing at the outer row
+    return Coalesce(
+        Subquery(
+            queryset.filter(**{field: OuterRef('pk')}).order_by().values(
+                field
+            ).annotate(total=Count('pk')).values('total'),
+            output_field=IntegerField()
+        ),
+        0
+    )
+
 
 class BaseView(TemplateView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        unread = MailboxReceived.objects.filter(
-            recipient__user=self.request.user,
-            read=False
+        context['unread'] = UnreadCounter.objects.unread_for(
+            self.request.user
         )
-        context['unread'] = len(unread)
         try:
             context['username'] = self.request.session['user']
         except KeyError:
@@ -31,6 +64,23 @@ class BaseView(TemplateView):
         return context
 
 
+class StampedView(BaseView):
+    """
+    A page answering a repeat visit with 304 Not Modified, without its
+    queries, while the stamps of stamp_keys() have not changed.
+    """
+
+    def stamp_keys(self):
+        return []
+
+    def get(self, request, *args, **kwargs):
+        return stamps.conditional(request, self.stamp_keys(), self.respond,
+                                  *args, **kwargs)
+
+    def respond(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+
+
 class HomepageView(FormView):
     template_name = 'gradesbook/homepage.html'
     form_class = LoginForm
@@ -42,14 +92,14 @@ class HomepageView(FormView):
             return self.render_to_response(self.get_context_data())
 
     def get_success_url(self):
-        user_permission = list(self.request.user.get_all_permissions())[0]
-        if user_permission == 'gradesbook.student':
+        role = self.request.role
+        if role == 'student':
             return reverse('gradesbook:student_parent')
-        elif user_permission == 'gradesbook.parent':
+        elif role == 'parent':
             return reverse('gradesbook:student_parent')
-        elif user_permission == 'gradesbook.teacher':
+        elif role == 'teacher':
             return reverse('gradesbook:teacher')
-        elif user_permission == 'gradesbook.manager':
+        elif role == 'manager':
             return reverse('gradesbook:manager')
         else:
             raise ValueError("Unknown permission")
@@ -93,41 +143,19 @@ class FirstLoginView(LoginRequiredMixin, UserPassesTestMixin, ProcessFormView,
                      FormMixin, BaseView):
     template_name = 'gradesbook/firstlogin.html'
     form_class = FirstLoginForm
-    permission = {
-        'gradesbook.student': Student,
-        'gradesbook.parent': Parent,
-        'gradesbook.teacher': Teacher
-    }
 
     def test_func(self):
-        test = False
-        if self.request.user.has_perm('gradesbook.student') \
-                or self.request.user.has_perm('gradesbook.parent') \
-                or self.request.user.has_perm('gradesbook.teacher'):
-            test = True
-        return test
+        return self.request.role in {'student', 'parent', 'teacher'}
 
     def get_success_url(self):
-        user_permission = list(self.request.user.get_all_permissions())[0]
-        if user_permission == 'gradesbook.student':
-            self.request.session['user'] = get_object_or_404(
-                Student,
-                user=self.request.user
-            ).__str__()
-            return reverse('gradesbook:student_parent')
-        elif user_permission == 'gradesbook.parent':
-            self.request.session['user'] = get_object_or_404(
-                Parent,
-                user=self.request.user
-            ).__str__()
+        role = self.request.role
+        if role in {'student', 'parent'}:
+            self.request.session['user'] = str(self.request.person)
             return reverse('gradesbook:student_parent')
-        elif user_permission == 'gradesbook.teacher':
-            self.request.session['user'] = get_object_or_404(
-                Teacher,
-                user=self.request.user
-            ).__str__()
+        elif role == 'teacher':
+            self.request.session['user'] = str(self.request.person)
             return reverse('gradesbook:teacher')
-        elif user_permission == 'gradesbook.manager':
+        elif role == 'manager':
             self.request.session['user'] = self.request.user.username
             return reverse('gradesbook:manager')
         else:
@@ -166,11 +194,7 @@ class FirstLoginView(LoginRequiredMixin, UserPassesTestMixin, ProcessFormView,
                     'gradesbook/firstlogin.html',
                     {'form': form, 'pass_no_confirm': True, }
                 )
-            user_permission = list(self.request.user.get_all_permissions())[0]
-            person = get_object_or_404(
-                self.permission[user_permission],
-                user=user
-            )
+            person = self.request.person
             person.first_login = False
             person.save()
         return super().form_valid(form)
@@ -182,7 +206,7 @@ class ManagerPanelView(LoginRequiredMixin, UserPassesTestMixin, BaseView):
     inactive_teachers = None
 
     def test_func(self):
-        return self.request.user.has_perm('gradesbook.manager')
+        return self.request.role == 'manager'
 
     def post(self, request, **kwargs):
         try:
@@ -211,31 +235,53 @@ class ManagerPanelView(LoginRequiredMixin, UserPassesTestMixin, BaseView):
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
+        # Only per-class summaries are shown, rosters are loaded on demand
+        # from ClassRosterView
         context['classes'] = SchoolClass.objects.filter(
             active=True
+        ).annotate(
+            student_count=count_related(Student.objects.listed(),
+                                        'school_class'),
+            subject_count=count_related(Subject.objects, 'school_class'),
+            parents_first_login=count_related(
+                Parent.objects.filter(first_login=True),
+                'student__school_class'
+            )
         ).order_by('name')
         context['ia_classes'] = self.inactive_school_classes
-
-        students = {}
-        for my_class in context['classes']:
-            all_students = Student.objects.filter(school_class=my_class)
-            students[my_class] = all_students
-        context['students'] = students
-
         context['teachers'] = Teacher.objects.filter(
             active=True
-        ).order_by('name')
+        ).select_related('user').order_by('name')
         context['ia_teachers'] = self.inactive_teachers
         return context
 
 
+class ClassRosterView(LoginRequiredMixin, UserPassesTestMixin, TemplateView):
+    template_name = 'gradesbook/managerclassroster.html'
+
+    def test_func(self):
+        return self.request.role == 'manager'
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['students'] = Student.objects.listed().filter(
+            school_class__unique_code=self.kwargs['class_unique_code']
+        ).annotate(
+            parents_first_login=count_related(
+                Parent.objects.filter(first_login=True),
+                'student'
+            )
+        ).order_by('surname', 'name')
+        return context
+
+
 class CreateSchoolClassView(LoginRequiredMixin, UserPassesTestMixin,
                             ProcessFormView, FormMixin, BaseView):
     template_name = 'gradesbook/managercreateschoolclass.html'
     form_class = SchoolClassForm
 
     def test_func(self):
-        return self.request.user.has_perm('gradesbook.manager')
+        return self.request.role == 'manager'
 
     def get_success_url(self):
         return reverse('gradesbook:manager')
@@ -249,25 +295,68 @@ class CreateSchoolClassView(LoginRequiredMixin, UserPassesTestMixin,
         return super().form_valid(form)
 
 
+class RolloverView(LoginRequiredMixin, UserPassesTestMixin, BaseView):
+    """
+    Previews and carries out the promotion of the active classes of a
+    year to the next one, see gradesbook.rollover.
+    """
+    template_name = 'gradesbook/managerrollover.html'
+
+    def test_func(self):
+        return self.request.role == 'manager'
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        form = kwargs.get('form')
+        if form is None:
+            # The year of the newest active classes by default
+            year = self.request.GET.get('year') or \
+                SchoolClass.objects.filter(active=True).aggregate(
+                    year=Max('year')
+                )['year']
+            form = RolloverForm({'year': year}) if year else RolloverForm()
+        context['form'] = form
+        context['last_grade'] = LAST_GRADE
+        if form.is_valid():
+            context['plan'] = plan_rollover(form.cleaned_data['year'])
+        return context
+
+    def post(self, request, **kwargs):
+        form = RolloverForm(request.POST)
+        if form.is_valid():
+            try:
+                roll_over(form.cleaned_data['year'])
+            except RolloverError as error:
+                return self.render_to_response(self.get_context_data(
+                    form=form, error=str(error)
+                ))
+            return HttpResponseRedirect(reverse('gradesbook:manager'))
+        return self.render_to_response(self.get_context_data(form=form))
+
+
 class EditSchoolClassView(LoginRequiredMixin, UserPassesTestMixin,
                           ProcessFormView, FormMixin, BaseView):
     template_name = 'gradesbook/managereditschoolclass.html'
     form_class = CreateStudentForm
 
     def test_func(self):
-        return self.request.user.has_perm('gradesbook.manager')
+        return self.request.role == 'manager'
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['students'] = Student.objects.filter(
+        context['students'] = Student.objects.listed().filter(
             school_class__unique_code=self.kwargs['class_unique_code']
-        ).order_by('surname')
+        ).select_related('user').order_by('surname')
         school_class = get_object_or_404(
             SchoolClass,
             unique_code=self.kwargs['class_unique_code']
         )
         context['current_class'] = school_class
         context['subjects'] = Subject.objects.filter(school_class=school_class)
+        if school_class.archived:
+            context['archived_subjects'] = ArchivedSubject.objects.filter(
+                school_class=school_class
+            ).order_by('name')
         return context
 
     def get_success_url(self):
@@ -297,24 +386,13 @@ class EditSchoolClassView(LoginRequiredMixin, UserPassesTestMixin,
             name = 'second_parent_name'
             surname = 'second_parent_surname'
 
-        username = form.cleaned_data[name] + form.cleaned_data[surname]
-        if not User.objects.filter(username=username).exists():
-            user = User.objects.create_user(
+        user = claim_username(
+            form.cleaned_data[name] + form.cleaned_data[surname],
+            lambda username: User.objects.create_user(
                 username=username,
                 password=username + prefix
             )
-        else:
-            numbering = 2
-            while True:
-                new_username = f'{username}{numbering}'
-                if not User.objects.filter(username=new_username).exists():
-                    user = User.objects.create_user(
-                        username=new_username,
-                        password=f'{new_username}{prefix}'
-                    )
-                    break
-                else:
-                    numbering += 1
+        )
         # Add permission
         content_type = ContentType.objects.get_for_model(RightsSupport)
         permission = Permission.objects.get(
@@ -370,7 +448,7 @@ class EditSchoolClassView(LoginRequiredMixin, UserPassesTestMixin,
 class DeactivationSchoolClassView(LoginRequiredMixin, UserPassesTestMixin,
                                   View):
     def test_func(self):
-        return self.request.user.has_perm('gradesbook.manager')
+        return self.request.role == 'manager'
 
     def post(self, request, **kwargs):
         current_class = get_object_or_404(
@@ -387,10 +465,56 @@ class DeactivationSchoolClassView(LoginRequiredMixin, UserPassesTestMixin,
         )
 
 
+class ArchiveSchoolClassView(LoginRequiredMixin, UserPassesTestMixin, View):
+    """Queues the move of an inactive class to the archive tables."""
+
+    def test_func(self):
+        return self.request.role == 'manager'
+
+    def post(self, request, **kwargs):
+        current_class = get_object_or_404(
+            SchoolClass,
+            unique_code=kwargs['class_unique_code'],
+            active=False
+        )
+        SchoolClass.objects.filter(pk=current_class.pk).update(archived=True)
+        enqueue('archive_class', school_class_id=current_class.pk)
+        return HttpResponseRedirect(
+            reverse(
+                'gradesbook:edit_school_class',
+                kwargs={'class_unique_code': kwargs['class_unique_code']}
+            )
+        )
+
+
+class RestoreSchoolClassView(LoginRequiredMixin, UserPassesTestMixin, View):
+    """
+    Queues the move of an archived class back to the live tables. Jobs
+    still archiving it stop at their next chunk.
+    """
+
+    def test_func(self):
+        return self.request.role == 'manager'
+
+    def post(self, request, **kwargs):
+        current_class = get_object_or_404(
+            SchoolClass,
+            unique_code=kwargs['class_unique_code']
+        )
+        SchoolClass.objects.filter(pk=current_class.pk).update(archived=False)
+        enqueue('restore_class', school_class_id=current_class.pk)
+        return HttpResponseRedirect(
+            reverse(
+                'gradesbook:edit_school_class',
+                kwargs={'class_unique_code': kwargs['class_unique_code']}
+            )
+        )
+
+
 class DeactivationTeacherView(LoginRequiredMixin, UserPassesTestMixin, View):
 
     def test_func(self):
-        return self.request.user.has_perm('gradesbook.manager')
+        return self.request.role == 'manager'
 
     def get(self, request, **kwargs):
         teacher = get_object_or_404(
@@ -404,12 +528,14 @@ class DeactivationTeacherView(LoginRequiredMixin, UserPassesTestMixin, View):
 
 class ActivationSchoolClassView(LoginRequiredMixin, UserPassesTestMixin, View):
     def test_func(self):
-        return self.request.user.has_perm('gradesbook.manager')
+        return self.request.role == 'manager'
 
     def post(self, request, **kwargs):
+        # An archived class is restored before it is activated
         current_class = get_object_or_404(
             SchoolClass,
-            unique_code=kwargs['class_unique_code']
+            unique_code=kwargs['class_unique_code'],
+            archived=False
         )
         current_class.active = True
         current_class.save()
@@ -423,7 +549,7 @@ class ActivationSchoolClassView(LoginRequiredMixin, UserPassesTestMixin, View):
 
 class ActivationTeacherView(LoginRequiredMixin, UserPassesTestMixin, View):
     def test_func(self):
-        return self.request.user.has_perm('gradesbook.manager')
+        return self.request.role == 'manager'
 
     def get(self, request, **kwargs):
         teacher = get_object_or_404(
@@ -437,22 +563,18 @@ class ActivationTeacherView(LoginRequiredMixin, UserPassesTestMixin, View):
 
 class DeleteStudentView(LoginRequiredMixin, UserPassesTestMixin, View):
     def test_func(self):
-        return self.request.user.has_perm('gradesbook.manager')
+        return self.request.role == 'manager'
 
     def get(self, request, **kwargs):
-        student = get_object_or_404(Student, user__id=kwargs['user_id'])
+        student = get_object_or_404(Student.objects.listed(),
+                                    user__id=kwargs['user_id'])
         parents = get_list_or_404(Parent, student=student)
         class_unique_code = student.school_class.unique_code
-
-        parent_user = parents[0].user
-        parent_user.delete()
-        try:
-            parent_user = parents[1].user
-            parent_user.delete()
-        except IndexError:
-            pass
-        student_user = student.user
-        student_user.delete()
+        user_ids = [parent.user_id for parent in parents] + [student.user_id]
+        # Grades and mail of the pupil are removed with the users by the
+        # background worker, until then they are hidden and signed out
+        User.objects.filter(id__in=user_ids).update(is_active=False)
+        enqueue('delete_users', user_ids=user_ids)
 
         return HttpResponseRedirect(
             reverse(
@@ -468,45 +590,26 @@ class AddTeacherView(LoginRequiredMixin, UserPassesTestMixin, ProcessFormView,
     form_class = CreateTeacherForm
 
     def test_func(self):
-        return self.request.user.has_perm('gradesbook.manager')
+        return self.request.role == 'manager'
 
     def get_success_url(self):
         return reverse('gradesbook:manager')
 
     def form_valid(self, form):
         # Method is called only when data is valid
-        username = form.cleaned_data['name'] + form.cleaned_data['surname']
-        if not User.objects.filter(username=username).exists():
-            user = User.objects.create_user(
+        user = claim_username(
+            form.cleaned_data['name'] + form.cleaned_data['surname'],
+            lambda username: User.objects.create_user(
                 username=username,
                 password=f'{username}234'
             )
-            content_type = ContentType.objects.get_for_model(RightsSupport)
-            permission = Permission.objects.get(
-                content_type=content_type,
-                codename='teacher'
-            )
-            user.user_permissions.add(permission)
-        else:
-            numbering = 2
-            while True:
-                new_username = username + str(numbering)
-                if not User.objects.filter(username=new_username).exists():
-                    user = User.objects.create_user(
-                        username=new_username,
-                        password=f'{new_username}123'
-                    )
-                    content_type = ContentType.objects.get_for_model(
-                        RightsSupport
-                    )
-                    permission = Permission.objects.get(
-                        content_type=content_type,
-                        codename='teacher'
-                    )
-                    user.user_permissions.add(permission)
-                    break
-                else:
-                    numbering += 1
+        )
+        content_type = ContentType.objects.get_for_model(RightsSupport)
+        permission = Permission.objects.get(
+            content_type=content_type,
+            codename='teacher'
+        )
+        user.user_permissions.add(permission)
         user.first_name = form.cleaned_data['name']
         user.last_name = form.cleaned_data['surname']
         with transaction.atomic():
@@ -526,7 +629,7 @@ class AddSubjectView(LoginRequiredMixin, UserPassesTestMixin, ProcessFormView,
     form_class = CreateSubjectForm
 
     def test_func(self):
-        return self.request.user.has_perm('gradesbook.manager')
+        return self.request.role == 'manager'
 
     def get_success_url(self):
         return reverse(
@@ -549,8 +652,10 @@ class AddSubjectView(LoginRequiredMixin, UserPassesTestMixin, ProcessFormView,
                     name=form.cleaned_data['name'],
                     unique_code=f'{form.cleaned_data["shortcut"]}'
                                 f'{self.kwargs["class_unique_code"]}',
-                    school_class=SchoolClass.objects.get(
-                        unique_code=self.kwargs['class_unique_code']
+                    school_class=get_object_or_404(
+                        SchoolClass,
+                        unique_code=self.kwargs['class_unique_code'],
+                        archived=False
                     )
                 )
                 subject.save()
@@ -580,7 +685,7 @@ class ManagerSubjectView(LoginRequiredMixin, UserPassesTestMixin,
     form_class = AddSubjectDateForm
 
     def test_func(self):
-        return self.request.user.has_perm('gradesbook.manager')
+        return self.request.role == 'manager'
 
     def get_success_url(self):
         return reverse(
@@ -603,49 +708,38 @@ class ManagerSubjectView(LoginRequiredMixin, UserPassesTestMixin,
         )
         context['subject'] = subject
         context['class'] = school_class
-        subject_dates = SubjectDate.objects.filter(subject=subject)
-        dates = [[False for days in range(1, 7)] for lessons in range(1, 9)]
-        for subject_date in subject_dates:
-            iteration = -1
-            for day in ['Mo', 'Tu', 'We', 'Th', 'Fr', 'St']:
-                iteration += 1
-                if subject_date.day == day:
-                    break
-            dates[subject_date.lesson_number - 1][iteration] = True
-        context['dates'] = dates
+        context['dates'] = [
+            [any(lesson.subject_id == subject.id for lesson in cell)
+             for cell in row]
+            for row in class_timetable(subject.school_class_id)
+        ]
 
         try:
             subject_teachers = SubjectTeachers.objects.get(subject=subject)
             context['teachers'] = subject_teachers.teacher.all()
         except SubjectTeachers.DoesNotExist:
             context['teachers'] = None
+        history = ('student__school_class', 'subject')
         grades = Grades.objects.filter(
             subject=subject,
             manager_mode=False
-        ).order_by('date')
+        ).select_related(*history)
         manager_grades = Grades.objects.filter(
             subject=subject,
             manager_mode=True
-        ).order_by('date')
+        ).select_related(*history)
         manager_canceled_grades = CanceledGrades.objects.filter(
             subject=subject
-        ).order_by('date')
-        paginator_grades = Paginator(grades, 10)
-        paginator_manager_grades = Paginator(manager_grades, 10)
-        paginator_manager_canceled_grades = Paginator(
-            manager_canceled_grades,
-            10
-        )
-        context['grades'] = paginator_grades.get_page(
-            self.request.GET.get('page1')
-        )
-        context['manager_grades'] = paginator_manager_grades.get_page(
-            self.request.GET.get('page2')
+        ).select_related(*history)
+        history_pages = (
+            ('grades', grades, 'page1'),
+            ('manager_grades', manager_grades, 'page2'),
+            ('manager_canceled_grades', manager_canceled_grades, 'page3'),
         )
-        context['manager_canceled_grades'] = \
-            paginator_manager_canceled_grades.get_page(
-                self.request.GET.get('page3')
-            )
+        for name, queryset, parameter in history_pages:
+            context[name] = KeysetPaginator(
+                queryset, 10, ordering=('date', 'id')
+            ).get_page(self.request.GET.get(parameter))
         if 'exist' in self.kwargs:
             context['exist'] = self.kwargs['exist']
         return context
@@ -672,15 +766,58 @@ class ManagerSubjectView(LoginRequiredMixin, UserPassesTestMixin,
         return super().form_valid(form)
 
 
+class ArchivedSubjectView(LoginRequiredMixin, UserPassesTestMixin, BaseView):
+    """Read-only timetable, teachers and grades of an archived subject."""
+    template_name = 'gradesbook/managerarchivedsubject.html'
+
+    def test_func(self):
+        return self.request.role == 'manager'
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        subject = get_object_or_404(
+            ArchivedSubject.objects.select_related('school_class'),
+            unique_code=self.kwargs['subject_unique_code'],
+            school_class__unique_code=self.kwargs['class_unique_code']
+        )
+        context['subject'] = subject
+        context['class'] = subject.school_class
+        context['teachers'] = subject.teachers.order_by('surname', 'name')
+        context['dates'] = subject.archivedsubjectdate_set.order_by(
+            'day', 'lesson_number'
+        )
+        rows = {}
+        for model, key in ((ArchivedGrade, 'grades'),
+                           (ArchivedCanceledGrade, 'canceled')):
+            for grade in model.objects.filter(subject=subject).select_related(
+                'student'
+            ).order_by('date', 'id'):
+                row = rows.setdefault(grade.student_id, {
+                    'student': grade.student, 'grades': [], 'canceled': []
+                })
+                row[key].append(grade)
+        context['rows'] = sorted(
+            rows.values(),
+            key=lambda row: (row['student'].surname, row['student'].name)
+        )
+        return context
+
+
 class DeleteSubjectDateView(LoginRequiredMixin, UserPassesTestMixin, View):
     def test_func(self):
-        return self.request.user.has_perm('gradesbook.manager')
+        return self.request.role == 'manager'
 
     def get(self, request, **kwargs):
-        days = ['Mo', 'Tu', 'We', 'Th', 'Fr', 'St']
-        day = days[kwargs['day'] - 1]
-        lesson = kwargs['lesson']
-        date = get_object_or_404(SubjectDate, lesson_number=lesson, day=day)
+        try:
+            day = DAYS[kwargs['day'] - 1]
+        except IndexError:
+            raise Http404('Wrong day.')
+        date = get_object_or_404(
+            SubjectDate.objects.select_related('subject'),
+            subject__unique_code=kwargs['subject_unique_code'],
+            lesson_number=kwargs['lesson'],
+            day=day
+        )
         date.delete()
         return HttpResponseRedirect(
             reverse(
@@ -693,68 +830,140 @@ class DeleteSubjectDateView(LoginRequiredMixin, UserPassesTestMixin, View):
         )
 
 
-class TimetableView(LoginRequiredMixin, UserPassesTestMixin, BaseView):
+class TimetableMixin:
+    """The timetable of the pupil's class or of the teacher of a request."""
+
+    def stamp_keys(self):
+        if self.kwargs['person'] == 'student' and self.request.student_id:
+            return [stamps.CLASS.format(self.request.school_class_id)]
+        return [stamps.TEACHERS]
+
+    def timetable(self):
+        if self.kwargs['person'] == 'student' and self.request.student_id:
+            return class_timetable(self.request.school_class_id)
+        elif self.kwargs['person'] == 'teacher' and \
+                self.request.role == 'teacher':
+            return teacher_timetable(self.request.user.id)
+        raise Http404('Unknown timetable.')
+
+
+class TimetableView(LoginRequiredMixin, UserPassesTestMixin, TimetableMixin,
+                    StampedView):
     template_name = 'gradesbook/timetable.html'
 
     def test_func(self):
-        test = False
-        if self.request.user.has_perm('gradesbook.student') or \
-                self.request.user.has_perm('gradesbook.parent') or \
-                self.request.user.has_perm('gradesbook.teacher'):
-            test = True
-        return test
+        return self.request.role in {'student', 'parent', 'teacher'}
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['person'] = self.kwargs['person']
-        if self.kwargs['person'] == 'student':
-            try:
-                student = Student.objects.get(user=self.request.user)
-            except Student.DoesNotExist:
-                student = get_list_or_404(
-                    Parent,
-                    user=self.request.user
-                )[0].student
-            subjects = Subject.objects.filter(
-                school_class=student.school_class
-            )
+        context['dates'] = self.timetable()
+        return context
 
-        elif self.kwargs['person'] == 'teacher':
-            teacher = get_object_or_404(Teacher, user=self.request.user)
-            subject_teacher = SubjectTeachers.objects.filter(
-                teacher=teacher,
-                subject__school_class__active=True
-            )
-            subjects = [subject.subject for subject in subject_teacher]
 
-        all_subject_dates = {}
-        for subject in subjects:
-            all_subject_dates[subject] = SubjectDate.objects.filter(
-                subject=subject,
-            )
-        dates = [[False for days in range(1, 7)] for lessons in range(1, 9)]
-
-        for subject_dates in all_subject_dates.values():
-            for subject_date in subject_dates:
-                iteration = -1
-                for day in ['Mo', 'Tu', 'We', 'Th', 'Fr', 'St']:
-                    iteration += 1
-                    if subject_date.day == day:
-                        break
-                dates[subject_date.lesson_number - 1][iteration] = \
-                    subject_date.subject
-        context['dates'] = dates
+class ManagerTimetableView(LoginRequiredMixin, UserPassesTestMixin, BaseView):
+    template_name = 'gradesbook/managertimetable.html'
 
+    def test_func(self):
+        return self.request.role == 'manager'
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        timetables = get_timetables()
+        days = []
+        for column, (day, day_name) in enumerate(SubjectDate.DAYS):
+            rows = []
+            for class_id, name, unique_code in timetables.active_classes:
+                grid = timetables.classes.get(class_id) or empty_grid()
+                rows.append((name, unique_code, [row[column] for row in grid]))
+            days.append((day_name, rows))
+        context['days'] = days
+        context['lessons'] = range(1, LESSONS + 1)
+        return context
+
+
+class ManagerAnalyticsView(LoginRequiredMixin, UserPassesTestMixin, BaseView):
+    """
+    Averages and grade distributions of the active classes, and of the
+    subjects and recent weeks of one of them. Only the rollups are read.
+    """
+    template_name = 'gradesbook/manageranalytics.html'
+
+    def test_func(self):
+        return self.request.role == 'manager'
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        classes = class_summaries()
+        context['classes'] = classes
+        code = self.request.GET.get('class') or \
+            next((row.key for row in classes), None)
+        if code is not None:
+            school_class = get_object_or_404(SchoolClass, unique_code=code)
+            context['current_class'] = school_class
+            context['subjects'] = subject_summaries(school_class)
+            context['weeks'] = weekly_trend(school_class)
         return context
 
 
+class GradesExportView(LoginRequiredMixin, UserPassesTestMixin, View):
+    """
+    Streams the grades of the school, a class, a subject or a pupil as a
+    CSV file, between the optional ?start= and ?end= dates.
+    """
+
+    def test_func(self):
+        return self.request.role == 'manager'
+
+    def get(self, request, **kwargs):
+        form = ExportForm(request.GET)
+        if not form.is_valid():
+            return HttpResponseBadRequest('Невірна дата.')
+        grades = Grades.objects.all()
+        name = 'school'
+        if 'class_unique_code' in kwargs:
+            school_class = get_object_or_404(
+                SchoolClass, unique_code=kwargs['class_unique_code']
+            )
+            grades = grades.filter(subject__school_class=school_class)
+            name = school_class.unique_code
+        elif 'subject_unique_code' in kwargs:
+            subject = get_object_or_404(
+                Subject, unique_code=kwargs['subject_unique_code']
+            )
+            grades = grades.filter(subject=subject)
+            name = subject.unique_code
+        elif 'user_id' in kwargs:
+            student = get_object_or_404(
+                Student.objects.select_related('user'), pk=kwargs['user_id']
+            )
+            grades = grades.filter(student=student)
+            name = student.user.username
+        for bound, lookup in (('start', 'date__gte'), ('end', 'date__lte')):
+            date = form.cleaned_data[bound]
+            if date:
+                grades = grades.filter(**{lookup: date})
+                name += f'-{date}'
+        return csv_response(grades, f'grades-{name}.csv')
+
+
+class StaticView(View):
+    """
+    Serves the collected static files and the built bundles, precompressed
+    and cached by the browser.
+    """
+
+    def get(self, request, path):
+        return static_response(request, path)
+
+
 class ManagerStudentView(LoginRequiredMixin, UserPassesTestMixin,
                          ProcessFormView, FormMixin, BaseView):
     template_name = 'gradesbook/managerstudent.html'
     form_class = AddGradeForm
 
     def test_func(self):
-        return self.request.user.has_perm('gradesbook.manager')
+        return self.request.role == 'manager'
 
     def get_success_url(self):
         return reverse(
@@ -765,11 +974,11 @@ class ManagerStudentView(LoginRequiredMixin, UserPassesTestMixin,
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         student = get_object_or_404(
-            Student,
+            Student.objects.listed().select_related('school_class'),
             user__id=self.kwargs['user_id']
         )
         context['student'] = student
-        parents = Parent.objects.filter(student=student)
+        parents = Parent.objects.filter(student=student).select_related('user')
 
         parents_active = {}
         for parent in parents:
@@ -779,17 +988,7 @@ class ManagerStudentView(LoginRequiredMixin, UserPassesTestMixin,
                 parents_active[parent] = None
 
         context['parents_active'] = parents_active
-        subjects = Subject.objects.filter(
-            school_class=student.school_class
-        )
-
-        subject_grades = {}
-        for subject in subjects:
-            subject_grades[subject] = Grades.objects.filter(
-                subject=subject,
-                student=student
-            )
-        context['subject_grades'] = subject_grades
+        context['cards'] = grade_cards(student)
         context['invalid'] = self.get_second_form()
 
         try:
@@ -826,23 +1025,14 @@ class ManagerStudentView(LoginRequiredMixin, UserPassesTestMixin,
                 student=grade.student
             )
             canceled_grade.save()
-            with transaction.atomic():
-                message = Message(
-                    subject='Оцінку відмінено',
-                    text=f'Твою оцінку ({grade.grade}) з предмету {grade.subject.name} '
-                         f'було відмінено.'
-                )
-                message.save()
-                sender = Sender(user=self.request.user, message=message)
-                sender.save()
-                recipient = Recipient(user=grade.student.user, message=message)
-                recipient.save()
-                mailbox_received = MailboxReceived(
-                    sender=sender,
-                    recipient=recipient,
-                    message=message
-                )
-                mailbox_received.save()
+            enqueue(
+                'send_message',
+                sender_id=self.request.user.id,
+                subject='Оцінку відмінено',
+                text=f'Твою оцінку ({grade.grade}) з предмету '
+                     f'{grade.subject.name} було відмінено.',
+                user_ids=[grade.student.user_id]
+            )
             grade.delete()
             self.kwargs['del'] = True
         form = AddGradeForm()
@@ -864,28 +1054,14 @@ class ManagerStudentView(LoginRequiredMixin, UserPassesTestMixin,
             raise Http404(
                 "There was a problem with grade saving. Try again later"
             )
-        try:
-            message = Message(
-                subject='Нова оцінка',
-                text=f'Введена нова оцінка з предмету {subject.name}. '
-                     f'Твоя оцінка {grade.grade}.',
-            )
-            with transaction.atomic():
-                message.save()
-                sender = Sender(user=self.request.user, message=message)
-                sender.save()
-                recipient = Recipient(user=student.user, message=message)
-                recipient.save()
-                mailbox_received = MailboxReceived(
-                    sender=sender,
-                    recipient=recipient,
-                    message=message
-                )
-                mailbox_received.save()
-        except FieldError:
-            raise Http404(
-                "There was a problem sending messages about new grade"
-            )
+        enqueue(
+            'send_message',
+            sender_id=self.request.user.id,
+            subject='Нова оцінка',
+            text=f'Введена нова оцінка з предмету {subject.name}. '
+                 f'Твоя оцінка {grade.grade}.',
+            user_ids=[student.user_id]
+        )
         return super().form_valid(form)
 
 
@@ -894,33 +1070,35 @@ class ManagerGradesHistoryView(LoginRequiredMixin, UserPassesTestMixin,
     template_name = 'gradesbook/managerhistory.html'
 
     def test_func(self):
-        return self.request.user.has_perm('gradesbook.manager')
+        return self.request.role == 'manager'
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        grades = Grades.objects.filter(manager_mode=True)
-        canceled_grades = CanceledGrades.objects.all()
-
-        paginator_grades = Paginator(grades, 10)
-        paginator_canceled_grades = Paginator(canceled_grades, 10)
-        context['grades'] = paginator_grades.get_page(
-            self.request.GET.get('page1')
-        )
-        context['canceled_grades'] = paginator_canceled_grades.get_page(
-            self.request.GET.get('page2')
-        )
+        history = ('student__school_class', 'subject')
+        grades = Grades.objects.filter(
+            manager_mode=True
+        ).select_related(*history)
+        canceled_grades = CanceledGrades.objects.select_related(*history)
+
+        context['grades'] = KeysetPaginator(
+            grades, 10, ordering=('date', 'id')
+        ).get_page(self.request.GET.get('page1'))
+        context['canceled_grades'] = KeysetPaginator(
+            canceled_grades, 10, ordering=('date', 'id')
+        ).get_page(self.request.GET.get('page2'))
         return context
 
 
 class DeleteSubjectView(LoginRequiredMixin, UserPassesTestMixin, View):
     def test_func(self):
-        return self.request.user.has_perm('gradesbook.manager')
+        return self.request.role == 'manager'
 
     def get(self, request, **kwargs):
         subject = get_object_or_404(
             Subject, unique_code=self.kwargs['subject_unique_code']
         )
-        subject.delete()
+        # A fixed number of statements, whatever the number of grades
+        delete_subjects([subject.id])
         return HttpResponseRedirect(
             reverse(
                 'gradesbook:edit_school_class',
@@ -931,7 +1109,7 @@ class DeleteSubjectView(LoginRequiredMixin, UserPassesTestMixin, View):
 
 class DeleteSubjectTeacherView(LoginRequiredMixin, UserPassesTestMixin, View):
     def test_func(self):
-        return self.request.user.has_perm('gradesbook.manager')
+        return self.request.role == 'manager'
 
     def get(self, request, **kwargs):
         teacher = Teacher.objects.get(user__id=self.kwargs['teacher_user_id'])
@@ -950,7 +1128,7 @@ class DeleteSubjectTeacherView(LoginRequiredMixin, UserPassesTestMixin, View):
 
 class ManagerDeleteTeacherView(LoginRequiredMixin, UserPassesTestMixin, View):
     def test_func(self):
-        return self.request.user.has_perm('gradesbook.manager')
+        return self.request.role == 'manager'
 
     def get(self, request, **kwargs):
         teacher = Teacher.objects.get(user__id=self.kwargs['teacher_user_id'])
@@ -961,31 +1139,20 @@ class ManagerDeleteTeacherView(LoginRequiredMixin, UserPassesTestMixin, View):
 
 class ManagerResetUserView(LoginRequiredMixin, UserPassesTestMixin, View):
     def test_func(self):
-        return self.request.user.has_perm('gradesbook.manager')
+        return self.request.role == 'manager'
 
     def get(self, request, **kwargs):
         user = get_object_or_404(User, id=self.kwargs['user_id'])
-        username = user.first_name + user.last_name
-        try:
-            existing_user = User.objects.get(username=username)
-            if existing_user.id == user.id:
-                user.set_password(username + str(self.kwargs['prefix']))
-            else:
-                numbering = 2
-                while True:
-                    new_username = username + str(numbering)
-                    if not User.objects.filter(username=new_username).exists():
-                        user.username = new_username
-                        user.set_password(
-                            new_username + str(self.kwargs['prefix'])
-                        )
-                        break
-                    numbering += 1
-        except User.DoesNotExist:
+
+        def save(username):
             user.username = username
             user.set_password(username + str(self.kwargs['prefix']))
-        with transaction.atomic():
             user.save()
+
+        with transaction.atomic():
+            # The user keeps its name when it is still the first free one
+            claim_username(user.first_name + user.last_name, save,
+                           exclude_user_id=user.id)
             if self.kwargs['prefix'] == 123:
                 student = get_object_or_404(Student, user=user)
                 student.first_login = True
@@ -1007,7 +1174,7 @@ class ManagerTeacherEditView(LoginRequiredMixin, UserPassesTestMixin,
     form_class = CreateTeacherForm
 
     def test_func(self):
-        return self.request.user.has_perm('gradesbook.manager')
+        return self.request.role == 'manager'
 
     def get_success_url(self):
         return reverse('gradesbook:manager_teacher', kwargs={
@@ -1045,7 +1212,7 @@ class ManagerStudentEditView(LoginRequiredMixin, UserPassesTestMixin,
     form_class = CreateStudentForm
 
     def test_func(self):
-        return self.request.user.has_perm('gradesbook.manager')
+        return self.request.role == 'manager'
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -1054,7 +1221,7 @@ class ManagerStudentEditView(LoginRequiredMixin, UserPassesTestMixin,
 
     def get_initial(self):
         student = get_object_or_404(
-            Student,
+            Student.objects.listed(),
             user__id=self.kwargs['user_id']
         )
         self.kwargs['student'] = student
@@ -1116,7 +1283,7 @@ class AddSubjectTeacherView(LoginRequiredMixin, UserPassesTestMixin,
     form_class = AddSubjectTeacherForm
 
     def test_func(self):
-        return self.request.user.has_perm('gradesbook.manager')
+        return self.request.role == 'manager'
 
     def get_success_url(self):
         return reverse(
@@ -1161,7 +1328,7 @@ class ManagerTeacherView(LoginRequiredMixin, UserPassesTestMixin, BaseView):
     template_name = 'gradesbook/managerteacher.html'
 
     def test_func(self):
-        return self.request.user.has_perm('gradesbook.manager')
+        return self.request.role == 'manager'
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -1169,7 +1336,9 @@ class ManagerTeacherView(LoginRequiredMixin, UserPassesTestMixin, BaseView):
             Teacher,
             user__id=kwargs['teacher_user_id']
         )
-        subject_teacher = SubjectTeachers.objects.filter(teacher=teacher)
+        subject_teacher = SubjectTeachers.objects.filter(
+            teacher=teacher
+        ).select_related('subject__school_class')
         subjects = [subject.subject for subject in subject_teacher]
         context['subjects'] = subjects
         context['teacher'] = teacher
@@ -1180,19 +1349,20 @@ class TeacherPanelView(LoginRequiredMixin, UserPassesTestMixin, BaseView):
     template_name = 'gradesbook/teacher.html'
 
     def test_func(self):
-        return self.request.user.has_perm('gradesbook.teacher')
+        return self.request.role == 'teacher'
 
     def get(self, request, *args, **kwargs):
-        teacher = get_object_or_404(Teacher, user=self.request.user)
-        if teacher.first_login is True:
+        if request.person.first_login is True:
             return HttpResponseRedirect(reverse('gradesbook:first_login'))
         return super().get(request, *args, **kwargs)
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        teacher = get_object_or_404(Teacher, user=self.request.user)
+        teacher = self.request.person
         try:
-            subject_teacher = SubjectTeachers.objects.filter(teacher=teacher)
+            subject_teacher = SubjectTeachers.objects.filter(
+                teacher=teacher
+            ).select_related('subject__school_class')
             subjects = [subject.subject for subject in subject_teacher]
             context['subjects'] = subjects
             school_classes = [
@@ -1212,7 +1382,7 @@ class TeacherSubjectView(LoginRequiredMixin, UserPassesTestMixin,
     form_class = AddGradeForm
 
     def test_func(self):
-        return self.request.user.has_perm('gradesbook.teacher')
+        return self.request.role == 'teacher'
 
     def get_success_url(self):
         return reverse('gradesbook:teacher_subject', kwargs={
@@ -1225,62 +1395,43 @@ class TeacherSubjectView(LoginRequiredMixin, UserPassesTestMixin,
             unique_code=self.kwargs['subject_unique_code']
         )
         context['subject'] = subject
-        students = Student.objects.filter(
-            school_class=subject.school_class
-        ).order_by('surname')
-        context['students'] = [
-            (student, Grades.objects.filter(subject=subject, student=student))
-            for student in students
-        ]
-        context['form2'] = self.get_second_form()[0]
-        context['invalid_student'] = self.get_second_form()[1]
+        context['journal'] = class_journal(subject)
+        history = ('student__school_class', 'subject')
         grades = Grades.objects.filter(
             subject=subject,
             manager_mode=False
-        ).order_by('date')
+        ).select_related(*history)
         manager_grades = Grades.objects.filter(
             subject=subject,
             manager_mode=True
-        ).order_by('date')
+        ).select_related(*history)
         manager_canceled_grades = CanceledGrades.objects.filter(
             subject=subject,
-        ).order_by('date')
-        paginator_grades = Paginator(grades, 10)
-        paginator_manager_grades = Paginator(manager_grades, 10)
-        paginator_manager_canceled_grades = Paginator(
-            manager_canceled_grades,
-            10
-        )
-        context['grades'] = paginator_grades.get_page(
-            self.request.GET.get('page1')
+        ).select_related(*history)
+        history_pages = (
+            ('grades', grades, 'page1'),
+            ('manager_grades', manager_grades, 'page2'),
+            ('manager_canceled_grades', manager_canceled_grades, 'page3'),
         )
-        context['manager_grades'] = paginator_manager_grades.get_page(
-            self.request.GET.get('page2')
-        )
-        context['manager_canceled_grades'] = \
-            paginator_manager_canceled_grades.get_page(
-                self.request.GET.get('page3')
-            )
+        for name, queryset, parameter in history_pages:
+            context[name] = KeysetPaginator(
+                queryset, 10, ordering=('date', 'id')
+            ).get_page(self.request.GET.get(parameter))
         return context
 
-    def get_second_form(self):
-        if self.request.method == 'POST':
-            current_form = AddGradeForm(self.request.POST)
-            if not current_form.is_valid():
-                try:
-                    student = get_object_or_404(
-                        Student,
-                        user__id=self.request.POST.get('student')
-                    )
-                    return current_form, student
-                except KeyError:
-                    return None, None
-        return None, None
-
     def form_invalid(self, form):
-        form = AddGradeForm()
+        # The invalid form is shown again only in the row of its pupil
+        try:
+            invalid_student = int(self.request.POST.get('student'))
+        except (TypeError, ValueError):
+            invalid_student = None
         return self.render_to_response(
-            self.get_context_data(form=form, wrong=True)
+            self.get_context_data(
+                form=AddGradeForm(),
+                form2=form,
+                invalid_student=invalid_student,
+                wrong=True
+            )
         )
 
     def form_valid(self, form):
@@ -1302,34 +1453,139 @@ class TeacherSubjectView(LoginRequiredMixin, UserPassesTestMixin,
             raise Http404(
                 "There was a problem with grade saving. Try again later"
             )
-        message = Message(
+        enqueue(
+            'send_message',
+            sender_id=self.request.user.id,
             subject='Нова оцінка',
             text=f'Ти отримав нову оцінку з предмету {subject.name}. '
-                 f'Твоя оцінка: {grade.grade}.'
+                 f'Твоя оцінка: {grade.grade}.',
+            user_ids=[student.user_id]
         )
-        with transaction.atomic():
-            try:
-                message.save()
-            except (DataError, TypeError):
-                raise Http404('Text or subject too long or wrong datatype')
-            sender = Sender(user=self.request.user, message=message)
-            sender.save()
-            recipient = Recipient(user=student.user, message=message)
-            recipient.save()
-            try:
-                mailbox_received = MailboxReceived(
-                    sender=sender,
-                    recipient=recipient,
-                    message=message
-                )
-                mailbox_received.save()
-            except FieldError:
-                raise Http404(
-                    "There was a problem sending messages about new grade"
-                )
         return super().form_valid(form)
 
 
+class TeacherBulkGradesView(LoginRequiredMixin, UserPassesTestMixin,
+                            BaseView):
+    """
+    Enters grades of a whole class at once, either in a form with one
+    cell per pupil or as pasted or uploaded "pupil, grade" CSV lines.
+    Nothing is saved unless every line is valid.
+    """
+    template_name = 'gradesbook/teacherbulkgrades.html'
+
+    def test_func(self):
+        return self.request.role == 'teacher'
+
+    def get_subject_and_students(self):
+        subject = get_object_or_404(
+            Subject,
+            unique_code=self.kwargs['subject_unique_code']
+        )
+        students = list(Student.objects.listed().filter(
+            school_class_id=subject.school_class_id
+        ).select_related('user').order_by('surname', 'name'))
+        return subject, students
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        subject, students = kwargs.get('subject'), kwargs.get('students')
+        if subject is None:
+            subject, students = self.get_subject_and_students()
+        formset = kwargs.get('formset') or BulkGradeFormSet(
+            initial=[{'student': student.pk} for student in students]
+        )
+        context['subject'] = subject
+        context['rows'] = list(zip(students, formset.forms))
+        context['formset'] = formset
+        context['csv_form'] = kwargs.get('csv_form') or GradeCsvForm()
+        return context
+
+    def post(self, request, **kwargs):
+        subject, students = self.get_subject_and_students()
+        formset = None
+        csv_form = None
+        entries = []
+        errors = []
+        if request.POST.get('mode') == 'csv':
+            csv_form = GradeCsvForm(request.POST, request.FILES)
+            valid = csv_form.is_valid()
+            if valid:
+                entries, errors = read_grade_csv(
+                    csv_form.cleaned_data['text'], students
+                )
+        else:
+            formset = BulkGradeFormSet(request.POST)
+            valid = formset.is_valid()
+            by_pk = {student.pk: student for student in students}
+            for form in formset if valid else ():
+                grade = form.cleaned_data.get('grade')
+                if grade is None:
+                    continue
+                student = by_pk.get(form.cleaned_data['student'])
+                if student is None:
+                    errors.append('Учня немає в класі.')
+                else:
+                    entries.append((student, grade))
+
+        if valid and not errors and not entries:
+            errors.append('Не введено жодної оцінки.')
+        if not valid or errors:
+            return self.render_to_response(self.get_context_data(
+                subject=subject,
+                students=students,
+                formset=formset,
+                csv_form=csv_form,
+                errors=errors
+            ))
+        add_grades(subject, entries, request.user.id)
+        return HttpResponseRedirect(reverse(
+            'gradesbook:teacher_subject',
+            kwargs={'subject_unique_code': subject.unique_code}
+        ))
+
+
+class RosterImportView(LoginRequiredMixin, UserPassesTestMixin, BaseView):
+    """
+    Imports pupils and their parents into a class from an uploaded CSV or
+    XLSX roster. Nothing is created unless every row is valid.
+    """
+    template_name = 'gradesbook/managerrosterimport.html'
+
+    def test_func(self):
+        return self.request.role == 'manager'
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['current_class'] = kwargs.get('current_class') or \
+            get_object_or_404(SchoolClass,
+                              unique_code=self.kwargs['class_unique_code'])
+        context['form'] = kwargs.get('form') or RosterForm()
+        context['columns'] = [column for column in COLUMNS
+                              if column != 'class']
+        return context
+
+    def post(self, request, **kwargs):
+        school_class = get_object_or_404(
+            SchoolClass,
+            unique_code=self.kwargs['class_unique_code']
+        )
+        form = RosterForm(request.POST, request.FILES)
+        result = None
+        errors = []
+        if form.is_valid():
+            upload = form.cleaned_data['file']
+            try:
+                result = import_roster(upload, upload.name, school_class)
+            except RosterFormatError as error:
+                errors.append(str(error))
+        return self.render_to_response(self.get_context_data(
+            current_class=school_class,
+            form=form,
+            result=result,
+            errors=errors
+        ))
+
+
 class CreateMessageView(LoginRequiredMixin, UserPassesTestMixin,
                         ProcessFormView, FormMixin, BaseView):
     """
@@ -1343,34 +1599,32 @@ class CreateMessageView(LoginRequiredMixin, UserPassesTestMixin,
     5 - parents of student
     6 - manager
     7 - single teacher
+    8 - all students of active classes
+    9 - all parents of students of active classes
 
     *code - represents:
         class.unique_code for 1,2 prefixes,
         user.id for 4,5,7 prefixes (for prefix 5- student.user.id not parents!)
-        None for manager (sends to all managers), subject unique_code for
-        prefix 3
+        None for manager (sends to all managers) and for 8,9 prefixes,
+        subject unique_code for prefix 3
     """
     template_name = 'gradesbook/message.html'
     form_class = MessageForm
 
     def test_func(self):
-        test = False
-        if self.request.user.has_perm('gradesbook.student') or \
-                self.request.user.has_perm('gradesbook.parent') or \
-                self.request.user.has_perm('gradesbook.teacher') or \
-                self.request.user.has_perm('gradesbook.manager'):
-            test = True
-        return test
+        if self.kwargs['prefix'] in {SCHOOL_STUDENTS, SCHOOL_PARENTS}:
+            return self.request.role == 'manager'
+        return self.request.role in ROLES
 
     def get_success_url(self):
-        user_permission = list(self.request.user.get_all_permissions())[0]
-        if user_permission == 'gradesbook.student':
+        role = self.request.role
+        if role == 'student':
             return reverse('gradesbook:student_parent')
-        elif user_permission == 'gradesbook.parent':
+        elif role == 'parent':
             return reverse('gradesbook:student_parent')
-        elif user_permission == 'gradesbook.teacher':
+        elif role == 'teacher':
             return reverse('gradesbook:teacher')
-        elif user_permission == 'gradesbook.manager':
+        elif role == 'manager':
             return reverse('gradesbook:manager')
         else:
             raise ValueError("Unknown permission")
@@ -1419,184 +1673,102 @@ class CreateMessageView(LoginRequiredMixin, UserPassesTestMixin,
                 user__id=self.kwargs['code'],
             )
             context['recipient_type'] = 7
+        elif self.kwargs['prefix'] in {SCHOOL_STUDENTS, SCHOOL_PARENTS}:
+            context['recipient_type'] = self.kwargs['prefix']
         return context
 
+    def get_target(self):
+        # Resolves the object the message is addressed to and the name
+        # stored in the sent mailbox
+        prefix = self.kwargs['prefix']
+        if prefix in {1, 2}:
+            school_class = get_object_or_404(
+                SchoolClass,
+                unique_code=self.kwargs['code']
+            )
+            if prefix == 1:
+                return school_class, school_class.name
+            return school_class, f'{school_class.name} parents'
+        elif prefix == 3:
+            subject = get_object_or_404(
+                Subject,
+                unique_code=self.kwargs['code']
+            )
+            get_object_or_404(SubjectTeachers, subject=subject)
+            return subject, f'{subject.name} teachers'
+        elif prefix in {4, 5}:
+            student = get_object_or_404(
+                Student,
+                user__id=self.kwargs['code']
+            )
+            if prefix == 4:
+                return student, student.__str__()
+            return student, f'{student.__str__()} parents'
+        elif prefix == 6:
+            return None, 'Managers'
+        elif prefix == 7:
+            teacher = get_object_or_404(
+                Teacher,
+                user__id=self.kwargs['code']
+            )
+            return teacher, teacher.__str__()
+        elif prefix == SCHOOL_STUDENTS:
+            return None, 'School students'
+        elif prefix == SCHOOL_PARENTS:
+            return None, 'School parents'
+        raise Http404('Unknown recipient type.')
+
     def form_valid(self, form):
-        # Message and sender models are save the same way for all types
-        # of users
-        with transaction.atomic():
-            message = form.save()
-            sender = Sender(user=self.request.user, message=message)
-            sender.save()
-            # Recipient and MailboxReceived models depend on the type of
-            # target user
-            if self.kwargs['prefix'] in {1, 2}:
-                school_class = get_object_or_404(
-                    SchoolClass,
-                    unique_code=self.kwargs['code']
-                )
-                recipient_name = school_class.name
-                if self.kwargs['prefix'] == 2:
-                    recipient_name += ' parents'
-                students = Student.objects.filter(school_class=school_class)
-                if not students:
-                    return self.render_to_response(
-                        self.get_context_data(
-                            form=form,
-                            no_students=True,
-                            back=True
-                        )
-                    )
-                if not students:
-                    raise Http404("Wrong class unique_code")
-                for student in students:
-                    if self.kwargs['prefix'] == 1:
-                        recipient = Recipient(
-                            user=student.user,
-                            message=message
-                        )
-                        recipient.save()
-                        mailbox_received = MailboxReceived(
-                            sender=sender,
-                            recipient=recipient,
-                            message=message
-                        )
-                        mailbox_received.save()
-                    else:
-                        parents = Parent.objects.filter(student=student)
-                        for parent in parents:
-                            recipient = Recipient(
-                                user=parent.user,
-                                message=message
-                            )
-                            recipient.save()
-                            mailbox_received = MailboxReceived(
-                                sender=sender,
-                                recipient=recipient,
-                                message=message
-                            )
-                            mailbox_received.save()
-            elif self.kwargs['prefix'] == 3:
-                subject = get_object_or_404(
-                    Subject,
-                    unique_code=self.kwargs['code']
-                )
-                recipient_name = f'{subject.name} teachers'
-                subject_teachers = get_object_or_404(
-                    SubjectTeachers,
-                    subject=subject
-                )
-                teachers = subject_teachers.teacher.all()
-                for teacher in teachers:
-                    recipient = Recipient(user=teacher.user, message=message)
-                    recipient.save()
-                    mailbox_received = MailboxReceived(
-                        sender=sender,
-                        recipient=recipient,
-                        message=message
-                    )
-                    mailbox_received.save()
-            elif self.kwargs['prefix'] == 4:
-                student = get_object_or_404(
-                    Student,
-                    user__id=self.kwargs['code']
-                )
-                recipient_name = student.__str__()
-                recipient = Recipient(user=student.user, message=message)
-                recipient.save()
-                mailbox_received = MailboxReceived(
-                    sender=sender,
-                    recipient=recipient,
-                    message=message
-                )
-                mailbox_received.save()
-            elif self.kwargs['prefix'] == 5:
-                student = get_object_or_404(
-                    Student,
-                    user__id=self.kwargs['code']
-                )
-                recipient_name = f'{student.__str__()} parents'
-                parents = Parent.objects.filter(student=student)
-                for parent in parents:
-                    recipient = Recipient(user=parent.user, message=message)
-                    recipient.save()
-                    mailbox_received = MailboxReceived(
-                        sender=sender,
-                        recipient=recipient,
-                        message=message
-                    )
-                    mailbox_received.save()
-            elif self.kwargs['prefix'] == 6:
-                permission = Permission.objects.get(codename='manager')
-                managers = User.objects.filter(user_permissions=permission)
-                recipient_name = 'Managers'
-                for manager in managers:
-                    recipient = Recipient(user=manager, message=message)
-                    recipient.save()
-                    mailbox_received = MailboxReceived(
-                        sender=sender,
-                        recipient=recipient,
-                        message=message
-                    )
-                    mailbox_received.save()
-            elif self.kwargs['prefix'] == 7:
-                teacher = get_object_or_404(
-                    Teacher,
-                    user__id=self.kwargs['code']
-                )
-                recipient_name = teacher.__str__()
-                recipient = Recipient(user=teacher.user, message=message)
-                recipient.save()
-                mailbox_received = MailboxReceived(
-                    sender=sender,
-                    recipient=recipient,
-                    message=message
+        target, recipient_name = self.get_target()
+        if self.kwargs['prefix'] in {1, 2} and \
+                not recipient_users(self.kwargs['prefix'], target).exists():
+            return self.render_to_response(
+                self.get_context_data(
+                    form=form,
+                    no_students=True,
+                    back=True
                 )
-                mailbox_received.save()
-            # Same for all type of senders
-            mailbox_sent = MailboxSent(
-                sender=sender,
-                recipient=recipient_name,
-                message=message
             )
-            mailbox_sent.save()
+        with transaction.atomic():
+            message = form.save(commit=False)
+            message.sender = self.request.user
+            message.recipient = recipient_name
+            message.save()
+            # Delivery to every recipient is left to the background worker
+            enqueue(
+                'fan_out_message',
+                message_id=message.id,
+                prefix=self.kwargs['prefix'],
+                target_id=target.pk if target is not None else None
+            )
         return super().form_valid(form)
 
 
-class MailboxView(LoginRequiredMixin, UserPassesTestMixin, BaseView):
+class MailboxView(LoginRequiredMixin, UserPassesTestMixin, StampedView):
     template_name = 'gradesbook/mailbox.html'
 
     def test_func(self):
-        test = False
-        if self.request.user.has_perm('gradesbook.student') or\
-                self.request.user.has_perm('gradesbook.parent') or\
-                self.request.user.has_perm('gradesbook.teacher') or\
-                self.request.user.has_perm('gradesbook.manager'):
-            test = True
-        return test
+        return self.request.role in ROLES
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        sent = MailboxSent.objects.filter(
-            sender__user=self.request.user
-        ).order_by('-id')
-        received = MailboxReceived.objects.filter(
-            recipient__user=self.request.user
-        ).order_by('-id')
-        paginator_sent = Paginator(sent, 15)
-        paginator_received = Paginator(received, 15)
-        context['received'] = paginator_received.get_page(
-            self.request.GET.get('page2')
-        )
-        context['sent'] = paginator_sent.get_page(
-            self.request.GET.get('page1')
+        sent = Message.objects.filter(
+            sender=self.request.user
+        ).exclude(recipient='').only('subject', 'date', 'recipient')
+        received = InboxEntry.objects.filter(
+            user=self.request.user
+        ).select_related('message', 'sender').only(
+            'read', 'date', 'message__subject',
+            'sender__first_name', 'sender__last_name'
         )
-        try:
-            context['user_type'] = list(
-                self.request.user.get_all_permissions()
-            )[0]
-        except IndexError:
-            raise Http404("User not recognized.")
+        context['received'] = KeysetPaginator(
+            received, 15,
+            count_key=f'gradesbook:received:{self.request.user.id}'
+        ).get_page(self.request.GET.get('page2'))
+        context['sent'] = KeysetPaginator(
+            sent, 15
+        ).get_page(self.request.GET.get('page1'))
+        context['user_type'] = f'gradesbook.{self.request.role}'
         return context
 
 
@@ -1604,74 +1776,255 @@ class MailTextView(LoginRequiredMixin, UserPassesTestMixin, BaseView):
     template_name = 'gradesbook/mailtext.html'
 
     def test_func(self):
-        test = False
-        if self.request.user.has_perm('gradesbook.student') or\
-                self.request.user.has_perm('gradesbook.parent') or\
-                self.request.user.has_perm('gradesbook.teacher') or\
-                self.request.user.has_perm('gradesbook.manager'):
-            test = True
-        return test
+        return self.request.role in ROLES
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         if self.kwargs['mailbox_type'] == 1:
-            mailbox = get_object_or_404(
-                MailboxReceived,
-                id=self.kwargs['mailbox_id']
+            entry = get_object_or_404(
+                InboxEntry.objects.select_related('message'),
+                id=self.kwargs['mailbox_id'],
+                user=self.request.user
             )
-            context['mailbox'] = mailbox
-            mailbox.read = True
-            mailbox.save()
+            context['message'] = entry.message
+            if not entry.read:
+                marked = InboxEntry.objects.filter(
+                    id=entry.id,
+                    read=False
+                ).update(read=True)
+                if marked:
+                    UnreadCounter.objects.decrement(entry.user_id)
+                    stamps.bump([stamps.INBOX.format(entry.user_id)])
         elif self.kwargs['mailbox_type'] == 2:
-            mailbox = get_object_or_404(
-                MailboxSent,
-                id=self.kwargs['mailbox_id']
+            context['message'] = get_object_or_404(
+                Message,
+                id=self.kwargs['mailbox_id'],
+                sender=self.request.user
+            )
+        return context
+
+
+class SearchView(LoginRequiredMixin, UserPassesTestMixin, BaseView):
+    """
+    Full-text search over mail and people, see gradesbook.search. Pupils
+    and parents find only their own mail.
+    """
+    template_name = 'gradesbook/search.html'
+
+    def test_func(self):
+        return self.request.role in ROLES
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        form = SearchForm(self.request.GET or None)
+        context['form'] = form
+        context['manager'] = self.request.role == 'manager'
+        context['available'] = search_available()
+        if form.is_valid() and context['available']:
+            query = form.cleaned_data['q']
+            context['query'] = query
+            context['mail'] = search_mail(
+                self.request.user, self.request.role, query
+            )
+            context['people'] = search_people(
+                self.request.user, self.request.role, query
             )
-            context['mailbox'] = mailbox
         return context
 
 
-class StudentParentView(LoginRequiredMixin, UserPassesTestMixin, BaseView):
+class StudentParentView(LoginRequiredMixin, UserPassesTestMixin,
+                        StampedView):
     template_name = 'gradesbook/studentparent.html'
 
     def test_func(self):
-        test = False
-        if self.request.user.has_perm('gradesbook.student') or \
-                self.request.user.has_perm('gradesbook.parent'):
-            test = True
-        return test
+        return self.request.role in {'student', 'parent'}
 
-    def get(self, request, *args, **kwargs):
-        try:
-            person = Student.objects.get(user=self.request.user)
-        except ObjectDoesNotExist:
-            person = get_object_or_404(Parent, user=self.request.user)
-        if person.first_login is True:
+    def stamp_keys(self):
+        return [stamps.PUPIL.format(self.request.student_id),
+                stamps.CLASS.format(self.request.school_class_id)]
+
+    def respond(self, request, *args, **kwargs):
+        # Setting first_login again saves the person, which bumps the stamp
+        # of the pupil, so it is checked behind the stamps
+        if request.person.first_login is True:
             return HttpResponseRedirect(reverse('gradesbook:first_login'))
-        return super().get(request, *args, **kwargs)
+        return super().respond(request, *args, **kwargs)
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
+        context['person'] = self.request.person
+        context['cards'] = grade_cards(self.request.student)
+        return context
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class ApiTokenView(View):
+    """
+    POST with username and password issues a token of the JSON API for
+    clients without a browser session, DELETE with the token revokes it.
+    """
+
+    def post(self, request):
+        user = authenticate(username=request.POST.get('username'),
+                            password=request.POST.get('password'))
+        if user is None:
+            return api.error_response(
+                api.ApiError(401, 'Невірний логін або пароль.')
+            )
+        return api.json_response({'token': api.issue_token(user)}, 201)
+
+    def delete(self, request):
+        key = api.request_token(request)
+        deleted, _ = ApiToken.objects.filter(
+            digest=api.token_digest(key or '')
+        ).delete()
+        if not deleted:
+            return api.error_response(api.ApiError(401, 'Невірний токен.'))
+        return HttpResponse(status=204)
+
+
+class ApiView(View):
+    """
+    Base of the read-only JSON API. Browsers use their session, other
+    clients send "Authorization: Bearer <token>". ?fields=a,b selects
+    fields, ?compact=1 sends rows instead of objects. Unchanged data is
+    answered with 304 like the pages, errors as {"error": message}.
+    """
+    roles = ROLES
+    # Field names to getters of their values from an object
+    fields = {}
+
+    def stamp_keys(self):
+        return []
+
+    def dispatch(self, request, *args, **kwargs):
         try:
-            permission = list(self.request.user.get_all_permissions())[0]
-        except IndexError:
-            raise Http404("User not recognized.")
-
-        if permission == 'gradesbook.student':
-            student = get_object_or_404(Student, user=self.request.user)
-            context['person'] = student
-        elif permission == 'gradesbook.parent':
-            parent = get_object_or_404(Parent, user=self.request.user)
-            student = parent.student
-            context['person'] = parent
-
-        subjects = Subject.objects.filter(school_class=student.school_class)
-        subjects_grades = {}
-        for subject in subjects:
-            subjects_grades[subject] = Grades.objects.filter(
-                subject=subject,
-                student=student
+            api.authenticate_request(request)
+            if request.role not in self.roles:
+                raise api.ApiError(403, 'Немає доступу.')
+            return super().dispatch(request, *args, **kwargs)
+        except Http404:
+            return api.error_response(api.ApiError(404, 'Не знайдено.'))
+        except api.ApiError as error:
+            return api.error_response(error)
+
+    def get(self, request, *args, **kwargs):
+        return stamps.conditional(request, self.stamp_keys(), self.respond)
+
+    def respond(self, request):
+        fields = api.requested_fields(request, self.fields)
+        return api.json_response(
+            self.get_data(fields, api.is_compact(request))
+        )
+
+    def get_objects(self):
+        return []
+
+    def get_data(self, fields, compact):
+        return api.serialize(self.get_objects(), fields, compact)
+
+
+class ApiSubjectsView(ApiView):
+    """Subjects of the pupil with their grades, as StudentParentView."""
+    roles = {'student', 'parent'}
+    fields = {
+        'code': lambda card: card.subject.unique_code,
+        'name': lambda card: card.subject.name,
+        'count': lambda card: card.count,
+        'average': lambda card: card.average,
+        'trend': lambda card: card.trend,
+        'grades': lambda card: [[grade.date, grade.grade]
+                                for grade in card.grades],
+    }
+
+    def stamp_keys(self):
+        return [stamps.PUPIL.format(self.request.student_id),
+                stamps.CLASS.format(self.request.school_class_id)]
+
+    def get_objects(self):
+        return grade_cards(self.request.student)
+
+
+class ApiGradesView(ApiView):
+    """Grades of the pupil, newest first, of one subject with ?subject=."""
+    roles = {'student', 'parent'}
+    fields = {
+        'id': lambda grade: grade.id,
+        'date': lambda grade: grade.date,
+        'grade': lambda grade: grade.grade,
+        'subject': lambda grade: grade.subject.unique_code,
+    }
+
+    def stamp_keys(self):
+        return [stamps.PUPIL.format(self.request.student_id),
+                stamps.CLASS.format(self.request.school_class_id)]
+
+    def get_data(self, fields, compact):
+        grades = Grades.objects.filter(
+            student_id=self.request.student_id,
+            subject__school_class_id=self.request.school_class_id
+        ).select_related('subject').only('date', 'grade',
+                                         'subject__unique_code')
+        if self.request.GET.get('subject'):
+            grades = grades.filter(
+                subject__unique_code=self.request.GET['subject']
             )
-        context['subjects_grades'] = subjects_grades
+        grades, cursor = api.paginate(self.request, grades, ('-date', '-id'))
+        return dict(api.serialize(grades, fields, compact), next=cursor)
+
+
+class ApiTimetableView(TimetableMixin, ApiView):
+    """Lessons of a timetable, as TimetableView."""
+    roles = {'student', 'parent', 'teacher'}
+    fields = {
+        'day': lambda lesson: lesson[0],
+        'lesson': lambda lesson: lesson[1],
+        'subject': lambda lesson: lesson[2].name,
+        'code': lambda lesson: lesson[2].code,
+        'class': lambda lesson: lesson[2].class_name,
+    }
 
-        return context
+    def get_objects(self):
+        return grid_lessons(self.timetable())
+
+
+class ApiReceivedView(ApiView):
+    """Received mail, newest first, with the unread count."""
+    fields = {
+        'id': lambda entry: entry.id,
+        'date': lambda entry: entry.date,
+        'subject': lambda entry: entry.message.subject,
+        'sender': lambda entry: f'{entry.sender.first_name} '
+                                f'{entry.sender.last_name}',
+        'read': lambda entry: entry.read,
+    }
+
+    def get_data(self, fields, compact):
+        received = InboxEntry.objects.filter(
+            user=self.request.user
+        ).select_related('message', 'sender').only(
+            'read', 'date', 'message__subject',
+            'sender__first_name', 'sender__last_name'
+        )
+        received, cursor = api.paginate(self.request, received, ('-id',))
+        return dict(
+            api.serialize(received, fields, compact), next=cursor,
+            unread=UnreadCounter.objects.unread_for(self.request.user)
+        )
+
+
+class ApiSentView(ApiView):
+    """Sent mail, newest first."""
+    fields = {
+        'id': lambda message: message.id,
+        'date': lambda message: message.date,
+        'subject': lambda message: message.subject,
+        'recipient': lambda message: message.recipient,
+    }
+
+    def get_data(self, fields, compact):
+        sent = Message.objects.filter(
+            sender=self.request.user
+        ).exclude(recipient='').only('subject', 'date', 'recipient')
+        sent, cursor = api.paginate(self.request, sent, ('-id',))
+        return dict(api.serialize(sent, fields, compact), next=cursor)